@@ -1,12 +1,35 @@
 from flask import Flask
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 
 from app.config import Config
+from app.utils.cache import CatalogCache
+from app.utils.compression import Compressor
+from app.utils.db_pool import PoolUtils
+from app.utils.events import EventBus
+from app.utils.idempotency import IdempotencyStore
+from app.utils.intake import OrderIntake
+from app.utils.json import JSONEncoder
+from app.utils.kitchen import KitchenQueue
+from app.utils.pool import BoundedExecutor
+from app.utils.profiling import Profiler
+from app.utils.ratelimit import RateLimiter
+from app.utils.replica import RoutingSQLAlchemy
+from app.utils.search import SearchIndex
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
 migrate = Migrate()
+cache = CatalogCache()
+compressor = Compressor()
+events = EventBus()
+idempotency = IdempotencyStore()
+intake = OrderIntake()
+kitchen_queue = KitchenQueue()
+search_index = SearchIndex()
+profiler = Profiler()
+limiter = RateLimiter()
+# PBKDF2 releases the GIL, so hashing threads run in parallel with requests
+password_pool = BoundedExecutor("password-hash", config_prefix="PASSWORD_HASH")
 
 
 def create_app(config_class=Config):
@@ -14,17 +37,40 @@ def create_app(config_class=Config):
     from app.routes.menu import menu
     from app.routes.order import order
     from app.routes.category import category
+    from app.routes.monitor import monitor
+    from app.routes.report import report
 
     app = Flask(__name__)
     CORS(app)
     app.config.from_object(config_class)
+    app.json_encoder = JSONEncoder
 
+    app.config.setdefault(
+        "SQLALCHEMY_ENGINE_OPTIONS", PoolUtils.engine_options(app.config)
+    )
     db.init_app(app)
     migrate.init_app(app, db)
+    # First, so shed requests do no other work
+    limiter.init_app(app)
+    cache.init_app(app)
+    events.init_app(app)
+    idempotency.init_app(app)
+    intake.init_app(app)
+    kitchen_queue.init_app(app)
+    events.add_listener(kitchen_queue.on_event)
+    search_index.init_app(app)
+    password_pool.init_app(app)
+    compressor.init_app(app)
+    profiler.init_app(app)
 
     app.register_blueprint(auth, url_prefix="/auth")
     app.register_blueprint(menu, url_prefix="/menu")
     app.register_blueprint(order, url_prefix="/order")
     app.register_blueprint(category, url_prefix="/categories")
+    app.register_blueprint(report, url_prefix="/reports")
+    app.register_blueprint(monitor)
+
+    # Pre-fork servers must not share the parent's pooled connections
+    PoolUtils.reset_after_fork(app)
 
     return app
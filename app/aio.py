@@ -0,0 +1,197 @@
+"""
+Async serving mode for the read-only endpoints.
+
+    uvicorn --factory app.aio:create_asgi_app --port 5001
+
+The ASGI app answers the handlers decorated with :func:`read_only` (menu,
+search, categories, order listings and lookups) from a single event loop.
+Each request runs the regular Flask handler, services and ``to_dict``
+shapes in a greenlet, over async database drivers: a request waiting on the
+database yields to the loop instead of holding a thread, so one worker
+process keeps thousands of idle polling clients open. Every other route
+gets a 404 and stays on the sync app, put both behind the same proxy.
+
+It needs an ASGI server and the async driver of each database, e.g.
+``pip install uvicorn aiomysql`` (``aiosqlite`` for SQLite, ``asyncpg``
+for PostgreSQL).
+"""
+
+import io
+import sys
+from typing import Any, Dict, List, Tuple
+
+from flask import Flask, make_response
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util import greenlet_spawn
+
+from app import create_app, db, profiler
+from app.config import Config
+from app.utils.json import jsonify
+
+# Async driver of every supported database backend
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+class AsyncReadApp:
+    """
+    ASGI app serving the read-only handlers of a Flask app.
+
+    Every engine of the Flask app (primary and replicas) is paired with an
+    async engine on the same database, which the sessions use instead, see
+    :attr:`RoutingSQLAlchemy.engine_overrides`. Shared state must not be
+    locked across database calls, as all requests run on one thread.
+    """
+
+    def __init__(self, app: Flask):
+        self.app = app
+        self.engines: List[AsyncEngine] = []
+        with app.app_context():
+            for bind in [None, *(app.config.get("SQLALCHEMY_BINDS") or ())]:
+                engine = db.get_engine(app, bind)
+                async_engine = create_async_engine(
+                    self.async_url(engine.url), **self.engine_options(engine.url)
+                )
+                db.engine_overrides[engine] = async_engine.sync_engine
+                if profiler.enabled:
+                    profiler.instrument(async_engine.sync_engine)
+                self.engines.append(async_engine)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return  # No websockets
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        status, headers, data = await greenlet_spawn(
+            self._dispatch, self._environ(scope, body)
+        )
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b"" if scope["method"] == "HEAD" else data,
+            }
+        )
+
+    def _dispatch(
+        self, environ: Dict[str, Any]
+    ) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+        """Run a request through Flask, inside the request's greenlet"""
+        with self.app.request_context(environ) as ctx:
+            view = self.app.view_functions.get(ctx.request.endpoint)
+            if getattr(view, "read_only", False):
+                try:
+                    response = self.app.full_dispatch_request()
+                except Exception as e:
+                    response = self.app.handle_exception(e)
+            else:
+                response = make_response(
+                    jsonify({"success": False, "message": "Not served in async mode"}),
+                    404,
+                )
+            headers = [
+                (name.lower().encode("latin1"), value.encode("latin1"))
+                for name, value in response.headers.to_wsgi_list()
+            ]
+            return response.status_code, headers, response.get_data()
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for engine in self.engines:
+                    await engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def engine_options(self, url) -> Dict[str, Any]:
+        """
+        Pool options of an async engine, from the ``DB_POOL_*`` settings.
+
+        The pool also bounds the requests running queries at once, the others
+        wait for a connection without holding anything but their socket.
+        """
+        config = self.app.config
+        options = {
+            "pool_size": config["DB_POOL_SIZE"],
+            "max_overflow": config["DB_MAX_OVERFLOW"],
+            "pool_timeout": config["DB_POOL_TIMEOUT"],
+            "pool_recycle": config["DB_POOL_RECYCLE"],
+            "pool_pre_ping": config["DB_POOL_PRE_PING"],
+        }
+        if url.get_backend_name() == "sqlite":
+            # aiosqlite opens a connection, and a thread, per checkout
+            options["poolclass"] = AsyncAdaptedQueuePool
+        return options
+
+    @classmethod
+    def async_url(cls, url):
+        """
+        Get the URL of a database for its async driver.
+
+        :param url: The URL used by the sync engine.
+        :return: The same URL with the async driver.
+        :raises ValueError: If the backend has no supported async driver.
+        """
+        url = make_url(url)
+        driver = ASYNC_DRIVERS.get(url.get_backend_name())
+        if driver is None:
+            raise ValueError(f"No async driver for {url.get_backend_name()}")
+        return url.set(drivername=driver)
+
+    @classmethod
+    def _environ(cls, scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+        """Build the WSGI environ of an ASGI HTTP request"""
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin1"),
+            "PATH_INFO": scope["path"].encode().decode("latin1"),
+            "QUERY_STRING": scope["query_string"].decode("latin1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": False,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        for name, value in scope["headers"]:
+            name = name.decode("latin1")
+            if name == "content-type":
+                key = "CONTENT_TYPE"
+            elif name == "content-length":
+                key = "CONTENT_LENGTH"
+            else:
+                key = f"HTTP_{name.upper().replace('-', '_')}"
+            value = value.decode("latin1")
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+
+def create_asgi_app(config_class=Config) -> AsyncReadApp:
+    return AsyncReadApp(create_app(config_class))
@@ -0,0 +1,51 @@
+from app import db
+
+# Rollups maintained by AnalyticsService inside the order transactions. Each
+# report reads a bounded number of rows whatever the size of the order
+# history. Times are UTC, like Order.created_at.
+#
+# Every counter is split in ANALYTICS_SHARDS rows, keyed by ``shard``: an
+# order only updates the rows of its shard, so concurrent orders don't queue
+# on the row of the current hour, and the reports sum the shards.
+
+
+class HourlySales(db.Model):
+    __tablename__ = "sales_hourly"
+
+    hour = db.Column(db.DateTime, primary_key=True)  # Truncated to the hour
+    shard = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    items = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class DailyMenuItemSales(db.Model):
+    __tablename__ = "sales_daily_menu_items"
+
+    day = db.Column(db.Date, primary_key=True)
+    # No foreign key, sales of deleted menu items are kept. Lines of items
+    # deleted before a rebuild are counted under 0.
+    menu_item_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    shard = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    item_name = db.Column(db.String(100), nullable=True)  # Latest name sold
+    category_name = db.Column(db.String(100), nullable=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class DailyCategorySales(db.Model):
+    __tablename__ = "sales_daily_categories"
+
+    day = db.Column(db.Date, primary_key=True)
+    category_name = db.Column(db.String(100), primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class OrderStatusCount(db.Model):
+    __tablename__ = "order_status_counts"
+
+    status = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    shard = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    orders = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,16 @@
+from app import db
+
+
+class CatalogVersion(db.Model):
+    """
+    The version of the catalog shared by every worker and host, a single row.
+
+    Bumped after every committed menu or category mutation, see
+    :class:`DatabaseVersionStore`. The catalog cache and the ETags of the
+    catalog endpoints are derived from it.
+    """
+
+    __tablename__ = "catalog_version"
+
+    id = db.Column(db.Integer, primary_key=True)  # Always 1
+    version = db.Column(db.String(32), nullable=False)
@@ -7,5 +7,8 @@ class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
 
+    def to_dict(self):
+        return {"id": self.id, "name": self.name}
+
     def __repr__(self):
         return f"<Category {self.name}>"
@@ -0,0 +1,24 @@
+from app import db
+
+
+class IdempotencyKey(db.Model):
+    """
+    A request made with an ``Idempotency-Key`` header and its response.
+
+    The row is inserted before the request runs, so its primary key acts as
+    a lock shared by every worker; ``status_code`` stays NULL until the
+    response is stored. ``resource_id`` is set in the transaction creating
+    what the request creates, so a request that dies after its commit is
+    never run again.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    # The endpoint and the header value, see app.utils.idempotency
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)
+    response = db.Column(db.Text, nullable=True)
+    resource_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -1,4 +1,5 @@
 from app import db
+from app.utils.fields import Fields, FieldsUtils
 from datetime import datetime
 from sqlalchemy import UniqueConstraint
 
@@ -21,13 +22,16 @@ class MenuItem(db.Model):
     # Add a unique constraint on the combination of name and category_id
     __table_args__ = (UniqueConstraint("name", "category_id", name="uq_name_category"),)
 
-    def to_dict(self):
-        return {
+    def to_dict(self, fields: Fields = None):
+        data = {
             "id": self.id,
             "name": self.name,
             "quantity": self.quantity,
             "price": self.price,
             "description": self.description,
             "category_id": self.category_id,
-            "category_name": self.category.name,
         }
+        # Only touch the category relationship when its name is requested
+        if FieldsUtils.wants(fields, "category_name"):
+            data["category_name"] = self.category.name
+        return FieldsUtils.project(data, fields)
@@ -1,4 +1,5 @@
 from app import db
+from app.utils.fields import Fields, FieldsUtils
 from datetime import datetime
 from enum import Enum
 
@@ -28,6 +29,9 @@ class Order(db.Model):
         db.Integer, default=OrderStatus.ESTABLISHED.value
     )  # Store status as an integer
     total_price = db.Column(db.Float, default=0.0)
+    # Provisional ID of an order taken by the write-behind intake, see
+    # app.utils.intake. Unique, so a replayed journal entry can't place it twice.
+    intake_id = db.Column(db.String(36), nullable=True, unique=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -38,34 +42,72 @@ class Order(db.Model):
         "OrderItem", backref="order", lazy=True, cascade="all, delete-orphan"
     )
 
-    def to_dict(self):
-        return {
+    # Indexes matching the order listings: filter by phone and/or status,
+    # ordered and paginated by (status, id)
+    __table_args__ = (
+        db.Index("ix_orders_customer_phone_status", "customer_phone", "status", "id"),
+        db.Index("ix_orders_status_id", "status", "id"),
+        # Refreshes of the kitchen queue, see app.utils.kitchen
+        db.Index("ix_orders_updated_at", "updated_at"),
+    )
+
+    def to_dict(self, fields: Fields = None):
+        data = {
             "id": self.id,
             "customer_phone": self.customer_phone,
             "status": OrderStatus(self.status).name,  # Convert integer to status name
             "status_id": self.status,
             "total_price": self.total_price,
             "created_at": self.created_at.isoformat(),
-            "items": [item.to_dict() for item in self.items],
         }
+        # Only touch the items relationship when they are requested
+        if FieldsUtils.wants(fields, "items"):
+            item_fields = FieldsUtils.sub(fields, "items")
+            data["items"] = [item.to_dict(item_fields) for item in self.items]
+        return FieldsUtils.project(data, fields)
 
 
 class OrderItem(db.Model):
     __tablename__ = "order_items"
 
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False)
-    menu_item_id = db.Column(db.Integer, db.ForeignKey("menu_items.id"), nullable=False)
+    order_id = db.Column(
+        db.Integer, db.ForeignKey("orders.id"), nullable=False, index=True
+    )
+    # Kept for reference only, order reads use the snapshot below. Deleting
+    # the menu item leaves the order line intact.
+    menu_item_id = db.Column(
+        db.Integer,
+        db.ForeignKey("menu_items.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+    )
     quantity = db.Column(db.Integer, default=1)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=False)  # unit_price * quantity
+
+    # Snapshot of the menu item at order time, filled for older rows by
+    # ``flask backfill-order-snapshots``
+    item_name = db.Column(db.String(100), nullable=True)
+    unit_price = db.Column(db.Float, nullable=True)
+    category_name = db.Column(db.String(100), nullable=True)
 
     # Relationship with menu item
     menu_item = db.relationship("MenuItem")
 
-    def to_dict(self):
-        return {
+    def to_dict(self, fields: Fields = None):
+        data = {
             "id": self.id,
-            "menu_item": self.menu_item.to_dict(),
             "quantity": self.quantity,
             "price": self.price,
         }
+        if FieldsUtils.wants(fields, "menu_item"):
+            data["menu_item"] = FieldsUtils.project(
+                {
+                    "id": self.menu_item_id,
+                    "name": self.item_name,
+                    "price": self.unit_price,
+                    "category_name": self.category_name,
+                },
+                FieldsUtils.sub(fields, "menu_item"),
+            )
+        return FieldsUtils.project(data, fields)
@@ -11,6 +11,7 @@ class User(db.Model):
     is_staff = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Also serves as the (phone, is_staff) index for AuthService.get_user
     __table_args__ = (
         db.UniqueConstraint("phone", "is_staff", name="unique_phone_is_staff"),
     )
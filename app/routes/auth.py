@@ -1,7 +1,9 @@
 from flask import Blueprint
-from flask import request, jsonify
+from flask import request
 from app.services.auth import AuthService
 from app.utils.common import CommonUtils
+from app.utils.pool import PoolSaturatedError
+from app.utils.json import jsonify
 
 
 auth = Blueprint("auth", __name__)
@@ -45,7 +47,15 @@ def login():
 
     # If user is found, check if it is a valid staff user
     if user.is_staff:
-        if not password or not user.check_password(password):
+        try:
+            valid = bool(password) and AuthService.check_password(user, password)
+        except PoolSaturatedError:
+            return (
+                jsonify({"success": False, "message": "Server busy, try again"}),
+                503,
+                {"Retry-After": "1"},
+            )
+        if not valid:
             return jsonify({"success": False, "message": "Invalid credentials"}), 401
         # Generate JWT token for staff user
         token = AuthService.generate_jwt_token(user)
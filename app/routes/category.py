@@ -1,13 +1,18 @@
-from flask import Blueprint, request, jsonify
-from app import db
+from flask import Blueprint, request
+from app import cache, db
 from app.utils.auth import token_required
+from app.utils.etag import catalog_etag
 from app.services.category import CategoryService
+from app.utils.json import jsonify
+from app.utils.replica import read_only
 from sqlalchemy.exc import IntegrityError
 
 category = Blueprint("category", __name__)
 
 
 @category.route("/", methods=["GET"])
+@catalog_etag
+@read_only
 def get_categories():
     """Get all categories"""
     categories = CategoryService.get_all_categories()
@@ -15,7 +20,7 @@ def get_categories():
         jsonify(
             {
                 "success": True,
-                "categories": [{"id": c.id, "name": c.name} for c in categories],
+                "categories": categories,
             }
         ),
         200,
@@ -82,6 +87,7 @@ def update_category(category_id):
 
     category.name = name
     db.session.commit()
+    cache.invalidate()
 
     return (
         jsonify(
@@ -104,5 +110,6 @@ def delete_category(category_id):
 
     db.session.delete(category)
     db.session.commit()
+    cache.invalidate()
 
     return jsonify({"success": True, "message": "Category deleted successfully"}), 200
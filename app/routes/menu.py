@@ -1,32 +1,68 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+
+from flask import Blueprint, Response, request, stream_with_context
+from app.config import Config
 from app.services.menu import MenuService
 from app.utils.auth import token_required
+from app.utils.bulk import CSV_MIMETYPES, JSON_LINES_MIMETYPES, BulkUtils
 from app.utils.common import CommonUtils
+from app.utils.etag import catalog_etag
+from app.utils.fields import FieldsUtils
+from app.utils.json import dumps, jsonify
+from app.utils.pagination import PaginationUtils
+from app.utils.replica import read_only
 
 menu = Blueprint("menu", __name__)
 
 
 @menu.route("/", methods=["GET"])
+@catalog_etag(stamp=MenuService.stock_stamp)
+@read_only
 def get_menu():
-    """Get all menu items"""
-    menu_items = MenuService.get_all_menu_items()
-    return jsonify({"success": True, "menu_items": menu_items}), 200
+    """
+    Get a page of menu items, or the whole menu without ``limit`` and ``cursor``.
+
+    Tablets predating pagination never follow ``next_cursor``, they keep
+    getting every menu item in one response.
+    """
+    limit = None
+    if "limit" in request.args or "cursor" in request.args:
+        limit = PaginationUtils.parse_limit(request.args.get("limit", ""))
+    fields = FieldsUtils.parse(request.args.get("fields"))
+    try:
+        cursor = PaginationUtils.decode_cursor(request.args.get("cursor"), 1)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    menu_items, next_cursor = MenuService.get_all_menu_items(
+        limit=limit, cursor=cursor, fields=fields
+    )
+    return (
+        jsonify(
+            {"success": True, "menu_items": menu_items, "next_cursor": next_cursor}
+        ),
+        200,
+    )
 
 
 @menu.route("/search", methods=["GET"])
+@read_only
 def search_menu():
-    """Search menu items by name or category"""
+    """Search menu items by name, optionally within a category"""
     params = request.args.to_dict()
     name = params.get("name", "").strip()
-    category_id = CommonUtils.safe_int(params.get("category_id", ""))
+    category_id = CommonUtils.safe_int(params.get("category_id", "")) or None
+    limit = CommonUtils.safe_int(params.get("limit", ""))
+    if limit <= 0:
+        limit = Config.SEARCH_LIMIT_DEFAULT
 
-    if not (name and category_id):
-        return (
-            jsonify({"success": False, "message": "Provide category_id and name"}),
-            400,
-        )
+    if not name:
+        return jsonify({"success": False, "message": "Provide name"}), 400
 
-    menu_items = MenuService.search_menu_items(name=name, category_id=category_id)
+    menu_items = MenuService.search_menu_items(
+        name=name, category_id=category_id, limit=min(limit, Config.PAGE_SIZE_MAX)
+    )
     return jsonify({"success": True, "menu_items": menu_items}), 200
 
 
@@ -126,3 +162,77 @@ def update_description(menu_id):
     if not result["success"]:
         return jsonify(result), 404
     return jsonify(result), 200
+
+
+@menu.route("/import", methods=["POST"])
+@token_required
+def import_menu_items():
+    """Insert or update menu items from a CSV or JSON lines body"""
+    try:
+        rows = BulkUtils.iter_rows(request.stream, request.mimetype)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 415
+
+    result = MenuService.import_menu_items(rows)
+    if not result["success"]:
+        return jsonify(result), 400
+    return jsonify(result), 200
+
+
+@menu.route("/export", methods=["GET"])
+@token_required
+def export_menu_items():
+    """Stream every menu item as CSV or JSON lines"""
+    export_format = request.args.get("format", "csv")
+    if export_format not in ("csv", "jsonl"):
+        return jsonify({"success": False, "message": "Invalid format"}), 400
+
+    columns = [
+        "id",
+        "name",
+        "category_id",
+        "category_name",
+        "price",
+        "quantity",
+        "description",
+    ]
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        writer.writeheader()
+        for i, row in enumerate(MenuService.export_menu_items(), start=1):
+            writer.writerow(row)
+            if i % 100 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate_json_lines():
+        for row in MenuService.export_menu_items():
+            yield dumps(row) + "\n"
+
+    if export_format == "csv":
+        body, mimetype = generate_csv(), CSV_MIMETYPES[0]
+    else:
+        body, mimetype = generate_json_lines(), JSON_LINES_MIMETYPES[0]
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=menu.{export_format}"},
+    )
+
+
+@menu.route("/quantities", methods=["PUT"])
+@token_required
+def add_quantities():
+    """Add quantity to many menu items at once"""
+    data = request.json or {}
+    items = data.get("items")
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "message": "Provide items"}), 400
+
+    result = MenuService.add_quantities(items)
+    return jsonify(result), 200
@@ -0,0 +1,69 @@
+from flask import Blueprint, Response, current_app, request
+
+from app.utils.auth import token_required
+from app.utils.db_pool import PoolUtils
+from app.utils.json import jsonify
+from app import db, intake, limiter, profiler
+
+monitor = Blueprint("monitor", __name__)
+
+
+@monitor.route("/metrics", methods=["GET"])
+def metrics():
+    """Export request, rate limit, intake and connection pool metrics for Prometheus"""
+    lines = list(profiler.prometheus()) if profiler.enabled else []
+    if limiter.enabled:
+        lines.extend(limiter.prometheus())
+    if intake.journal is not None:
+        lines.extend(intake.prometheus())
+
+    pools = PoolUtils.status(current_app)
+    for key in next(iter(pools.values()), {}):
+        metric = f"ca_db_pool_{key}"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend(
+            f'{metric}{{bind="{bind}"}} {status[key]}' for bind, status in pools.items()
+        )
+
+    replicas = db.router.status()
+    if replicas:
+        lines.append("# TYPE ca_db_replica_up gauge")
+        lines.extend(
+            f'ca_db_replica_up{{bind="{bind}"}} {int(up)}'
+            for bind, up in replicas.items()
+        )
+
+    return Response(
+        "\n".join(lines) + "\n",
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@monitor.route("/metrics/pool", methods=["GET"])
+def pool_metrics():
+    """Get database connection pool usage and which replicas are in use"""
+    return (
+        jsonify(
+            {
+                "success": True,
+                "pools": PoolUtils.status(current_app),
+                "replicas": db.router.status(),
+            }
+        ),
+        200,
+    )
+
+
+@monitor.route("/metrics/requests", methods=["GET"])
+@token_required
+def request_metrics():
+    """Get the profiled requests aggregated per endpoint, for staff only"""
+    # The slowest statements are raw SQL, and customers log in with a phone
+    if not request.user.get("is_staff"):
+        return jsonify({"success": False, "message": "Staff only"}), 403
+    if not profiler.enabled:
+        return (
+            jsonify({"success": False, "message": "Instrumentation is disabled"}),
+            404,
+        )
+    return jsonify({"success": True, "endpoints": profiler.summary()}), 200
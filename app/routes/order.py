@@ -1,17 +1,36 @@
 from datetime import datetime
-import json
+import queue
 import time
-from flask import Blueprint, Response, request, jsonify
+from flask import Blueprint, Response, current_app, request, stream_with_context
 from app.models.order import Order, OrderItem, OrderStatus
-from app.models.menu import MenuItem
-from app import db
+from app.services.order import OrderService
+from app.utils.common import CommonUtils
+from app.utils.fields import FieldsUtils
+from app.utils.idempotency import idempotent
+from app.utils.intake import validate_lines
+from app.utils.pagination import PaginationUtils
+from app.utils.json import dumps, jsonify
+from app.utils.replica import read_only
+from app import db, events, intake, kitchen_queue
 
 order = Blueprint("order", __name__)
 
 
+def _created_order(order_id):
+    """The response of an order placed by a request that died before answering"""
+    order = OrderService.get_order(order_id)
+    return jsonify({"success": True, "order": order.to_dict()}), 201
+
+
 @order.route("/", methods=["POST"])
+@idempotent(recover=_created_order)
 def create_order():
-    """Create a new order"""
+    """
+    Create a new order, retries sending the same Idempotency-Key are replayed.
+
+    With the write-behind intake enabled, the order is only journaled and
+    the response is a 202 with its provisional ID, see ``GET /order/<id>``.
+    """
     data = request.get_json()
 
     if (
@@ -21,68 +40,21 @@ def create_order():
     ):
         return jsonify({"success": False, "message": "Missing required fields"}), 400
 
-    # Create new order
-    new_order = Order(customer_phone=phone, status=OrderStatus.PROCESSING.value)
-
-    db.session.add(new_order)
-    db.session.flush()  # Get the order ID
-
-    total_price = 0
-
-    # Add order items
-    for item_data in menu_items:
-        menu_item_id = item_data.get("id")
-        quantity = item_data.get("quantity", 1)
-
-        # Verify the menu item exists
-        menu_item = MenuItem.query.get(menu_item_id)
-        if not menu_item:
-            db.session.rollback()
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "message": f"Menu item with id {menu_item_id} not found",
-                    }
-                ),
-                404,
-            )
-
-        # Check if quantity is available
-        if menu_item.quantity < quantity:
-            db.session.rollback()
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "message": f"Not enough quantity available for {menu_item.name}",
-                    }
-                ),
-                400,
-            )
+    if error := validate_lines(menu_items):
+        return jsonify({"success": False, "message": error}), 400
 
-        # Create order item
-        order_item = OrderItem(
-            order_id=new_order.id,
-            menu_item_id=menu_item_id,
-            quantity=quantity,
-            price=menu_item.price * quantity,
+    if intake.enabled:
+        provisional = intake.submit(phone=str(phone), menu_items=menu_items)
+        return (
+            jsonify({"success": True, "order": provisional}),
+            202,
+            {"Location": f"{request.path.rstrip('/')}/{provisional['id']}"},
         )
 
-        # Update total price
-        total_price += order_item.price
-
-        # Update menu item quantity
-        menu_item.quantity -= quantity
-
-        db.session.add(order_item)
-
-    # Update order total price
-    new_order.total_price = total_price
-
-    db.session.commit()
-
-    return jsonify({"success": True, "order": new_order.to_dict()}), 201
+    result, status_code = OrderService.create_order(phone=phone, menu_items=menu_items)
+    if result["success"]:
+        events.publish("order_created", result["order"])
+    return jsonify(result), status_code
 
 
 @order.route("/<int:order_id>/status", methods=["PUT"])
@@ -104,8 +76,8 @@ def update_order_status(order_id):
     if new_status not in valid_statuses:
         return jsonify({"success": False, "message": "Invalid status value"}), 400
 
-    # Find the order
-    order = Order.query.get(order_id)
+    # Update the status
+    order = OrderService.update_status(order_id, OrderStatus.to_int(new_status))
     if not order:
         return (
             jsonify(
@@ -114,54 +86,141 @@ def update_order_status(order_id):
             404,
         )
 
-    # Update the status
-    order.status = OrderStatus.to_int(new_status)
-    db.session.commit()
-
-    return jsonify({"success": True, "order": order.to_dict()}), 200
+    order_data = order.to_dict()
+    events.publish("order_status_updated", order_data)
+    return jsonify({"success": True, "order": order_data}), 200
 
 
 @order.route("/", methods=["GET"])
+@read_only
 def get_orders():
-    """Get all orders with optional filtering by status"""
+    """
+    Get a page of orders with optional filtering by status, or every
+    matching order without ``limit`` and ``cursor``.
+
+    Clients predating pagination never follow ``next_cursor``, they keep
+    getting every order in one response, like the menu.
+    """
     status = request.args.get("status")
     phone = request.args.get("phone")
-
-    query = Order.query
-
-    if status:
-        query = query.filter(Order.status == status)
-
-    if phone:
-        query = query.filter(Order.customer_phone == phone)
-
-    orders = query.order_by(Order.status).all()
+    limit = None
+    if "limit" in request.args or "cursor" in request.args:
+        limit = PaginationUtils.parse_limit(request.args.get("limit", ""))
+    fields = FieldsUtils.parse(request.args.get("fields"))
+    try:
+        cursor = PaginationUtils.decode_cursor(request.args.get("cursor"), 2)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    orders, next_cursor = OrderService.list_orders(
+        status=status, phone=phone, limit=limit, cursor=cursor, fields=fields
+    )
 
     return (
-        jsonify({"success": True, "orders": [order.to_dict() for order in orders]}),
+        jsonify(
+            {
+                "success": True,
+                "orders": orders,
+                "next_cursor": next_cursor,
+            }
+        ),
         200,
     )
 
 
 @order.route("/byphone", methods=["GET"])
+@read_only
 def get_orders_by_phone():
-    """Get all orders for a specific phone number"""
+    """
+    Get a page of orders for a specific phone number, or all of them without
+    ``limit`` and ``cursor``, see :func:`get_orders`.
+    """
     phone = request.args.get("phone") or ""
+    limit = None
+    if "limit" in request.args or "cursor" in request.args:
+        limit = PaginationUtils.parse_limit(request.args.get("limit", ""))
+    fields = FieldsUtils.parse(request.args.get("fields"))
+    try:
+        cursor = PaginationUtils.decode_cursor(request.args.get("cursor"), 2)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
     if phone:
-        orders = (
-            Order.query.filter(Order.customer_phone == phone)
-            .order_by(Order.status)
-            .all()
+        orders, next_cursor = OrderService.list_orders(
+            phone=phone, limit=limit, cursor=cursor, fields=fields
         )
     else:
-        orders = []
+        orders, next_cursor = [], None
 
     return (
-        jsonify({"success": True, "orders": [order.to_dict() for order in orders]}),
+        jsonify(
+            {
+                "success": True,
+                "orders": orders,
+                "next_cursor": next_cursor,
+            }
+        ),
         200,
     )
 
 
+@order.route("/stream", methods=["GET"])
+def stream_orders():
+    """Stream order changes as server-sent events, optionally filtered"""
+    status = request.args.get("status")
+    phone = request.args.get("phone")
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    heartbeat = current_app.config["ORDER_STREAM_HEARTBEAT"]
+
+    def matches(order_data):
+        if status and order_data["status"] != status:
+            return False
+        if phone and order_data["customer_phone"] != phone:
+            return False
+        return True
+
+    subscription = events.subscribe(
+        matches,
+        last_event_id=(
+            CommonUtils.safe_int(last_event_id) if last_event_id.strip() else None
+        ),
+    )
+
+    def generate():
+        try:
+            if subscription.reset:
+                # Some events can't be replayed, the client must reload its orders
+                yield "event: reset\ndata: {}\n\n"
+            while True:
+                try:
+                    event = subscription.get(timeout=heartbeat)
+                except queue.Empty:
+                    # The client fell behind, it reconnects with Last-Event-ID
+                    return
+                if event is None:
+                    yield f": heartbeat {int(time.time())}\n\n"
+                    continue
+                event_id, name, data = event
+                yield f"id: {event_id}\nevent: {name}\ndata: {dumps(data)}\n\n"
+        finally:
+            events.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@order.route("/kitchen", methods=["GET"])
+def kitchen_queue_changes():
+    """Get the active orders changed since the ``since`` version, by status"""
+    changes = kitchen_queue.changes(
+        request.args.get("since"), OrderService.list_kitchen_orders
+    )
+    return jsonify({"success": True, **changes}), 200
+
+
 @order.route("/<int:order_id>/check", methods=["PUT"])
 def check_my_order(order_id):
     """Check if the order exists"""
@@ -184,13 +243,16 @@ def check_my_order(order_id):
     order.updated_at = datetime.utcnow()
     db.session.commit()
 
-    return jsonify({"success": True, "order": order.to_dict()}), 200
+    order_data = order.to_dict()
+    events.publish("order_checked", order_data)
+    return jsonify({"success": True, "order": order_data}), 200
 
 
 @order.route("/<int:order_id>", methods=["GET"])
+@read_only
 def get_order(order_id):
     """Get a specific order by ID"""
-    order = Order.query.get(order_id)
+    order = OrderService.get_order(order_id)
 
     if not order:
         return (
@@ -201,3 +263,24 @@ def get_order(order_id):
         )
 
     return jsonify({"success": True, "order": order.to_dict()}), 200
+
+
+@order.route("/<string:intake_id>", methods=["GET"])
+def get_provisional_order(intake_id):
+    """Get an order taken by the write-behind intake by its provisional ID"""
+    result = intake.status(intake_id)
+    if result is None:
+        # Taken by another host, or its journal entry was purged
+        order = Order.query.filter(Order.intake_id == intake_id).first()
+        if not order:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "message": f"Order with id {intake_id} not found",
+                    }
+                ),
+                404,
+            )
+        result = {"success": True, "order": order.to_dict()}, 200
+    return jsonify(result[0]), result[1]
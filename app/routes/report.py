@@ -0,0 +1,110 @@
+from datetime import date, datetime, timedelta
+from typing import Tuple
+
+from flask import Blueprint, request
+
+from app.config import Config
+from app.services.analytics import AnalyticsService
+from app.utils.auth import token_required
+from app.utils.json import jsonify
+from app.utils.common import CommonUtils
+
+report = Blueprint("report", __name__)
+
+
+def _date_range() -> Tuple[date, date]:
+    """
+    Read the ``from`` and ``to`` days (``YYYY-MM-DD``, UTC) of a report.
+
+    Both default to the last seven days ending today.
+
+    :raises ValueError: On a malformed day or a range longer than allowed.
+    """
+    today = datetime.utcnow().date()
+    try:
+        end = datetime.strptime(request.args.get("to") or today.isoformat(), "%Y-%m-%d")
+        start = datetime.strptime(
+            request.args.get("from") or (end.date() - timedelta(days=6)).isoformat(),
+            "%Y-%m-%d",
+        )
+    except ValueError:
+        raise ValueError("Invalid date, expected YYYY-MM-DD")
+
+    if start > end:
+        raise ValueError("from must not be after to")
+    if (end - start).days >= Config.REPORT_MAX_DAYS:
+        raise ValueError(f"Reports cover at most {Config.REPORT_MAX_DAYS} days")
+    return start.date(), end.date()
+
+
+@report.route("/sales", methods=["GET"])
+@token_required
+def sales():
+    """Get orders, items sold and revenue per day, or per hour"""
+    try:
+        start, end = _date_range()
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    hourly = request.args.get("granularity") == "hour"
+    return (
+        jsonify(
+            {
+                "success": True,
+                "sales": AnalyticsService.sales(start, end, hourly=hourly),
+            }
+        ),
+        200,
+    )
+
+
+@report.route("/best-sellers", methods=["GET"])
+@token_required
+def best_sellers():
+    """Get the menu items that sold the most units"""
+    try:
+        start, end = _date_range()
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    limit = CommonUtils.safe_int(request.args.get("limit", ""))
+    if limit <= 0:
+        limit = Config.REPORT_LIMIT_DEFAULT
+    limit = min(limit, Config.PAGE_SIZE_MAX)
+
+    return (
+        jsonify(
+            {
+                "success": True,
+                "menu_items": AnalyticsService.best_sellers(start, end, limit),
+            }
+        ),
+        200,
+    )
+
+
+@report.route("/categories", methods=["GET"])
+@token_required
+def categories():
+    """Get units sold and revenue per category"""
+    try:
+        start, end = _date_range()
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    return (
+        jsonify(
+            {
+                "success": True,
+                "categories": AnalyticsService.category_sales(start, end),
+            }
+        ),
+        200,
+    )
+
+
+@report.route("/status", methods=["GET"])
+@token_required
+def status_counts():
+    """Get the number of orders in each status"""
+    return jsonify({"success": True, "statuses": AnalyticsService.status_counts()}), 200
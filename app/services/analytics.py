@@ -0,0 +1,378 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.config import Config
+from app.models.analytics import (
+    DailyCategorySales,
+    DailyMenuItemSales,
+    HourlySales,
+    OrderStatusCount,
+)
+from app.models.order import Order, OrderItem, OrderStatus
+from app.utils.bulk import BulkUtils
+from app.utils.db import DbUtils
+from app import db
+
+
+class AnalyticsService:
+    @classmethod
+    def shard(cls, order_id: int) -> int:
+        """Get the rollup shard an order counts in"""
+        return order_id % current_app.config["ANALYTICS_SHARDS"]
+
+    @classmethod
+    def record_order(cls, order: Order, items: Iterable[Dict[str, Any]]) -> None:
+        """
+        Add a new order to the rollups, in the caller's transaction.
+
+        Every rollup row of the order's shard is bumped with an atomic upsert,
+        so concurrent orders never lose an increment, and only wait for each
+        other when they share a shard. Nothing is committed here.
+
+        :param order: The flushed order, with its ``created_at`` and status.
+        :param items: The order item mappings, with their snapshot columns.
+        """
+        items = list(items)
+        hour = order.created_at.replace(minute=0, second=0, microsecond=0)
+        day = hour.date()
+        shard = cls.shard(order.id)
+
+        by_menu_item: Dict[int, Dict[str, Any]] = {}
+        by_category: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            row = by_menu_item.setdefault(
+                item["menu_item_id"],
+                {
+                    "day": day,
+                    "menu_item_id": item["menu_item_id"],
+                    "shard": shard,
+                    "item_name": item["item_name"],
+                    "category_name": item["category_name"],
+                    "quantity": 0,
+                    "revenue": 0.0,
+                },
+            )
+            row["quantity"] += item["quantity"]
+            row["revenue"] += item["price"]
+            row = by_category.setdefault(
+                item["category_name"] or "",
+                {
+                    "day": day,
+                    "category_name": item["category_name"] or "",
+                    "shard": shard,
+                    "quantity": 0,
+                    "revenue": 0.0,
+                },
+            )
+            row["quantity"] += item["quantity"]
+            row["revenue"] += item["price"]
+
+        db.session.execute(
+            cls._hourly_upsert(),
+            {
+                "hour": hour,
+                "shard": shard,
+                "orders": 1,
+                "items": sum(item["quantity"] for item in items),
+                "revenue": order.total_price,
+            },
+        )
+        # Sorted keys keep row locks in a consistent order across transactions
+        if by_menu_item:
+            db.session.execute(
+                cls._menu_item_upsert(),
+                [by_menu_item[key] for key in sorted(by_menu_item)],
+            )
+            db.session.execute(
+                cls._category_upsert(),
+                [by_category[key] for key in sorted(by_category)],
+            )
+        cls.record_status_change(order.id, None, order.status)
+
+    @classmethod
+    def record_status_change(cls, order_id: int, old_status, new_status) -> None:
+        """
+        Move an order between status counters, in the caller's transaction.
+
+        :param order_id: The ID of the order, picking the counters' shard.
+        :param old_status: The previous status value, None for a new order.
+        :param new_status: The new status value.
+        """
+        if old_status == new_status:
+            return
+        shard = cls.shard(order_id)
+        changes = [{"status": new_status, "shard": shard, "orders": 1}]
+        if old_status is not None:
+            changes.append({"status": old_status, "shard": shard, "orders": -1})
+        db.session.execute(
+            DbUtils.upsert(
+                OrderStatusCount.__table__,
+                index_elements=("status", "shard"),
+                increment_columns=("orders",),
+            ),
+            sorted(changes, key=lambda change: change["status"]),
+        )
+
+    @classmethod
+    def rebuild(cls, batch_size: int = Config.BULK_BATCH_SIZE) -> dict:
+        """
+        Recompute every rollup from the order history.
+
+        Orders and their items are streamed in batches and aggregated in
+        memory, which only holds one entry per rollup row. The old rollups
+        are replaced in the same transaction, by rows of shard 0, orders
+        placed while it runs may be missed, so run it while orders are paused.
+
+        :param batch_size: The number of rows fetched per round trip.
+        :return: The number of orders processed.
+        """
+        hourly: Dict[datetime, Dict[str, Any]] = {}
+        by_menu_item: Dict[Tuple[date, int], Dict[str, Any]] = {}
+        by_category: Dict[Tuple[date, str], Dict[str, Any]] = {}
+
+        rows = (
+            db.session.query(
+                Order.id,
+                Order.created_at,
+                Order.total_price,
+                OrderItem.menu_item_id,
+                OrderItem.item_name,
+                OrderItem.category_name,
+                OrderItem.quantity,
+                OrderItem.price,
+            )
+            .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+            .order_by(Order.id, OrderItem.id)
+            .yield_per(batch_size)
+        )
+
+        last_order_id = None
+        orders = 0
+        for row in rows:
+            hour = row.created_at.replace(minute=0, second=0, microsecond=0)
+            day = hour.date()
+            sales = hourly.setdefault(
+                hour,
+                {"hour": hour, "shard": 0, "orders": 0, "items": 0, "revenue": 0.0},
+            )
+            if row.id != last_order_id:
+                last_order_id = row.id
+                orders += 1
+                sales["orders"] += 1
+                sales["revenue"] += row.total_price or 0.0
+            if row.quantity is None:
+                continue  # An order without items
+            sales["items"] += row.quantity
+
+            menu_item_id = row.menu_item_id or 0
+            item = by_menu_item.setdefault(
+                (day, menu_item_id),
+                {
+                    "day": day,
+                    "menu_item_id": menu_item_id,
+                    "shard": 0,
+                    "item_name": None,
+                    "category_name": None,
+                    "quantity": 0,
+                    "revenue": 0.0,
+                },
+            )
+            # Rows come in order, keep the latest known names
+            item["item_name"] = row.item_name or item["item_name"]
+            item["category_name"] = row.category_name or item["category_name"]
+            item["quantity"] += row.quantity
+            item["revenue"] += row.price
+
+            category_name = row.category_name or ""
+            category = by_category.setdefault(
+                (day, category_name),
+                {
+                    "day": day,
+                    "category_name": category_name,
+                    "shard": 0,
+                    "quantity": 0,
+                    "revenue": 0.0,
+                },
+            )
+            category["quantity"] += row.quantity
+            category["revenue"] += row.price
+
+        statuses = (
+            db.session.query(Order.status, func.count(Order.id))
+            .group_by(Order.status)
+            .all()
+        )
+
+        for model, values in (
+            (HourlySales, list(hourly.values())),
+            (DailyMenuItemSales, list(by_menu_item.values())),
+            (DailyCategorySales, list(by_category.values())),
+            (
+                OrderStatusCount,
+                [
+                    {"status": status, "shard": 0, "orders": count}
+                    for status, count in statuses
+                ],
+            ),
+        ):
+            db.session.execute(model.__table__.delete())
+            for chunk in BulkUtils.chunks(values, batch_size):
+                db.session.execute(model.__table__.insert(), chunk)
+        db.session.commit()
+        return {"success": True, "orders": orders}
+
+    @classmethod
+    def sales(cls, start: date, end: date, hourly: bool = False) -> List[dict]:
+        """
+        Get the orders, items sold and revenue of each day or hour.
+
+        :param start: The first day, inclusive.
+        :param end: The last day, inclusive.
+        :param hourly: Report hours instead of days.
+        :return: One entry per day or hour with sales, oldest first.
+        """
+        rows = (
+            db.session.query(
+                HourlySales.hour,
+                func.sum(HourlySales.orders).label("orders"),
+                func.sum(HourlySales.items).label("items"),
+                func.sum(HourlySales.revenue).label("revenue"),
+            )
+            .filter(
+                HourlySales.hour >= datetime.combine(start, datetime.min.time()),
+                HourlySales.hour
+                < datetime.combine(end + timedelta(days=1), datetime.min.time()),
+            )
+            .group_by(HourlySales.hour)
+            .order_by(HourlySales.hour)
+            .all()
+        )
+        if hourly:
+            return [
+                {
+                    "hour": row.hour.isoformat(),
+                    "orders": row.orders,
+                    "items": row.items,
+                    "revenue": row.revenue,
+                }
+                for row in rows
+            ]
+
+        days: Dict[date, Dict[str, Any]] = {}
+        for row in rows:
+            day = days.setdefault(
+                row.hour.date(),
+                {
+                    "day": row.hour.date().isoformat(),
+                    "orders": 0,
+                    "items": 0,
+                    "revenue": 0.0,
+                },
+            )
+            day["orders"] += row.orders
+            day["items"] += row.items
+            day["revenue"] += row.revenue
+        return list(days.values())
+
+    @classmethod
+    def best_sellers(cls, start: date, end: date, limit: int) -> List[dict]:
+        """
+        Get the menu items that sold the most units between two days.
+
+        :param start: The first day, inclusive.
+        :param end: The last day, inclusive.
+        :param limit: The maximum number of menu items.
+        :return: The best-selling menu items, best first.
+        """
+        quantity = func.sum(DailyMenuItemSales.quantity).label("quantity")
+        rows = (
+            db.session.query(
+                DailyMenuItemSales.menu_item_id,
+                func.max(DailyMenuItemSales.item_name).label("item_name"),
+                func.max(DailyMenuItemSales.category_name).label("category_name"),
+                quantity,
+                func.sum(DailyMenuItemSales.revenue).label("revenue"),
+            )
+            .filter(DailyMenuItemSales.day.between(start, end))
+            .group_by(DailyMenuItemSales.menu_item_id)
+            .order_by(quantity.desc(), DailyMenuItemSales.menu_item_id)
+            .limit(limit)
+        )
+        return [
+            {
+                "menu_item_id": row.menu_item_id or None,
+                "name": row.item_name,
+                "category_name": row.category_name,
+                "quantity": row.quantity,
+                "revenue": row.revenue,
+            }
+            for row in rows
+        ]
+
+    @classmethod
+    def category_sales(cls, start: date, end: date) -> List[dict]:
+        """
+        Get the units sold and revenue of each category between two days.
+
+        :param start: The first day, inclusive.
+        :param end: The last day, inclusive.
+        :return: The categories ordered by revenue, highest first.
+        """
+        revenue = func.sum(DailyCategorySales.revenue).label("revenue")
+        rows = (
+            db.session.query(
+                DailyCategorySales.category_name,
+                func.sum(DailyCategorySales.quantity).label("quantity"),
+                revenue,
+            )
+            .filter(DailyCategorySales.day.between(start, end))
+            .group_by(DailyCategorySales.category_name)
+            .order_by(revenue.desc())
+        )
+        return [
+            {
+                "category_name": row.category_name or None,
+                "quantity": row.quantity,
+                "revenue": row.revenue,
+            }
+            for row in rows
+        ]
+
+    @classmethod
+    def status_counts(cls) -> Dict[str, int]:
+        """Get the number of orders in each status"""
+        counts = {status.name: 0 for status in OrderStatus}
+        rows = db.session.query(
+            OrderStatusCount.status, func.sum(OrderStatusCount.orders)
+        ).group_by(OrderStatusCount.status)
+        for status, orders in rows:
+            counts[OrderStatus(status).name] = orders
+        return counts
+
+    @classmethod
+    def _hourly_upsert(cls):
+        return DbUtils.upsert(
+            HourlySales.__table__,
+            index_elements=("hour", "shard"),
+            increment_columns=("orders", "items", "revenue"),
+        )
+
+    @classmethod
+    def _menu_item_upsert(cls):
+        return DbUtils.upsert(
+            DailyMenuItemSales.__table__,
+            index_elements=("day", "menu_item_id", "shard"),
+            update_columns=("item_name", "category_name"),
+            increment_columns=("quantity", "revenue"),
+        )
+
+    @classmethod
+    def _category_upsert(cls):
+        return DbUtils.upsert(
+            DailyCategorySales.__table__,
+            index_elements=("day", "category_name", "shard"),
+            increment_columns=("quantity", "revenue"),
+        )
@@ -1,8 +1,9 @@
 from typing import Dict
 from app.models.user import User
-from app import db
+from app import db, password_pool
 import jwt
 import datetime
+from werkzeug.security import check_password_hash
 from app.config import Config
 
 
@@ -17,13 +18,23 @@ class AuthService:
         """Add a user with the given phone number"""
         if is_staff:
             user = User(phone=phone, is_staff=True)
-            user.set_password(password)
+            password_pool.run(user.set_password, password)
         else:
             user = User(phone=phone, is_staff=False)
         db.session.add(user)
         db.session.commit()
         return user
 
+    @classmethod
+    def check_password(cls, user: User, password: str) -> bool:
+        """
+        Verify a user's password on the password hashing pool.
+
+        :raises PoolSaturatedError: If too many passwords are being checked.
+        """
+        # Read the hash here, the pool thread has no app context or session
+        return password_pool.run(check_password_hash, user.password_hash, password)
+
     @classmethod
     def generate_jwt_token(cls, user: User) -> str:
         """
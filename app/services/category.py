@@ -1,6 +1,6 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 from app.models.category import Category
-from app import db
+from app import cache, db
 
 
 class CategoryService:
@@ -9,12 +9,25 @@ class CategoryService:
         category = Category(name=name)
         db.session.add(category)
         db.session.commit()
+        cache.invalidate()
         return category
 
     @classmethod
-    def get_all_categories(cls) -> List[Category]:
-        return Category.query.all()
+    def get_all_categories(cls) -> List[Dict[str, Union[int, str]]]:
+        return cache.get_or_load("categories", cls._load_categories)
+
+    @classmethod
+    def _load_categories(cls) -> List[Dict[str, Union[int, str]]]:
+        return [category.to_dict() for category in Category.query.all()]
 
     @classmethod
     def get_category_by_id(cls, category_id: str) -> Optional[Category]:
         return Category.query.filter_by(id=category_id).first()
+
+    @classmethod
+    def is_name_taken(cls, name: str, exclude_id: Optional[int] = None) -> bool:
+        """Check if a category other than ``exclude_id`` already has a name"""
+        query = Category.query.filter(Category.name == name)
+        if exclude_id is not None:
+            query = query.filter(Category.id != exclude_id)
+        return db.session.query(query.exists()).scalar()
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models.idempotency import IdempotencyKey
+from app import db
+
+
+class IdempotencyService:
+    @classmethod
+    def claim(
+        cls, key: str, request_hash: str, ttl: int, lock_timeout: int
+    ) -> Optional[IdempotencyKey]:
+        """
+        Insert a key before running its request, committed right away.
+
+        A key that expired, or whose request has been running for longer
+        than ``lock_timeout`` (its worker likely died) without creating
+        anything, is taken over.
+
+        :param key: The scoped idempotency key.
+        :param request_hash: The fingerprint of the request.
+        :param ttl: The seconds the stored response is kept.
+        :param lock_timeout: The seconds after which a running request is
+            considered abandoned.
+        :return: None if the key was claimed, otherwise the existing row,
+            either running (no ``status_code``) or completed.
+        """
+        now = datetime.utcnow()
+        while True:
+            try:
+                db.session.add(
+                    IdempotencyKey(
+                        key=key,
+                        request_hash=request_hash,
+                        created_at=now,
+                        expires_at=now + timedelta(seconds=ttl),
+                    )
+                )
+                db.session.commit()
+                return None
+            except IntegrityError:
+                db.session.rollback()
+
+            result = db.session.execute(
+                delete(IdempotencyKey)
+                .where(
+                    IdempotencyKey.key == key,
+                    or_(
+                        IdempotencyKey.expires_at <= now,
+                        and_(
+                            IdempotencyKey.status_code.is_(None),
+                            IdempotencyKey.resource_id.is_(None),
+                            IdempotencyKey.created_at
+                            <= now - timedelta(seconds=lock_timeout),
+                        ),
+                    ),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            if result.rowcount == 1:
+                continue  # Taken over, insert it again
+
+            row = IdempotencyKey.query.populate_existing().get(key)
+            if row is not None:
+                return row
+            # Released or purged since the insert failed, insert it again
+
+    @classmethod
+    def link(cls, key: str, resource_id: int) -> None:
+        """Tie a key to what its request created, in the caller's transaction"""
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key)
+            .values(resource_id=resource_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def complete(cls, key: str, status_code: int, response: str) -> None:
+        """Store the response of a claimed key"""
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key)
+            .values(status_code=status_code, response=response)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @classmethod
+    def release(cls, key: str) -> None:
+        """Drop a claimed key whose request failed before creating anything"""
+        db.session.execute(
+            delete(IdempotencyKey)
+            .where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.status_code.is_(None),
+                IdempotencyKey.resource_id.is_(None),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @classmethod
+    def purge(cls) -> int:
+        """
+        Delete the expired keys.
+
+        :return: The number of keys deleted.
+        """
+        result = db.session.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.expires_at <= datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
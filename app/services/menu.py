@@ -1,39 +1,152 @@
-from typing import List, Dict, Union
+import csv
+import hashlib
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Iterable, Iterator, List, Dict, Optional, Set, Tuple, Union
 
+from flask import current_app
 from MySQLdb import IntegrityError
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
 
+from app.config import Config
+from app.models.category import Category
 from app.models.menu import MenuItem
-from app import db
+from app.services.stock import StockService
+from app.utils.bulk import BulkRow, BulkUtils
+from app.utils.common import CommonUtils
+from app.utils.db import DbUtils
+from app.utils.fields import Fields, FieldsUtils
+from app.utils.pagination import PaginationUtils
+from app import cache, db, search_index
 
 
 class MenuService:
     @classmethod
-    def get_all_menu_items(cls) -> List[Dict[str, Union[int, str, float, None]]]:
+    def get_all_menu_items(
+        cls,
+        limit: Optional[int] = None,
+        cursor: Optional[List[int]] = None,
+        fields: Fields = None,
+    ) -> Tuple[List[Dict[str, Union[int, str, float, None]]], Optional[str]]:
         """
-        Retrieve all menu items.
+        Retrieve a page of menu items ordered by ID.
+
+        Pages are sliced from the cached catalog, so this only touches the
+        database when the catalog cache is cold or was invalidated, and to
+        refresh the quantities, see :meth:`stock`.
 
-        :return: A list of dictionaries representing menu items.
+        :param limit: The maximum number of menu items to return, None for
+            every menu item after the cursor.
+        :param cursor: The ``(id,)`` of the last menu item of the previous page.
+        :param fields: The projection to serialize menu items with.
+        :return: A list of dictionaries representing menu items and the cursor
+            of the next page, if there is one.
         """
-        menu_items = MenuItem.query.all()
+        menu_items = cache.get_or_load("menu_items", cls._load_menu_items)
+
+        start = 0
+        if cursor:
+            menu_item_ids = cache.get_or_load(
+                "menu_item_ids", lambda: [item["id"] for item in menu_items]
+            )
+            start = bisect_right(menu_item_ids, cursor[0])
+        end = len(menu_items) if limit is None else start + limit
+        page = menu_items[start:end]
+
+        next_cursor = None
+        if end < len(menu_items):
+            next_cursor = PaginationUtils.encode_cursor(page[-1]["id"])
+        quantities = cls.stock()["quantities"]
+        return [cls._project(item, fields, quantities) for item in page], next_cursor
+
+    @classmethod
+    def _load_menu_items(cls) -> List[Dict[str, Union[int, str, float, None]]]:
+        """Load every menu item ordered by ID, serialized for the catalog cache"""
+        menu_items = (
+            MenuItem.query.options(joinedload(MenuItem.category))
+            .order_by(MenuItem.id)
+            .all()
+        )
         return [item.to_dict() for item in menu_items]
 
+    @classmethod
+    def stock(cls) -> Dict[str, Any]:
+        """
+        Get the quantity of every menu item, cached for ``CATALOG_STOCK_TTL``.
+
+        Orders change quantities all the time, so they are served over the
+        cached catalog instead of invalidating it: served quantities may lag
+        by the TTL, orders still check the stock in the database.
+
+        :return: The quantities keyed by menu item ID, and a ``stamp`` of
+            them for the ETag of the menu.
+        """
+        return cache.get_or_load(
+            "stock", cls._load_stock, ttl=current_app.config["CATALOG_STOCK_TTL"]
+        )
+
+    @classmethod
+    def stock_stamp(cls) -> str:
+        return cls.stock()["stamp"]
+
+    @classmethod
+    def _load_stock(cls) -> Dict[str, Any]:
+        rows = db.session.query(MenuItem.id, MenuItem.quantity).order_by(MenuItem.id)
+        quantities = dict(rows.all())
+        stamp = hashlib.sha1(repr(sorted(quantities.items())).encode()).hexdigest()
+        return {"quantities": quantities, "stamp": stamp}
+
+    @classmethod
+    def _project(
+        cls, item: Dict[str, Any], fields: Fields, quantities: Dict[int, int]
+    ) -> Dict[str, Any]:
+        """Project a cached menu item, with its current quantity"""
+        data = FieldsUtils.project(item, fields)
+        if "quantity" in data and item["id"] in quantities:
+            data = {**data, "quantity": quantities[item["id"]]}
+        return data
+
     @classmethod
     def search_menu_items(
-        cls, name: str, category_id: int
+        cls,
+        name: str,
+        category_id: Optional[int] = None,
+        limit: int = Config.SEARCH_LIMIT_DEFAULT,
     ) -> List[Dict[str, Union[int, str, float, None]]]:
         """
-        Search menu items by name and category ID.
+        Search menu items by name and description, best matches first.
+
+        Matching is diacritic-insensitive and the last term may be a prefix,
+        so results can be shown as the user types. It is answered from the
+        in-memory search index and catalog cache without touching the database.
 
-        :param name: The name of the menu item to search for.
-        :param category_id: The category ID to filter menu items by. Must be an integer.
-        :return: A list of dictionaries representing the filtered menu items.
+        :param name: The text to search for.
+        :param category_id: The category ID to filter menu items by, if any.
+        :param limit: The maximum number of menu items to return.
+        :return: A list of dictionaries representing the matching menu items.
         """
-        query = MenuItem.query.filter(
-            MenuItem.name.ilike(f"%{name}%"), MenuItem.category_id == category_id
+        menu_item_ids = search_index.search(
+            name,
+            lambda: cache.get_or_load("menu_items", cls._load_menu_items),
+            version=cache.version(),
+            category_id=category_id,
+            limit=limit,
         )
-
-        menu_items = query.all()
-        return [item.to_dict() for item in menu_items]
+        menu_items_by_id = cache.get_or_load(
+            "menu_items_by_id",
+            lambda: {
+                item["id"]: item
+                for item in cache.get_or_load("menu_items", cls._load_menu_items)
+            },
+        )
+        quantities = cls.stock()["quantities"]
+        return [
+            cls._project(menu_items_by_id[menu_item_id], None, quantities)
+            for menu_item_id in menu_item_ids
+            if menu_item_id in menu_items_by_id
+        ]
 
     @classmethod
     def add_menu_item(
@@ -66,8 +179,11 @@ class MenuService:
 
             db.session.add(new_item)
             db.session.commit()
+            cache.invalidate()
 
-            return {"success": True, "menu_item": new_item.to_dict()}
+            menu_item_data = new_item.to_dict()
+            search_index.upsert(menu_item_data)
+            return {"success": True, "menu_item": menu_item_data}
         except Exception as e:
             db.session.rollback()
             return {"success": False, "message": str(e._message)}
@@ -80,17 +196,19 @@ class MenuService:
             return {"success": False, "message": "Menu item not found"}
         db.session.delete(menu_item)
         db.session.commit()
+        cache.invalidate()
+        search_index.remove(menu_id)
         return {"success": True, "message": "Menu item deleted successfully"}
 
     @classmethod
     def add_quantity(cls, menu_id: int, quantity: int) -> dict:
         """Add quantity to a menu item"""
-        menu_item = MenuItem.query.get(menu_id)
-        if not menu_item:
+        if not StockService.restock(menu_id, quantity):
+            db.session.rollback()
             return {"success": False, "message": "Menu item not found"}
-        menu_item.quantity += quantity
         db.session.commit()
-        return {"success": True, "menu_item": menu_item.to_dict()}
+        cache.expire("stock")
+        return {"success": True, "menu_item": MenuItem.query.get(menu_id).to_dict()}
 
     @classmethod
     def reduce_quantity(cls, menu_id: int, quantity: int) -> dict:
@@ -98,10 +216,11 @@ class MenuService:
         menu_item = MenuItem.query.get(menu_id)
         if not menu_item:
             return {"success": False, "message": "Menu item not found"}
-        if menu_item.quantity < quantity:
+        if StockService.reserve({menu_id: quantity}) is not None:
+            db.session.rollback()
             return {"success": False, "message": "Insufficient quantity"}
-        menu_item.quantity -= quantity
         db.session.commit()
+        cache.expire("stock")
         return {"success": True, "menu_item": menu_item.to_dict()}
 
     @classmethod
@@ -112,4 +231,167 @@ class MenuService:
             return {"success": False, "message": "Menu item not found"}
         menu_item.description = description
         db.session.commit()
-        return {"success": True, "menu_item": menu_item.to_dict()}
+        cache.invalidate()
+
+        menu_item_data = menu_item.to_dict()
+        search_index.upsert(menu_item_data)
+        return {"success": True, "menu_item": menu_item_data}
+
+    @classmethod
+    def import_menu_items(cls, rows: Iterable[BulkRow]) -> dict:
+        """
+        Insert or update menu items in a single transaction.
+
+        Rows are matched on the ``uq_name_category`` constraint: new items are
+        inserted with their initial quantity, existing ones get their price and
+        description overwritten and keep their stock. Valid rows are written in
+        ``executemany`` batches while the body is still streaming in, invalid
+        rows are skipped and reported.
+
+        :param rows: Parsed rows with ``name``, ``category_id``, ``price`` and
+            optional ``quantity`` and ``description``.
+        :return: A dictionary with the number of imported rows and row errors.
+        """
+        category_ids = {category_id for (category_id,) in db.session.query(Category.id)}
+        stmt = DbUtils.upsert(
+            MenuItem.__table__,
+            index_elements=("name", "category_id"),
+            update_columns=("price", "description", "updated_at"),
+        )
+        now = datetime.utcnow()
+        imported, errors, batch = 0, [], []
+        try:
+            for line, row, error in rows:
+                values = None
+                if not error:
+                    values, error = cls._parse_import_row(row, category_ids)
+                if error:
+                    errors.append({"line": line, "message": error})
+                    continue
+                batch.append({**values, "created_at": now, "updated_at": now})
+                if len(batch) >= Config.BULK_BATCH_SIZE:
+                    db.session.execute(stmt, batch)
+                    imported += len(batch)
+                    batch = []
+            if batch:
+                db.session.execute(stmt, batch)
+                imported += len(batch)
+            db.session.commit()
+        except (SQLAlchemyError, UnicodeDecodeError, csv.Error) as e:
+            db.session.rollback()
+            return {"success": False, "message": str(e), "errors": errors}
+
+        cache.invalidate()
+        search_index.invalidate()
+        return {"success": True, "imported": imported, "errors": errors}
+
+    @classmethod
+    def _parse_import_row(
+        cls, row: Dict[str, Any], category_ids: Set[int]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Validate an import row, return its column values or an error"""
+        name = str(row.get("name") or "").strip()
+        if not name or len(name) > 100:
+            return None, "Invalid name"
+        try:
+            category_id = int(row.get("category_id"))
+            price = float(row.get("price"))
+            quantity = int(row.get("quantity") or 0)
+        except (TypeError, ValueError):
+            return None, "Invalid category_id, price or quantity"
+        if category_id not in category_ids:
+            return None, f"Category with id {category_id} not found"
+        if price < 0 or quantity < 0:
+            return None, "Price and quantity must not be negative"
+        description = str(row.get("description") or "")
+        if len(description) > 255:
+            return None, "Description is too long"
+        return {
+            "name": name,
+            "category_id": category_id,
+            "price": price,
+            "quantity": quantity,
+            "description": description,
+        }, None
+
+    @classmethod
+    def export_menu_items(cls) -> Iterator[Dict[str, Union[int, str, float, None]]]:
+        """
+        Stream every menu item ordered by ID without building ORM objects.
+
+        :return: An iterator of dictionaries with the import columns and the
+            category name.
+        """
+        rows = (
+            db.session.query(
+                MenuItem.id,
+                MenuItem.name,
+                MenuItem.category_id,
+                Category.name.label("category_name"),
+                MenuItem.price,
+                MenuItem.quantity,
+                MenuItem.description,
+            )
+            .join(Category, MenuItem.category_id == Category.id)
+            .order_by(MenuItem.id)
+            .yield_per(Config.BULK_BATCH_SIZE)
+        )
+        for row in rows:
+            yield dict(row._mapping)
+
+    @classmethod
+    def add_quantities(cls, items: List[Dict[str, Any]]) -> dict:
+        """
+        Add quantity to many menu items in a single transaction.
+
+        :param items: Dictionaries with the menu item ``id`` and the
+            ``quantity`` to add.
+        :return: A dictionary with the number of updated items and item errors,
+            keyed by their position in ``items``.
+        """
+        errors, quantities = [], {}
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                item = {}
+            menu_id = CommonUtils.safe_int(item.get("id", ""))
+            quantity = CommonUtils.safe_int(item.get("quantity", ""))
+            if menu_id <= 0 or quantity <= 0:
+                errors.append({"index": index, "message": "Invalid id or quantity"})
+                continue
+            quantities.setdefault(menu_id, []).append((index, quantity))
+
+        existing_ids = set()
+        for chunk in BulkUtils.chunks(list(quantities), Config.BULK_BATCH_SIZE):
+            existing_ids.update(
+                menu_id
+                for (menu_id,) in db.session.query(MenuItem.id).filter(
+                    MenuItem.id.in_(chunk)
+                )
+            )
+
+        params = []
+        for menu_id, entries in quantities.items():
+            if menu_id not in existing_ids:
+                errors.extend(
+                    {"index": index, "message": "Menu item not found"}
+                    for index, _ in entries
+                )
+                continue
+            params.append(
+                {"_id": menu_id, "_quantity": sum(quantity for _, quantity in entries)}
+            )
+
+        table = MenuItem.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("_id"))
+            .values(quantity=table.c.quantity + bindparam("_quantity"))
+        )
+        for chunk in BulkUtils.chunks(params, Config.BULK_BATCH_SIZE):
+            db.session.execute(stmt, chunk)
+        db.session.commit()
+
+        if params:
+            cache.expire("stock")
+        errors.sort(key=lambda error: error["index"])
+        return {"success": True, "updated": len(params), "errors": errors}
@@ -0,0 +1,521 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, or_, update
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.config import Config
+from app.models.category import Category
+from app.models.menu import MenuItem
+from app.models.order import Order, OrderItem, OrderStatus
+from app.services.analytics import AnalyticsService
+from app.services.stock import StockService
+from app.utils.fields import Fields, FieldsUtils
+from app.utils.idempotency import link_resource
+from app.utils.intake import validate_lines
+from app.utils.pagination import PaginationUtils
+from app import db
+
+
+class OrderService:
+    # Columns read by the row-based serializers
+    _ORDER_COLUMNS = (
+        Order.id,
+        Order.customer_phone,
+        Order.status,
+        Order.total_price,
+        Order.created_at,
+    )
+
+    @classmethod
+    def create_order(
+        cls, phone: str, menu_items: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], int]:
+        """
+        Place a new order for the given order lines.
+
+        Every referenced menu item is loaded with a single ``IN (...)`` query,
+        stock is checked in memory for all lines, reserved atomically through
+        :class:`StockService` and the order items are inserted in one batch,
+        each with a snapshot of its menu item's name, price and category.
+
+        :param phone: The customer phone number.
+        :param menu_items: The order lines, each a dict with ``id`` and ``quantity``.
+        :return: The response payload and the HTTP status code.
+        """
+        # A negative quantity would pass the stock guard and add stock
+        if error := validate_lines(menu_items):
+            return {"success": False, "message": error}, 400
+
+        menu_item_ids = {item_data.get("id") for item_data in menu_items}
+        menu_items_by_id = {
+            menu_item.id: menu_item
+            for menu_item in MenuItem.query.options(joinedload(MenuItem.category))
+            .filter(MenuItem.id.in_(menu_item_ids))
+            .all()
+        }
+
+        requested = defaultdict(int)
+        lines = []
+        for item_data in menu_items:
+            menu_item_id = item_data.get("id")
+            quantity = item_data.get("quantity", 1)
+
+            # Verify the menu item exists
+            menu_item = menu_items_by_id.get(menu_item_id)
+            if not menu_item:
+                return {
+                    "success": False,
+                    "message": f"Menu item with id {menu_item_id} not found",
+                }, 404
+
+            # Check if quantity is available
+            if menu_item.quantity < requested[menu_item_id] + quantity:
+                return {
+                    "success": False,
+                    "message": f"Not enough quantity available for {menu_item.name}",
+                }, 400
+
+            requested[menu_item_id] += quantity
+            lines.append((menu_item, quantity))
+
+        # Reserve stock atomically, the check above may be stale by now
+        unavailable_id = StockService.reserve(requested)
+        if unavailable_id is not None:
+            name = menu_items_by_id[unavailable_id].name
+            db.session.rollback()
+            return {
+                "success": False,
+                "message": f"Not enough quantity available for {name}",
+            }, 400
+
+        new_order = Order(
+            customer_phone=phone,
+            status=OrderStatus.PROCESSING.value,
+            total_price=sum(
+                menu_item.price * quantity for menu_item, quantity in lines
+            ),
+        )
+        db.session.add(new_order)
+        db.session.flush()  # Get the order ID
+
+        items = [
+            {
+                "order_id": new_order.id,
+                "menu_item_id": menu_item.id,
+                "quantity": quantity,
+                "price": menu_item.price * quantity,
+                "item_name": menu_item.name,
+                "unit_price": menu_item.price,
+                "category_name": menu_item.category.name,
+            }
+            for menu_item, quantity in lines
+        ]
+        db.session.bulk_insert_mappings(OrderItem, items)
+        AnalyticsService.record_order(new_order, items)
+        # Committed with the order, a retry never places it twice
+        link_resource(new_order.id)
+
+        db.session.commit()
+
+        return {"success": True, "order": cls.get_order(new_order.id).to_dict()}, 201
+
+    @classmethod
+    def place_intake_batch(
+        cls, entries: List[Dict[str, Any]]
+    ) -> Dict[str, Tuple[Dict[str, Any], int]]:
+        """
+        Place a batch of orders taken by the intake journal in one transaction.
+
+        Entries already placed, by a drain that stopped before recording it in
+        the journal, are found by their ``intake_id`` and not placed again.
+        The menu items of the whole batch are locked and loaded at once, the
+        stock is checked entry by entry in journal order, so an entry only
+        fails when the entries before it took the stock, and reserved with one
+        ``UPDATE`` per menu item. Everything is committed once.
+
+        :param entries: The journal entries, each a dict with ``intake_id``,
+            ``phone``, ``menu_items`` and ``created_at``.
+        :return: The response payload and HTTP status code of every entry, by
+            ``intake_id``.
+        """
+        placed = {
+            row.intake_id: row.id
+            for row in Order.query.with_entities(Order.intake_id, Order.id)
+            .filter(Order.intake_id.in_([entry["intake_id"] for entry in entries]))
+            .all()
+        }
+        entries = [entry for entry in entries if entry["intake_id"] not in placed]
+
+        while True:
+            results: Dict[str, Tuple[Dict[str, Any], int]] = {}
+            menu_item_ids = {
+                item_data.get("id")
+                for entry in entries
+                for item_data in entry["menu_items"]
+            }
+            menu_items_by_id = {
+                menu_item.id: menu_item
+                for menu_item in MenuItem.query.options(selectinload(MenuItem.category))
+                .filter(MenuItem.id.in_(menu_item_ids))
+                .order_by(MenuItem.id)
+                .with_for_update()
+                .all()
+            }
+            available = {
+                menu_item.id: menu_item.quantity
+                for menu_item in menu_items_by_id.values()
+            }
+
+            requested = defaultdict(int)
+            accepted = []
+            for entry in entries:
+                lines = []
+                entry_requested = defaultdict(int)
+                error = None
+                for item_data in entry["menu_items"]:
+                    menu_item_id = item_data.get("id")
+                    quantity = item_data.get("quantity", 1)
+                    menu_item = menu_items_by_id.get(menu_item_id)
+                    if not menu_item:
+                        error = {
+                            "success": False,
+                            "message": f"Menu item with id {menu_item_id} not found",
+                        }, 404
+                        break
+                    if (
+                        available[menu_item_id]
+                        < entry_requested[menu_item_id] + quantity
+                    ):
+                        error = {
+                            "success": False,
+                            "message": f"Not enough quantity available for {menu_item.name}",
+                        }, 400
+                        break
+                    entry_requested[menu_item_id] += quantity
+                    lines.append((menu_item, quantity))
+                if error:
+                    results[entry["intake_id"]] = error
+                    continue
+                for menu_item_id, quantity in entry_requested.items():
+                    available[menu_item_id] -= quantity
+                    requested[menu_item_id] += quantity
+                accepted.append((entry, lines))
+
+            # The rows are locked on MySQL, SQLite may have changed them since
+            if StockService.reserve(requested) is None:
+                break
+            db.session.rollback()  # Read the stock again
+
+        orders = [
+            Order(
+                customer_phone=entry["phone"],
+                status=OrderStatus.PROCESSING.value,
+                total_price=sum(
+                    menu_item.price * quantity for menu_item, quantity in lines
+                ),
+                created_at=entry["created_at"],
+                intake_id=entry["intake_id"],
+            )
+            for entry, lines in accepted
+        ]
+        db.session.add_all(orders)
+        db.session.flush()  # Get the order IDs
+
+        items_by_order = [
+            [
+                {
+                    "order_id": new_order.id,
+                    "menu_item_id": menu_item.id,
+                    "quantity": quantity,
+                    "price": menu_item.price * quantity,
+                    "item_name": menu_item.name,
+                    "unit_price": menu_item.price,
+                    "category_name": menu_item.category.name,
+                }
+                for menu_item, quantity in lines
+            ]
+            for new_order, (_, lines) in zip(orders, accepted)
+        ]
+        db.session.bulk_insert_mappings(
+            OrderItem, [item for items in items_by_order for item in items]
+        )
+        for new_order, items in zip(orders, items_by_order):
+            AnalyticsService.record_order(new_order, items)
+
+        db.session.commit()
+
+        placed.update((order.intake_id, order.id) for order in orders)
+        if placed:
+            for order in Order.query.options(selectinload(Order.items)).filter(
+                Order.id.in_(placed.values())
+            ):
+                results[order.intake_id] = {
+                    "success": True,
+                    "order": order.to_dict(),
+                }, 201
+        return results
+
+    @classmethod
+    def update_status(cls, order_id: int, status: int) -> Optional[Order]:
+        """
+        Change the status of an order and its status rollup in one transaction.
+
+        The status is swapped with a conditional ``UPDATE`` on the status that
+        was read, so two concurrent changes can't both move the same order
+        out of its previous status counter.
+
+        :param order_id: The ID of the order.
+        :param status: The new status value.
+        :return: The updated order, or None if it doesn't exist.
+        """
+        while True:
+            order = Order.query.get(order_id)
+            if not order:
+                return None
+            old_status = order.status
+            result = db.session.execute(
+                update(Order)
+                .where(Order.id == order_id, Order.status == old_status)
+                .values(status=status, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                break
+            db.session.rollback()  # Changed by someone else, read it again
+
+        AnalyticsService.record_status_change(order_id, old_status, status)
+        db.session.commit()
+        return order
+
+    @classmethod
+    def list_orders(
+        cls,
+        status: Optional[str] = None,
+        phone: Optional[str] = None,
+        limit: Optional[int] = Config.PAGE_SIZE_DEFAULT,
+        cursor: Optional[List[int]] = None,
+        fields: Fields = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get a page of serialized orders without building ORM instances.
+
+        Pages are selected with a keyset condition on the last seen
+        ``(status, id)``, so every page costs the same however deep it is.
+        Orders and their items are fetched as plain column rows and turned
+        into the :meth:`Order.to_dict` shape directly, items with one extra
+        ``SELECT ... IN`` query only when ``fields`` asks for them. This skips
+        the identity map, attribute instrumentation and relationship loading,
+        which dominate the cost of large read-only listings.
+
+        :param status: The status value to filter orders by.
+        :param phone: The customer phone number to filter orders by.
+        :param limit: The maximum number of orders to return, None for every
+            order after the cursor.
+        :param cursor: The ``(status, id)`` of the last order of the previous page.
+        :param fields: The projection to serialize the orders with.
+        :return: The serialized orders and the cursor of the next page, if any.
+        """
+        query = (
+            Order.query.with_entities(*cls._ORDER_COLUMNS)
+            .filter(*cls._order_filters(status, phone, cursor))
+            .order_by(Order.status, Order.id)
+        )
+        rows = (query if limit is None else query.limit(limit + 1)).all()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = PaginationUtils.encode_cursor(rows[-1].status, rows[-1].id)
+        return cls._serialize_order_rows(rows, fields), next_cursor
+
+    @classmethod
+    def list_kitchen_orders(
+        cls, since: Optional[datetime] = None
+    ) -> List[Tuple[datetime, Dict[str, Any]]]:
+        """
+        Get the orders of the kitchen queue with their last update time.
+
+        :param since: Get every order updated since then, delivered ones
+            included, instead of every order not delivered yet.
+        :return: (updated_at, order) pairs, the orders serialized like
+            :meth:`list_orders`.
+        """
+        query = Order.query.with_entities(*cls._ORDER_COLUMNS, Order.updated_at)
+        if since is None:
+            query = query.filter(Order.status != OrderStatus.DELIVERED.value)
+        else:
+            query = query.filter(Order.updated_at >= since)
+        rows = query.order_by(Order.id).all()
+        orders = cls._serialize_order_rows(rows, None)
+        return [(row.updated_at, order) for row, order in zip(rows, orders)]
+
+    @classmethod
+    def _serialize_order_rows(cls, rows: list, fields: Fields) -> List[Dict[str, Any]]:
+        """Turn order column rows into dicts, loading their items in one query"""
+        items_by_order_id = None
+        if rows and FieldsUtils.wants(fields, "items"):
+            items_by_order_id = cls._load_item_rows(
+                [row.id for row in rows], FieldsUtils.sub(fields, "items")
+            )
+
+        orders = []
+        for row in rows:
+            data = {
+                "id": row.id,
+                "customer_phone": row.customer_phone,
+                "status": OrderStatus(row.status).name,
+                "status_id": row.status,
+                "total_price": row.total_price,
+                "created_at": row.created_at.isoformat(),
+            }
+            if items_by_order_id is not None:
+                data["items"] = items_by_order_id.get(row.id, [])
+            orders.append(FieldsUtils.project(data, fields))
+        return orders
+
+    @classmethod
+    def _load_item_rows(
+        cls, order_ids: List[int], fields: Fields
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Serialize the items of several orders from a single ``IN (...)`` query.
+
+        Only ``order_items`` is read, menu item details come from the
+        snapshot taken when the order was placed.
+
+        :param order_ids: The IDs of the orders.
+        :param fields: The projection of the items.
+        :return: The serialized items grouped by order ID.
+        """
+        menu_item_fields = FieldsUtils.sub(fields, "menu_item")
+        with_menu_item = FieldsUtils.wants(fields, "menu_item")
+
+        rows = (
+            OrderItem.query.with_entities(
+                OrderItem.id,
+                OrderItem.order_id,
+                OrderItem.quantity,
+                OrderItem.price,
+                OrderItem.menu_item_id,
+                OrderItem.item_name,
+                OrderItem.unit_price,
+                OrderItem.category_name,
+            )
+            .filter(OrderItem.order_id.in_(order_ids))
+            .order_by(OrderItem.id)
+        )
+
+        items_by_order_id = defaultdict(list)
+        for row in rows:
+            data = {"id": row.id, "quantity": row.quantity, "price": row.price}
+            if with_menu_item:
+                data["menu_item"] = FieldsUtils.project(
+                    {
+                        "id": row.menu_item_id,
+                        "name": row.item_name,
+                        "price": row.unit_price,
+                        "category_name": row.category_name,
+                    },
+                    menu_item_fields,
+                )
+            items_by_order_id[row.order_id].append(FieldsUtils.project(data, fields))
+        return items_by_order_id
+
+    @classmethod
+    def get_order(cls, order_id: int) -> Order:
+        """Get an order with its items loaded"""
+        return (
+            Order.query.options(joinedload(Order.items))
+            .filter(Order.id == order_id)
+            .first()
+        )
+
+    @classmethod
+    def backfill_snapshots(cls, batch_size: int = Config.BULK_BATCH_SIZE) -> dict:
+        """
+        Fill the menu item snapshot of order items created before it existed.
+
+        Items are processed in batches by ID, each batch is one joined
+        ``SELECT`` and one ``executemany`` ``UPDATE``, committed on its own so
+        the backfill can be interrupted and resumed. Items whose menu item
+        was already deleted only get their unit price.
+
+        :param batch_size: The number of order items per batch.
+        :return: The number of items updated and of items without a menu item.
+        """
+        updated = orphaned = 0
+        last_id = 0
+        while True:
+            rows = (
+                db.session.query(
+                    OrderItem.id,
+                    OrderItem.quantity,
+                    OrderItem.price,
+                    MenuItem.name,
+                    MenuItem.price.label("menu_item_price"),
+                    Category.name.label("category_name"),
+                )
+                .outerjoin(MenuItem, OrderItem.menu_item_id == MenuItem.id)
+                .outerjoin(Category, MenuItem.category_id == Category.id)
+                .filter(OrderItem.id > last_id, OrderItem.unit_price.is_(None))
+                .order_by(OrderItem.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            db.session.execute(
+                update(OrderItem.__table__)
+                .where(OrderItem.__table__.c.id == bindparam("_id"))
+                .values(
+                    item_name=bindparam("_item_name"),
+                    unit_price=bindparam("_unit_price"),
+                    category_name=bindparam("_category_name"),
+                ),
+                [
+                    {
+                        "_id": row.id,
+                        "_item_name": row.name,
+                        # The line price is the source of truth, the menu
+                        # price may have changed since
+                        "_unit_price": (
+                            row.price / row.quantity
+                            if row.quantity
+                            else row.menu_item_price
+                        ),
+                        "_category_name": row.category_name,
+                    }
+                    for row in rows
+                ],
+            )
+            db.session.commit()
+            updated += len(rows)
+            orphaned += sum(row.name is None for row in rows)
+        return {"success": True, "updated": updated, "orphaned": orphaned}
+
+    @classmethod
+    def _order_filters(
+        cls,
+        status: Optional[str],
+        phone: Optional[str],
+        cursor: Optional[List[int]],
+    ) -> list:
+        """Build the filters and keyset condition of an order listing"""
+        filters = []
+        if status:
+            filters.append(Order.status == status)
+        if phone:
+            filters.append(Order.customer_phone == phone)
+        if cursor:
+            last_status, last_id = cursor
+            filters.append(
+                or_(
+                    Order.status > last_status,
+                    and_(Order.status == last_status, Order.id > last_id),
+                )
+            )
+        return filters
@@ -0,0 +1,54 @@
+from typing import Dict, Optional
+
+from sqlalchemy import update
+
+from app.models.menu import MenuItem
+from app import db
+
+
+class StockService:
+    @classmethod
+    def reserve(cls, quantities: Dict[int, int]) -> Optional[int]:
+        """
+        Atomically reserve stock for several menu items.
+
+        Each item is decremented with a conditional
+        ``UPDATE ... SET quantity = quantity - :n WHERE id = :id AND quantity >= :n``
+        so concurrent workers can never oversell. Items are updated in id order
+        to keep row locks acquired in a consistent order across transactions.
+
+        Nothing is committed here: when an item cannot be reserved the caller
+        must roll back the transaction, which also releases the items that
+        were already reserved.
+
+        :param quantities: A mapping of menu item ID to the quantity to reserve.
+        :return: The ID of the first menu item that could not be reserved, or None.
+        """
+        for menu_item_id in sorted(quantities):
+            quantity = quantities[menu_item_id]
+            result = db.session.execute(
+                update(MenuItem)
+                .where(MenuItem.id == menu_item_id, MenuItem.quantity >= quantity)
+                .values(quantity=MenuItem.quantity - quantity)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                return menu_item_id
+        return None
+
+    @classmethod
+    def restock(cls, menu_item_id: int, quantity: int) -> bool:
+        """
+        Atomically add stock to a menu item.
+
+        :param menu_item_id: The ID of the menu item.
+        :param quantity: The quantity to add.
+        :return: True if the menu item exists, False otherwise.
+        """
+        result = db.session.execute(
+            update(MenuItem)
+            .where(MenuItem.id == menu_item_id)
+            .values(quantity=MenuItem.quantity + quantity)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
@@ -1,7 +1,66 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
 import jwt
-from flask import request, jsonify
+from flask import request
 from functools import wraps
 from app.config import Config
+from app.utils.json import jsonify
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified JWT payloads.
+
+    Entries are keyed by the SHA-256 digest of the token and are dropped at
+    the token's ``exp``, with the same ``exp <= now`` rule PyJWT applies, so a
+    cached token is rejected exactly when a full decode would reject it.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Get the verified payload of a token, or None if it must be decoded"""
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[0])
+
+    def put(self, token: str, data: Dict[str, Any]) -> None:
+        """Remember the payload of a token that was just verified"""
+        if self.maxsize <= 0 or not isinstance(data.get("exp"), (int, float)):
+            return
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            self._entries[key] = (dict(data), data["exp"])
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(Config.TOKEN_CACHE_SIZE)
 
 
 def token_required(f):
@@ -16,10 +75,16 @@ def token_required(f):
         if not token:
             return jsonify({"success": False, "message": "Token is missing"}), 401
 
+        data = token_cache.get(token)
+        if data is not None:
+            request.user = data  # Attach user data to the request
+            return f(*args, **kwargs)
+
         try:
             # Decode the token
             data = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
             request.user = data  # Attach user data to the request
+            token_cache.put(token, data)
         except jwt.ExpiredSignatureError:
             return jsonify({"success": False, "message": "Token has expired"}), 401
         except jwt.InvalidTokenError:
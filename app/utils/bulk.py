@@ -0,0 +1,55 @@
+import codecs
+import csv
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# (line number, parsed row or None, parse error or None)
+BulkRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+CSV_MIMETYPES = ("text/csv",)
+JSON_LINES_MIMETYPES = ("application/x-ndjson", "application/jsonl")
+
+
+class BulkUtils:
+    @classmethod
+    def iter_rows(cls, stream: Iterable[bytes], mimetype: str) -> Iterator[BulkRow]:
+        """
+        Parse a CSV (with a header line) or JSON lines body as it streams in.
+
+        :param stream: The request body, iterated line by line.
+        :param mimetype: The request content type.
+        :return: An iterator of rows with their line numbers and parse errors.
+        :raises ValueError: If the content type is not supported.
+        """
+        lines = codecs.iterdecode(stream, "utf-8")
+        if mimetype in CSV_MIMETYPES:
+            return cls._iter_csv(lines)
+        if mimetype in JSON_LINES_MIMETYPES:
+            return cls._iter_json_lines(lines)
+        raise ValueError(f"Unsupported content type: {mimetype}")
+
+    @classmethod
+    def _iter_csv(cls, lines: Iterable[str]) -> Iterator[BulkRow]:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row, None
+
+    @classmethod
+    def _iter_json_lines(cls, lines: Iterable[str]) -> Iterator[BulkRow]:
+        for line_num, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_num, None, "Invalid JSON"
+                continue
+            if not isinstance(row, dict):
+                yield line_num, None, "Expected a JSON object"
+                continue
+            yield line_num, row, None
+
+    @classmethod
+    def chunks(cls, rows: list, size: int) -> Iterator[list]:
+        for start in range(0, len(rows), size):
+            yield rows[start : start + size]
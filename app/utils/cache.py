@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.utils.replica import use_primary
+
+
+class MemoryVersionStore:
+    """Keep the catalog version in this process only"""
+
+    def __init__(self):
+        self._version = uuid.uuid4().hex
+
+    def get(self) -> str:
+        return self._version
+
+    def bump(self) -> None:
+        self._version = uuid.uuid4().hex
+
+
+class FileVersionStore:
+    """
+    Share the catalog version between workers through a small file.
+
+    Reads only ``stat`` the file unless it changed since the last read, so
+    checking the version stays cheap on every request.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._version = ""
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        try:
+            stat = os.stat(self._path)
+        except FileNotFoundError:
+            self.bump()
+            return self.get()
+        stamp = (stat.st_mtime_ns, stat.st_ino)
+        if stamp != self._stamp:
+            with self._lock, open(self._path) as f:
+                self._version = f.read().strip()
+                self._stamp = stamp
+        return self._version
+
+    def bump(self) -> None:
+        # Write to a temporary file and rename it so readers never see a
+        # partially written version
+        tmp_path = f"{self._path}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, "w") as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, self._path)
+
+
+class DatabaseVersionStore:
+    """
+    Share the catalog version between every worker and host through the
+    ``catalog_version`` row.
+
+    The row is read from the primary at most every ``interval`` seconds per
+    process, so other workers see a bump within that delay and checking the
+    version on every request costs one primary key lookup per interval. It
+    is read and bumped through the request's session, a request never holds
+    two connections of the same pool.
+    """
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        # (version, time.monotonic() it was read at)
+        self._cached: Tuple[str, float] = ("", float("-inf"))
+
+    def get(self) -> str:
+        from app.models.catalog import CatalogVersion
+        from app import db
+
+        version, checked_at = self._cached
+        if time.monotonic() < checked_at + self._interval:
+            return version
+        table = CatalogVersion.__table__
+        version = db.session.execute(
+            select(table.c.version).where(table.c.id == 1),
+            bind_arguments={"bind": db.engine},
+        ).scalar()
+        if version is None:
+            self.bump()
+            return self._cached[0]
+        self._cached = (version, time.monotonic())
+        return version
+
+    def bump(self) -> None:
+        from app.models.catalog import CatalogVersion
+        from app import db
+
+        table = CatalogVersion.__table__
+        version = uuid.uuid4().hex
+        bump = update(table).where(table.c.id == 1).values(version=version)
+        if db.session.execute(bump).rowcount == 0:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(table).values(id=1, version=version))
+            except IntegrityError:
+                db.session.execute(bump)  # Inserted by another worker meanwhile
+        db.session.commit()
+        self._cached = (version, time.monotonic())
+
+
+class CatalogCache:
+    """
+    In-process cache for serialized catalog data (menu items, categories).
+
+    Every entry is tagged with the catalog version it was loaded under and
+    expires after ``CATALOG_CACHE_TTL`` seconds. Any menu or category edit
+    must call :meth:`invalidate`, which bumps the version and so drops every
+    entry at once. Stock changes don't, they would make every order contend
+    on the version: quantities are cached apart with a short TTL, see
+    :meth:`MenuService.stock`. With the ``database`` backend (the default) the version
+    is shared by every worker and host, and with the ``file`` backend by the
+    workers of one host, so an invalidation in one worker is seen by all of
+    them. The ``memory`` backend only suits a single process: the ETags of
+    the catalog endpoints are derived from the version.
+    """
+
+    def __init__(self, app=None):
+        self._store = MemoryVersionStore()
+        self._ttl = 300
+        self._entries: Dict[str, Tuple[str, float, Any]] = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self._ttl = app.config["CATALOG_CACHE_TTL"]
+        backend = app.config["CATALOG_CACHE_BACKEND"]
+        if backend == "database":
+            # Declares the table, for create_all and migrations
+            from app.models.catalog import CatalogVersion  # noqa: F401
+
+            self._store = DatabaseVersionStore(
+                app.config["CATALOG_VERSION_CHECK_INTERVAL"]
+            )
+        elif backend == "file":
+            self._store = FileVersionStore(app.config["CATALOG_CACHE_PATH"])
+        else:
+            self._store = MemoryVersionStore()
+        self._entries = {}
+
+    def version(self) -> str:
+        """Get the current catalog version"""
+        return self._store.get()
+
+    def get_or_load(
+        self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None
+    ) -> Any:
+        """
+        Get a cached value, loading it when missing, stale or expired.
+
+        The version is read before loading, so a value loaded while a
+        mutation commits is stored under the old version and never served.
+        Cached values are shared between requests and must not be mutated.
+        The loader reads from the primary, a lagging replica could store
+        data older than the version.
+
+        :param key: The cache key.
+        :param loader: A callable returning the value to cache.
+        :param ttl: The seconds the value is kept, ``CATALOG_CACHE_TTL`` by
+            default.
+        :return: The cached value.
+        """
+        version = self._store.get()
+        entry = self._entries.get(key)
+        if entry and entry[0] == version and entry[1] > time.monotonic():
+            return entry[2]
+        with use_primary():
+            value = loader()
+        expires_at = time.monotonic() + (self._ttl if ttl is None else ttl)
+        self._entries[key] = (version, expires_at, value)
+        return value
+
+    def expire(self, key: str) -> None:
+        """Drop one entry in this process only, e.g. the stock after a restock"""
+        self._entries.pop(key, None)
+
+    def invalidate(self) -> None:
+        """Drop every cached catalog entry, call after a committed mutation"""
+        self._store.bump()
+        self._entries = {}
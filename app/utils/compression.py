@@ -0,0 +1,105 @@
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, only gzip is offered without it
+    brotli = None
+
+
+class Compressor:
+    """
+    Compress responses negotiated through ``Accept-Encoding``.
+
+    Brotli is preferred when installed and accepted, gzip otherwise. Small
+    bodies, streamed responses and non-text mimetypes are sent as is.
+    Responses carrying a strong ETag (the catalog endpoints) are compressed
+    once per encoding and served from a bounded LRU cache afterwards; their
+    ETag gets an encoding suffix so each representation is validated on
+    its own.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._min_size = 1024
+        self._mimetypes = {"application/json"}
+        self._cache_size = 256
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._encoders: Dict[str, Callable[[bytes], bytes]] = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self._min_size = app.config["COMPRESS_MIN_SIZE"]
+        self._mimetypes = set(app.config["COMPRESS_MIMETYPES"])
+        self._cache_size = app.config["COMPRESS_CACHE_SIZE"]
+        self._cache = OrderedDict()
+
+        level = app.config["COMPRESS_LEVEL"]
+        self._encoders = {}
+        if brotli is not None:
+            quality = app.config["COMPRESS_BROTLI_QUALITY"]
+            self._encoders["br"] = lambda data: brotli.compress(data, quality=quality)
+        # mtime=0 keeps the output identical for identical bodies
+        self._encoders["gzip"] = lambda data: gzip.compress(data, level, mtime=0)
+
+        app.after_request(self.after_request)
+
+    @property
+    def encodings(self) -> List[str]:
+        """The supported encodings, in order of preference"""
+        return list(self._encoders)
+
+    def negotiate(self) -> Optional[str]:
+        """Pick the encoding to use for the current request, if any"""
+        return request.accept_encodings.best_match(self.encodings)
+
+    def after_request(self, response):
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in self._mimetypes
+        ):
+            return response
+
+        # The body depends on Accept-Encoding from here on, even when it is
+        # sent uncompressed
+        response.vary.add("Accept-Encoding")
+
+        data = response.get_data()
+        encoding = self.negotiate()
+        if len(data) < self._min_size or not encoding:
+            return response
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            body = self._cached(etag, encoding, data)
+            response.set_etag(f"{etag}-{encoding}")
+        else:
+            body = self._encoders[encoding](data)
+
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def _cached(self, etag: str, encoding: str, data: bytes) -> bytes:
+        key = (etag, encoding)
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                return body
+
+        body = self._encoders[encoding](data)
+        with self._lock:
+            self._cache[key] = body
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return body
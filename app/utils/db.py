@@ -0,0 +1,50 @@
+from typing import Iterable
+
+from sqlalchemy import Table
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app import db
+
+
+class DbUtils:
+    @classmethod
+    def upsert(
+        cls,
+        table: Table,
+        index_elements: Iterable[str],
+        update_columns: Iterable[str] = (),
+        increment_columns: Iterable[str] = (),
+    ):
+        """
+        Build an ``INSERT`` that updates the existing row on a unique key clash.
+
+        The statement has no values so it can be executed with a list of
+        parameter dicts, which the driver sends as one ``executemany``.
+
+        :param table: The table to insert into.
+        :param index_elements: The columns of the unique key, MySQL infers it.
+        :param update_columns: The columns to overwrite with the inserted values.
+        :param increment_columns: The columns to add the inserted values to,
+            an atomic counter update.
+        :return: The dialect specific insert statement.
+        """
+
+        def values(inserted):
+            return {
+                **{column: inserted[column] for column in update_columns},
+                **{
+                    column: table.c[column] + inserted[column]
+                    for column in increment_columns
+                },
+            }
+
+        dialect = db.engine.dialect.name
+        if dialect == "mysql":
+            stmt = mysql.insert(table)
+            return stmt.on_duplicate_key_update(values(stmt.inserted))
+        if dialect in ("sqlite", "postgresql"):
+            stmt = (sqlite if dialect == "sqlite" else postgresql).insert(table)
+            return stmt.on_conflict_do_update(
+                index_elements=list(index_elements), set_=values(stmt.excluded)
+            )
+        raise NotImplementedError(f"Upsert is not supported on {dialect}")
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """Counters describing how a connection pool is being used"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.overflow_max = 0
+
+    def record(self, wait: float, overflow: int, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.overflow_max = max(self.overflow_max, overflow)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """A QueuePool that records checkouts, checkout wait time and overflow"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, self.overflow(), True)
+            raise
+        self.stats.record(time.perf_counter() - start, self.overflow())
+        return connection
+
+    def recreate(self):
+        # Keep the counters when the pool is replaced, e.g. after dispose()
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def status_dict(self) -> Dict[str, Any]:
+        stats = self.stats
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "overflow_max": stats.overflow_max,
+            "checkouts": stats.checkouts,
+            "timeouts": stats.timeouts,
+            "wait_seconds_total": stats.wait_total,
+            "wait_seconds_max": stats.wait_max,
+        }
+
+
+class PoolUtils:
+    # Apps whose pools are reset in forked children, not kept alive by it
+    _apps: "weakref.WeakSet" = weakref.WeakSet()
+
+    @classmethod
+    def engine_options(cls, config) -> Dict[str, Any]:
+        """
+        Build ``SQLALCHEMY_ENGINE_OPTIONS`` from the ``DB_POOL_*`` settings.
+
+        SQLite gets no pool options, Flask-SQLAlchemy picks a suitable pool.
+        """
+        if config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+            return {}
+        return {
+            "poolclass": InstrumentedQueuePool,
+            "pool_size": config["DB_POOL_SIZE"],
+            "max_overflow": config["DB_MAX_OVERFLOW"],
+            "pool_timeout": config["DB_POOL_TIMEOUT"],
+            "pool_recycle": config["DB_POOL_RECYCLE"],
+            "pool_pre_ping": config["DB_POOL_PRE_PING"],
+        }
+
+    @classmethod
+    def engines(cls, app) -> Dict[str, Any]:
+        """Get every engine of the app keyed by bind name"""
+        from app import db
+
+        binds = [None, *(app.config.get("SQLALCHEMY_BINDS") or ())]
+        return {bind or "default": db.get_engine(app, bind) for bind in binds}
+
+    @classmethod
+    def reset(cls, app) -> None:
+        """
+        Drop the pooled connections inherited from a parent process.
+
+        Meant to run in a freshly forked worker: the parent's sockets are left
+        open for the parent and the child opens its own connections.
+        """
+        with app.app_context():
+            for engine in cls.engines(app).values():
+                engine.dispose(close=False)
+
+    @classmethod
+    def reset_after_fork(cls, app) -> None:
+        """Reset the pools of the app in every process forked from now on"""
+        cls._apps.add(app)
+
+    @classmethod
+    def _reset_forked(cls) -> None:
+        for app in list(cls._apps):
+            cls.reset(app)
+
+    @classmethod
+    def status(cls, app) -> Dict[str, Dict[str, Any]]:
+        """Get the usage of every instrumented pool keyed by bind name"""
+        return {
+            name: engine.pool.status_dict()
+            for name, engine in cls.engines(app).items()
+            if isinstance(engine.pool, InstrumentedQueuePool)
+        }
+
+
+# Registered once, however many apps are created
+os.register_at_fork(after_in_child=PoolUtils._reset_forked)
@@ -0,0 +1,55 @@
+import hashlib
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import Response, make_response, request
+
+from app import cache, compressor
+
+
+def catalog_etag(f=None, *, stamp: Optional[Callable[[], str]] = None):
+    """
+    Answer conditional requests for catalog endpoints.
+
+    The strong ETag is derived from the catalog version and the request path
+    and query string, so a matching ``If-None-Match`` gets a 304 before any
+    rows are loaded or serialized. The ETag of the representation compressed
+    with the negotiated encoding (see :class:`Compressor`) is matched too.
+
+    :param stamp: A callable getting a stamp of data served besides the
+        catalog, such as :meth:`MenuService.stock_stamp`, added to the ETag.
+    """
+    if f is None:
+        return lambda f: catalog_etag(f, stamp=stamp)
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        extra = stamp() if stamp is not None else ""
+        etag = hashlib.sha1(
+            f"{cache.version()}:{extra}:{request.full_path}".encode()
+        ).hexdigest()
+
+        # Compressed representations carry the encoding as an ETag suffix,
+        # only the one negotiated for this request is valid. Bodies too small
+        # to compress carry the bare ETag whatever the encoding.
+        encoding = compressor.negotiate()
+        candidates = (etag, f"{etag}-{encoding}") if encoding else (etag,)
+        matched = next(
+            (c for c in candidates if request.if_none_match.contains(c)), None
+        )
+        if matched:
+            response = Response(status=304)
+            response.set_etag(matched)
+            response.vary.add("Accept-Encoding")
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            response.set_etag(etag)
+
+        # Let clients keep the body but revalidate it on every use
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    return decorated
@@ -0,0 +1,140 @@
+import queue
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Event = Tuple[int, str, Dict[str, Any]]
+
+
+class Subscription:
+    """A subscriber's bounded view of the event bus"""
+
+    def __init__(
+        self,
+        predicate: Callable[[Dict[str, Any]], bool],
+        maxsize: int,
+        backlog: List[Event],
+        reset: bool,
+    ):
+        self.predicate = predicate
+        self.reset = reset
+        self.overflowed = False
+        self._backlog = deque(event for event in backlog if predicate(event[2]))
+        self._queue: "queue.Queue[Event]" = queue.Queue(maxsize)
+
+    def offer(self, event: Event) -> bool:
+        """Queue an event, return False if the subscriber fell too far behind"""
+        if not self.predicate(event[2]):
+            return True
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+            return False
+        return True
+
+    def get(self, timeout: float) -> Optional[Event]:
+        """
+        Get the next event, replayed ones first.
+
+        :param timeout: Seconds to wait for a live event.
+        :return: The next event, or None on timeout.
+        :raises queue.Empty: Once an overflowed subscription has been drained.
+        """
+        if self._backlog:
+            return self._backlog.popleft()
+        if self.overflowed:
+            return self._queue.get_nowait()
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """
+    In-process publish/subscribe bus with a bounded replay buffer.
+
+    Every event gets an increasing ID so clients can resume from the last
+    event they saw. Subscribers whose queue fills up are dropped instead of
+    blocking publishers, they reconnect and resume from the replay buffer.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._history: "deque[Event]" = deque(maxlen=1000)
+        self._subscribers: List[Subscription] = []
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self._queue_size = 100
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self._history = deque(self._history, maxlen=app.config["ORDER_STREAM_REPLAY"])
+        self._queue_size = app.config["ORDER_STREAM_QUEUE"]
+
+    def publish(self, event: str, data: Dict[str, Any]) -> int:
+        """
+        Publish an event to every subscriber.
+
+        :param event: The event name.
+        :param data: The JSON serializable event payload.
+        :return: The event ID.
+        """
+        # Delivered under the lock, so every listener and subscriber gets the
+        # events in ID order: a client resuming after an ID never misses a
+        # lower one published concurrently. Delivery never blocks.
+        with self._lock:
+            self._last_id += 1
+            item = (self._last_id, event, data)
+            self._history.append(item)
+
+            for listener in self._listeners:
+                listener(event, data)
+            for subscription in list(self._subscribers):
+                if not subscription.offer(item):
+                    self._subscribers.remove(subscription)
+        return item[0]
+
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]) -> None:
+        """
+        Call ``listener(event, data)`` synchronously on every publish.
+
+        Meant for in-process indexes that must see every event, unlike
+        subscribers which are dropped when they fall behind. Listeners run
+        under the bus lock and must not publish.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def subscribe(
+        self,
+        predicate: Callable[[Dict[str, Any]], bool],
+        last_event_id: Optional[int] = None,
+    ) -> Subscription:
+        """
+        Subscribe to events matching ``predicate``.
+
+        :param predicate: A filter applied to event payloads.
+        :param last_event_id: The last event the client saw, events after it
+            are replayed from the buffer.
+        :return: The subscription, to be passed to :meth:`unsubscribe`.
+        """
+        with self._lock:
+            backlog: List[Event] = []
+            reset = False
+            if last_event_id is not None:
+                backlog = [item for item in self._history if item[0] > last_event_id]
+                # Events between the client's last one and the buffer were
+                # lost, or the client saw IDs from before a restart
+                oldest_id = backlog[0][0] if backlog else self._last_id + 1
+                reset = oldest_id > last_event_id + 1 or last_event_id > self._last_id
+            subscription = Subscription(predicate, self._queue_size, backlog, reset)
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
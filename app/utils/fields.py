@@ -0,0 +1,50 @@
+from typing import Any, Dict, Optional
+
+Fields = Optional[Dict[str, "Fields"]]
+
+
+class FieldsUtils:
+    @classmethod
+    def parse(cls, value: Optional[str]) -> Fields:
+        """
+        Parse a ``fields=`` query parameter into a nested projection.
+
+        ``"id,status,items.quantity"`` becomes
+        ``{"id": None, "status": None, "items": {"quantity": None}}``, where
+        None means the whole value is kept.
+
+        :param value: The comma separated field list.
+        :return: The projection, or None to keep every field.
+        """
+        if not value:
+            return None
+        fields: Dict[str, Any] = {}
+        for path in value.split(","):
+            parts = [part.strip() for part in path.split(".") if part.strip()]
+            node = fields
+            for i, part in enumerate(parts):
+                last = i == len(parts) - 1
+                if part in node and node[part] is None:
+                    break  # already selected whole
+                if last:
+                    node[part] = None
+                else:
+                    node = node.setdefault(part, {})
+        return fields or None
+
+    @classmethod
+    def wants(cls, fields: Fields, name: str) -> bool:
+        """Check whether a field is part of the projection"""
+        return fields is None or name in fields
+
+    @classmethod
+    def sub(cls, fields: Fields, name: str) -> Fields:
+        """Get the nested projection of a field"""
+        return fields.get(name) if fields else None
+
+    @classmethod
+    def project(cls, data: Dict[str, Any], fields: Fields) -> Dict[str, Any]:
+        """Keep only the projected keys of a serialized object"""
+        if fields is None:
+            return data
+        return {key: value for key, value in data.items() if key in fields}
@@ -0,0 +1,277 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Callable, Dict, NamedTuple, Optional
+
+from flask import Response, g, make_response, request
+
+from app.utils.json import jsonify
+
+HEADER = "Idempotency-Key"
+KEY_MAX_LENGTH = 200
+
+
+class StoredResponse(NamedTuple):
+    request_hash: str
+    status_code: int
+    body: str
+    expires_at: float  # time.monotonic()
+
+
+class IdempotencyStore:
+    """
+    Run each request made with an ``Idempotency-Key`` at most once.
+
+    Keys are claimed in the ``idempotency_keys`` table before their request
+    runs and get its response once it completed, so retries are answered
+    from the stored response for ``IDEMPOTENCY_TTL`` seconds, by any worker.
+    Completed responses are also kept in a bounded in-memory LRU in front
+    of the table.
+
+    A duplicate arriving while the first request still runs waits for it:
+    on an in-process event when both hit the same worker, by polling the
+    table otherwise, for at most ``IDEMPOTENCY_WAIT`` seconds. Requests
+    failing with a server error are not stored and can be retried.
+
+    The response is stored after the request committed its work, so the
+    handler ties what it creates to the key in its own transaction with
+    :func:`link_resource`. A request dying in between is never run again:
+    once abandoned its response is rebuilt from the created resource by
+    the ``recover`` callable of :func:`idempotent`, if any, and retries wait
+    until the key expires otherwise.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._ttl = 86400
+        self._wait = 10
+        self._lock_timeout = 60
+        self._cache_size = 10000
+        self._cache: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._in_flight: Dict[str, threading.Event] = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        # Declares the table, for create_all and migrations
+        from app.models.idempotency import IdempotencyKey  # noqa: F401
+
+        self._ttl = app.config["IDEMPOTENCY_TTL"]
+        self._wait = app.config["IDEMPOTENCY_WAIT"]
+        self._lock_timeout = app.config["IDEMPOTENCY_LOCK_TIMEOUT"]
+        self._cache_size = app.config["IDEMPOTENCY_CACHE_SIZE"]
+        self._cache = OrderedDict()
+
+    def run(
+        self,
+        key: str,
+        request_hash: str,
+        handler: Callable[[], Response],
+        recover: Optional[Callable[[int], Response]] = None,
+    ) -> Response:
+        """
+        Run a request once per key, or replay the response it got.
+
+        :param key: The idempotency key, scoped to the endpoint.
+        :param request_hash: The fingerprint of the request, a key reused
+            for a different request is rejected.
+        :param handler: A callable running the request.
+        :param recover: A callable getting the response of an abandoned
+            request from the ID of the resource it created.
+        :return: The response of the request.
+        """
+        deadline = time.monotonic() + self._wait
+        while True:
+            stored = self._cached(key)
+            if stored is not None:
+                return self._replay(stored, request_hash)
+
+            with self._lock:
+                event = self._in_flight.get(key)
+                owner = event is None
+                if owner:
+                    event = self._in_flight[key] = threading.Event()
+            if not owner:
+                # Same worker, wait for it then read its response
+                if not event.wait(max(deadline - time.monotonic(), 0)):
+                    return self._in_progress()
+                continue
+
+            try:
+                return self._run_once(key, request_hash, handler, recover, deadline)
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                event.set()
+
+    def _run_once(self, key, request_hash, handler, recover, deadline) -> Response:
+        from app.services.idempotency import IdempotencyService
+        from app import db
+
+        while True:
+            row = IdempotencyService.claim(
+                key, request_hash, self._ttl, self._lock_timeout
+            )
+            if row is None:
+                break
+            if row.status_code is not None:
+                stored = self._remember(
+                    key, row.request_hash, row.status_code, row.response
+                )
+                return self._replay(stored, request_hash)
+            abandoned = row.created_at <= datetime.utcnow() - timedelta(
+                seconds=self._lock_timeout
+            )
+            if abandoned and row.resource_id is not None and recover is not None:
+                # Its work was committed, only its response was lost
+                return self._replay(self._recover(key, row, recover), request_hash)
+            # Running on another worker
+            if time.monotonic() >= deadline:
+                return self._in_progress()
+            time.sleep(0.05)
+
+        g.idempotency_key = key
+        try:
+            response = make_response(handler())
+        except Exception:
+            db.session.rollback()
+            IdempotencyService.release(key)
+            raise
+        finally:
+            g.pop("idempotency_key", None)
+        if response.status_code >= 500 or response.is_streamed:
+            db.session.rollback()
+            IdempotencyService.release(key)
+            return response
+
+        body = response.get_data(as_text=True)
+        IdempotencyService.complete(key, response.status_code, body)
+        self._remember(key, request_hash, response.status_code, body)
+        return response
+
+    def _recover(self, key, row, recover) -> StoredResponse:
+        """Store the response of an abandoned request, rebuilt by ``recover``"""
+        from app.services.idempotency import IdempotencyService
+
+        response = make_response(recover(row.resource_id))
+        body = response.get_data(as_text=True)
+        IdempotencyService.complete(key, response.status_code, body)
+        return self._remember(key, row.request_hash, response.status_code, body)
+
+    def _cached(self, key: str):
+        with self._lock:
+            stored = self._cache.get(key)
+            if stored is None:
+                return None
+            if stored.expires_at <= time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return stored
+
+    def _remember(
+        self, key: str, request_hash: str, status_code: int, body: str
+    ) -> StoredResponse:
+        # Never kept longer than the table keeps it
+        stored = StoredResponse(
+            request_hash, status_code, body, time.monotonic() + self._ttl
+        )
+        with self._lock:
+            self._cache[key] = stored
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return stored
+
+    def _replay(self, stored: StoredResponse, request_hash: str) -> Response:
+        if stored.request_hash != request_hash:
+            return make_response(
+                jsonify(
+                    {
+                        "success": False,
+                        "message": f"{HEADER} was already used for another request",
+                    }
+                ),
+                422,
+            )
+        response = Response(
+            stored.body, status=stored.status_code, mimetype="application/json"
+        )
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+    def _in_progress(self) -> Response:
+        response = make_response(
+            jsonify(
+                {
+                    "success": False,
+                    "message": f"A request with this {HEADER} is still in progress",
+                }
+            ),
+            409,
+        )
+        response.headers["Retry-After"] = "1"
+        return response
+
+
+def link_resource(resource_id: int) -> None:
+    """
+    Tie what the current request creates to its ``Idempotency-Key``.
+
+    Call it in the transaction creating the resource, before its commit.
+    Does nothing for requests made without the header.
+
+    :param resource_id: The ID of the created resource.
+    """
+    from app.services.idempotency import IdempotencyService
+
+    key = g.get("idempotency_key")
+    if key is not None:
+        IdempotencyService.link(key, resource_id)
+
+
+def idempotent(f=None, *, recover: Optional[Callable[[int], Response]] = None):
+    """
+    Run a handler at most once per ``Idempotency-Key`` header.
+
+    Requests without the header run as usual. Retries with the same key
+    and the same method, path and body get the first response back, with
+    an ``Idempotent-Replayed: true`` header, and never run the handler
+    again. See :class:`IdempotencyStore`.
+
+    :param recover: A callable getting the response of a request that
+        died after creating a resource, from the ID of the resource passed
+        to :func:`link_resource`.
+    """
+    if f is None:
+        return lambda f: idempotent(f, recover=recover)
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        from app import idempotency
+
+        header = request.headers.get(HEADER)
+        if header is None:
+            return f(*args, **kwargs)
+        if not header.strip() or len(header) > KEY_MAX_LENGTH:
+            return (
+                jsonify({"success": False, "message": f"Invalid {HEADER} header"}),
+                400,
+            )
+
+        request_hash = hashlib.sha256(
+            b"\0".join(
+                (request.method.encode(), request.path.encode(), request.get_data())
+            )
+        ).hexdigest()
+        return idempotency.run(
+            f"{request.endpoint}:{header}",
+            request_hash,
+            lambda: f(*args, **kwargs),
+            recover,
+        )
+
+    return decorated
@@ -0,0 +1,390 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import OperationalError
+
+
+class OrderJournal:
+    """
+    Durable local journal of the orders taken by :class:`OrderIntake`.
+
+    A SQLite database in WAL mode with ``synchronous=FULL``: an entry is on
+    disk once :meth:`append` returns, and survives a crash of the process or
+    of the host. Entries stay pending until the result of their placement
+    is recorded with :meth:`complete`. Several processes can share it, each
+    opens its own connections, one per thread.
+    """
+
+    SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    intake_id TEXT NOT NULL UNIQUE,
+    phone TEXT NOT NULL,
+    menu_items TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    status_code INTEGER,
+    response TEXT,
+    order_id INTEGER,
+    completed_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_pending ON entries (status_code, seq);
+CREATE INDEX IF NOT EXISTS ix_entries_completed_at ON entries (completed_at);
+"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, phone: str, menu_items: List[Dict[str, Any]]) -> str:
+        """
+        Write an order to the journal, committed before returning.
+
+        :param phone: The customer phone number.
+        :param menu_items: The order lines.
+        :return: The provisional ID of the order.
+        """
+        intake_id = str(uuid.uuid4())
+        self._connect().execute(
+            "INSERT INTO entries (intake_id, phone, menu_items, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                intake_id,
+                phone,
+                json.dumps(menu_items),
+                datetime.utcnow().isoformat(),
+            ),
+        )
+        return intake_id
+
+    def pending(self, limit: int) -> List[Dict[str, Any]]:
+        """Get the oldest entries not placed yet, in the order they were taken"""
+        rows = self._connect().execute(
+            "SELECT intake_id, phone, menu_items, created_at FROM entries "
+            "WHERE status_code IS NULL ORDER BY seq LIMIT ?",
+            (limit,),
+        )
+        return [
+            {
+                "intake_id": row["intake_id"],
+                "phone": row["phone"],
+                "menu_items": json.loads(row["menu_items"]),
+                "created_at": datetime.fromisoformat(row["created_at"]),
+            }
+            for row in rows
+        ]
+
+    def complete(self, results: Dict[str, Tuple[Dict[str, Any], int]]) -> None:
+        """Record the placement result of several entries, in one commit"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "UPDATE entries SET status_code = ?, response = ?, order_id = ?, "
+                "completed_at = ? WHERE intake_id = ?",
+                [
+                    (
+                        status_code,
+                        json.dumps(payload),
+                        (payload.get("order") or {}).get("id"),
+                        now,
+                        intake_id,
+                    )
+                    for intake_id, (payload, status_code) in results.items()
+                ],
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, intake_id: str) -> Optional[sqlite3.Row]:
+        return (
+            self._connect()
+            .execute(
+                "SELECT status_code, response, order_id FROM entries "
+                "WHERE intake_id = ?",
+                (intake_id,),
+            )
+            .fetchone()
+        )
+
+    def backlog(self) -> int:
+        """Get the number of entries not placed yet"""
+        return (
+            self._connect()
+            .execute("SELECT COUNT(*) FROM entries WHERE status_code IS NULL")
+            .fetchone()[0]
+        )
+
+    def purge(self, before: float) -> int:
+        """Delete the entries completed before a ``time.time()``"""
+        return (
+            self._connect()
+            .execute("DELETE FROM entries WHERE completed_at < ?", (before,))
+            .rowcount
+        )
+
+
+def validate_lines(menu_items: Any) -> Optional[str]:
+    """
+    Check the order lines of an order taken without reading the database.
+
+    :param menu_items: The ``menu_items`` of the request.
+    :return: An error message, or None if the lines are well formed.
+    """
+    if not isinstance(menu_items, list):
+        return "menu_items must be a list"
+    for item_data in menu_items:
+        if not isinstance(item_data, dict) or not isinstance(item_data.get("id"), int):
+            return "Every menu item needs an integer id"
+        quantity = item_data.get("quantity", 1)
+        if not isinstance(quantity, int) or quantity < 1:
+            return "Quantities must be positive integers"
+    return None
+
+
+class OrderIntake:
+    """
+    Write-behind order intake, taking orders without waiting for the database.
+
+    Validated orders are appended to an :class:`OrderJournal` on local disk
+    and answered right away with a provisional ID. A drain thread places
+    the pending entries in the database in batches of up to
+    ``ORDER_INTAKE_BATCH_SIZE``, one transaction and one commit per batch,
+    see :meth:`OrderService.place_intake_batch`. Orders arriving while a
+    batch commits are placed by the next one, so batches grow with the load.
+
+    The drain thread starts with the app, and again in every forked worker,
+    so journaled orders are placed after a restart without waiting for a
+    request. Only one process drains a journal at a time, the others wait on
+    a file lock and take over when it exits. Entries are placed exactly once: one
+    left pending by a crash is drained again, and skipped if its order was
+    already committed, found by :attr:`Order.intake_id`. Results are kept
+    in the journal for ``ORDER_INTAKE_RETENTION`` seconds.
+    """
+
+    # Instances whose drain thread is started again in forked children
+    _instances: "weakref.WeakSet" = weakref.WeakSet()
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.journal: Optional[OrderJournal] = None
+        self._app = None
+        self._lock_file = None
+        self._lock_pid = None
+        self._lock_open = threading.Lock()
+        self._draining = threading.Lock()
+        self._batch_size = 200
+        self._interval = 0.05
+        self._retention = 86400
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self.batches = 0
+        self.drained = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config["ORDER_INTAKE_ENABLED"]
+        self._batch_size = app.config["ORDER_INTAKE_BATCH_SIZE"]
+        self._interval = app.config["ORDER_INTAKE_INTERVAL"]
+        self._retention = app.config["ORDER_INTAKE_RETENTION"]
+        path = app.config["ORDER_INTAKE_JOURNAL"] or os.path.join(
+            app.instance_path, "order_intake.db"
+        )
+        self.journal = None
+        if not self.enabled and not os.path.exists(path):
+            return
+
+        # Also opened when disabled, for the status of the orders it took and
+        # for ``flask drain-order-intake``
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.journal = OrderJournal(path)
+        if self.enabled:
+            self._app = app
+            OrderIntake._instances.add(self)
+            self.start(app)
+
+    def submit(self, phone: str, menu_items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Take an order, to be placed by the drain thread.
+
+        :param phone: The customer phone number.
+        :param menu_items: The validated order lines.
+        :return: The provisional order.
+        """
+        intake_id = self.journal.append(phone, menu_items)
+        self._wake.set()
+        return {"id": intake_id, "status": "PENDING"}
+
+    def status(self, intake_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """
+        Get an order taken by the intake.
+
+        :param intake_id: The provisional ID.
+        :return: The response payload and HTTP status code, 202 while the
+            order is pending, or None if the journal doesn't know the ID.
+        """
+        from app.services.order import OrderService
+
+        row = self.journal.get(intake_id) if self.journal else None
+        if row is None:
+            return None
+        if row["status_code"] is None:
+            return {
+                "success": True,
+                "order": {"id": intake_id, "status": "PENDING"},
+            }, 202
+        if row["order_id"] is not None:
+            # The stored response has the status of the order when placed
+            order = OrderService.get_order(row["order_id"])
+            if order:
+                return {"success": True, "order": order.to_dict()}, 200
+        return json.loads(row["response"]), row["status_code"]
+
+    def start(self, app) -> None:
+        """Start the drain thread of this process, once"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(
+            target=self._run, args=(app,), name="order-intake", daemon=True
+        )
+        self._thread.start()
+
+    @classmethod
+    def _start_forked(cls) -> None:
+        for intake in list(cls._instances):
+            if intake.enabled and intake._app is not None:
+                # Held by a thread of the parent maybe, which the child lacks
+                intake._lock_open = threading.Lock()
+                intake._draining = threading.Lock()
+                intake.start(intake._app)
+
+    def _lock_journal(self) -> None:
+        """
+        Hold the journal against other processes, until this one exits.
+
+        The lock file is opened once per process, so the drain thread and
+        :meth:`drain` share the lock instead of waiting on each other.
+        """
+        with self._lock_open:
+            if self._lock_pid != os.getpid():
+                self._lock_file = open(f"{self.journal.path}.lock", "w")
+                self._lock_pid = os.getpid()
+        # Other processes block here until this one exits
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+
+    def _run(self, app) -> None:
+        self._lock_journal()
+        last_purge = 0.0
+        while True:
+            try:
+                with app.app_context():
+                    while self.drain_once():
+                        pass
+                if time.monotonic() - last_purge > 3600:
+                    self.journal.purge(time.time() - self._retention)
+                    last_purge = time.monotonic()
+            except Exception:
+                app.logger.exception("Order intake drain failed")
+                time.sleep(1)
+            # Woken up by submit(), other processes' entries wait for the poll
+            self._wake.wait(self._interval)
+            self._wake.clear()
+
+    def drain(self) -> int:
+        """
+        Place every pending entry now, holding the journal lock.
+
+        Meant for ``flask drain-order-intake``, in an app context. Waits
+        for the process draining the journal, if any, to exit.
+
+        :return: The number of entries drained.
+        """
+        self._lock_journal()
+        drained = self.drained
+        while self.drain_once():
+            pass
+        return self.drained - drained
+
+    def drain_once(self, limit: Optional[int] = None) -> int:
+        """
+        Place one batch of pending entries, in an app context.
+
+        :param limit: The batch size, ``ORDER_INTAKE_BATCH_SIZE`` by default.
+        :return: The number of entries drained.
+        """
+        with self._draining:  # The drain thread and drain() of this process
+            return self._drain_once(limit)
+
+    def _drain_once(self, limit: Optional[int]) -> int:
+        from app.services.order import OrderService
+        from app import db, events
+
+        entries = self.journal.pending(limit or self._batch_size)
+        if not entries:
+            return 0
+        try:
+            results = OrderService.place_intake_batch(entries)
+        except OperationalError:
+            db.session.rollback()
+            raise  # The database is down, keep the entries for later
+        except Exception:
+            db.session.rollback()
+            if len(entries) > 1:
+                # Find the entry failing the batch, place the others
+                return sum(self._drain_once(1) for _ in entries)
+            results = {
+                entries[0]["intake_id"]: (
+                    {"success": False, "message": "The order could not be placed"},
+                    500,
+                )
+            }
+        self.journal.complete(results)
+        self.batches += 1
+        self.drained += len(entries)
+
+        for payload, status_code in results.values():
+            if status_code == 201:
+                events.publish("order_created", payload["order"])
+        return len(entries)
+
+    def prometheus(self) -> List[str]:
+        """Render the intake counters in the Prometheus text format"""
+        return [
+            "# HELP ca_order_intake_backlog Orders taken but not placed yet.",
+            "# TYPE ca_order_intake_backlog gauge",
+            f"ca_order_intake_backlog {self.journal.backlog()}",
+            "# TYPE ca_order_intake_batches_total counter",
+            f"ca_order_intake_batches_total {self.batches}",
+            "# TYPE ca_order_intake_drained_total counter",
+            f"ca_order_intake_drained_total {self.drained}",
+        ]
+
+
+# Registered once, however many intakes are created
+os.register_at_fork(after_in_child=OrderIntake._start_forked)
@@ -0,0 +1,72 @@
+import decimal
+from typing import Any
+
+from flask import current_app, json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+
+class JSONEncoder(json.JSONEncoder):
+    """
+    Flask's encoder, with ``Decimal`` as a string like newer Flask versions.
+
+    MySQL returns the ``SUM`` of integer columns as ``Decimal``, e.g. in the
+    sales reports.
+    """
+
+    def default(self, o: Any) -> Any:
+        if isinstance(o, decimal.Decimal):
+            return str(o)
+        return super().default(o)
+
+
+def _default(obj: Any) -> Any:
+    # Serialize what orjson doesn't know (dates, Decimal, UUID...) the way
+    # the app's encoder does, so both backends produce the same output
+    return current_app.json_encoder().default(obj)
+
+
+def use_orjson() -> bool:
+    return orjson is not None and current_app.config["JSON_BACKEND"] == "orjson"
+
+
+def dumps(obj: Any) -> str:
+    """
+    Serialize ``obj`` to a compact JSON string with the configured backend.
+
+    Honours ``JSON_SORT_KEYS`` like :func:`jsonify`.
+    """
+    if use_orjson():
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if current_app.config["JSON_SORT_KEYS"]:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def jsonify(*args: Any, **kwargs: Any):
+    """
+    Drop-in replacement for :func:`flask.jsonify` using orjson when available.
+
+    Honours ``JSON_SORT_KEYS`` and falls back to Flask's own ``jsonify`` when
+    orjson is not installed, disabled with ``JSON_BACKEND = "std"`` or when
+    pretty printing is on.
+    """
+    app = current_app
+    if not use_orjson() or app.config["JSONIFY_PRETTYPRINT_REGULAR"] or app.debug:
+        return json.jsonify(*args, **kwargs)
+
+    if args and kwargs:
+        raise TypeError("jsonify() behavior undefined when passed both args and kwargs")
+    data = args[0] if len(args) == 1 else (args or kwargs)
+
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE
+    if app.config["JSON_SORT_KEYS"]:
+        option |= orjson.OPT_SORT_KEYS
+    return app.response_class(
+        orjson.dumps(data, default=_default, option=option),
+        mimetype=app.config["JSONIFY_MIMETYPE"],
+    )
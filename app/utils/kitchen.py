@@ -0,0 +1,203 @@
+import threading
+import time
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# OrderStatus.DELIVERED.name, delivered orders leave the queue
+DONE_STATUS = "DELIVERED"
+
+EPOCH = datetime(1970, 1, 1)
+
+# Called with None for every order not delivered yet, or with a time for
+# every order updated since then, delivered ones included
+Loader = Callable[[Optional[datetime]], Iterable[Tuple[datetime, Dict[str, Any]]]]
+
+
+def to_stamp(at: datetime) -> int:
+    """Get the microseconds since the Unix epoch of a naive UTC time"""
+    return (at - EPOCH) // timedelta(microseconds=1)
+
+
+def from_stamp(stamp: int) -> datetime:
+    """Get the naive UTC time of microseconds since the Unix epoch"""
+    return EPOCH + timedelta(microseconds=stamp)
+
+
+class KitchenQueue:
+    """
+    In-memory index of the orders not delivered yet, bucketed by status.
+
+    Every change to an order is appended to a change log under the
+    ``updated_at`` of the order, and versions are such times in
+    microseconds, so they mean the same to every worker and host. A client
+    sending back the version it last saw only gets the orders that changed
+    since, in time proportional to the number of changes, whichever worker
+    it polls.
+
+    The index is loaded once, then fed by the order events of this process
+    and refreshed every ``KITCHEN_QUEUE_TTL`` seconds with the orders
+    updated since the previous refresh, which picks up the changes of other
+    workers. A client presenting a version newer than the last refresh, seen
+    on another worker, triggers a refresh right away. Loads run outside the
+    lock, readers keep being served meanwhile, and an order keeps the state
+    with the latest ``updated_at``, from an event or a load.
+
+    The returned version is ``KITCHEN_QUEUE_SLACK`` seconds before the last
+    refresh, for transactions committing after their ``updated_at`` and
+    host clocks drifting apart, so the latest changes may be sent twice;
+    clients replace orders by ID. A client presenting a version older than
+    the change log gets a full reset.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._ttl = 2.0
+        self._slack = 5_000_000
+        self._log_size = 10000
+        self._loading = 0  # Loads in flight
+        self.invalidate()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self._ttl = app.config["KITCHEN_QUEUE_TTL"]
+        self._slack = int(app.config["KITCHEN_QUEUE_SLACK"] * 1_000_000)
+        self._log_size = app.config["KITCHEN_QUEUE_LOG"]
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drop the index, it is loaded again on the next read"""
+        with self._lock:
+            self._refreshed_at: Optional[float] = None
+            # Every order is indexed as of this version
+            self._synced = 0
+            # The log holds every change after this version
+            self._complete_from: Optional[int] = None
+            self._orders: Dict[int, Dict[str, Any]] = {}
+            # The version of the last change of each order in the log
+            self._stamps: Dict[int, int] = {}
+            # (version, order ID) of every change, oldest first
+            self._log: List[Tuple[int, int]] = []
+
+    def on_event(self, event: str, data: Dict[str, Any]) -> None:
+        """Apply a published order event, see :meth:`EventBus.add_listener`"""
+        if not event.startswith("order_"):
+            return
+        with self._lock:
+            # The next load covers it otherwise
+            if self._refreshed_at is not None or self._loading:
+                # Published after the commit, so at least as recent
+                self._apply(data, to_stamp(datetime.utcnow()))
+
+    def changes(self, since: Optional[str], loader: Loader) -> Dict[str, Any]:
+        """
+        Get the orders that changed since a version.
+
+        :param since: The version returned by a previous call, or None.
+        :param loader: Gets the orders to load, see :data:`Loader`.
+        :return: The current version, whether the client must drop its state
+            (``reset``), the changed orders bucketed by status name and the
+            IDs of the orders that left the queue.
+        """
+        from app.models.order import OrderStatus
+
+        with self._lock:
+            seen = int(since) if (since or "").isdigit() else None
+            if self._refreshed_at is None:
+                load, load_since = True, None
+            else:
+                stale = self._refreshed_at + self._ttl < time.monotonic()
+                behind = seen is not None and seen > self._synced
+                # One refresh at a time, the index can still be served
+                load = (stale or behind) and not self._loading
+                load_since = self._synced
+            if load:
+                self._loading += 1
+                started = to_stamp(datetime.utcnow()) - self._slack
+
+        if load:
+            try:
+                orders = list(
+                    loader(None if load_since is None else from_stamp(load_since))
+                )
+            except BaseException:
+                with self._lock:
+                    self._loading -= 1
+                raise
+            with self._lock:
+                self._loading -= 1
+                self._merge(orders, started, full=load_since is None)
+
+        with self._lock:
+            start = self._parse_version(seen)
+            if start is None:
+                changed_ids: Iterable[int] = self._orders
+                removed: List[int] = []
+            else:
+                index = bisect_right(self._log, (start, float("inf")))
+                changed_ids = dict.fromkeys(
+                    order_id for _, order_id in self._log[index:]
+                )
+                removed = [i for i in changed_ids if i not in self._orders]
+
+            buckets: Dict[str, List[Dict[str, Any]]] = {
+                status.name: [] for status in OrderStatus if status.name != DONE_STATUS
+            }
+            for order_id in sorted(changed_ids):
+                order = self._orders.get(order_id)
+                if order is not None:
+                    buckets[order["status"]].append(order)
+
+            return {
+                "version": str(max(start or 0, self._synced)),
+                "reset": start is None,
+                "orders": buckets,
+                "removed": removed,
+            }
+
+    def _parse_version(self, seen: Optional[int]) -> Optional[int]:
+        """Get the version to diff from, None when a reset is needed"""
+        if seen is None or self._complete_from is None:
+            return None
+        # Changes right after it were dropped from the log, or it is bogus
+        now = to_stamp(datetime.utcnow())
+        if seen < self._complete_from or seen > now + self._slack:
+            return None
+        return seen
+
+    def _merge(
+        self, orders: List[Tuple[datetime, Dict[str, Any]]], started: int, full: bool
+    ) -> None:
+        """Apply a load started at version ``started``"""
+        if full and self._complete_from is None:
+            self._complete_from = started
+        for updated_at, order in orders:
+            self._apply(order, to_stamp(updated_at))
+        self._synced = max(self._synced, started)
+        self._refreshed_at = time.monotonic()
+
+    def _apply(self, order: Dict[str, Any], stamp: int) -> None:
+        order_id = order["id"]
+        if stamp < self._stamps.get(order_id, stamp):
+            return  # Changed since, by an event or another load
+        if order["status"] == DONE_STATUS:
+            if self._orders.pop(order_id, None) is None:
+                return
+        elif self._orders.get(order_id) == order:
+            self._stamps[order_id] = stamp
+            return
+        else:
+            self._orders[order_id] = order
+        self._stamps[order_id] = stamp
+        insort(self._log, (stamp, order_id))
+        if len(self._log) > 2 * self._log_size:
+            # Trim in halves so appends stay amortized O(1)
+            dropped = self._log[len(self._log) - self._log_size - 1][0]
+            del self._log[: len(self._log) - self._log_size]
+            self._complete_from = max(self._complete_from or 0, dropped)
+            self._stamps = {
+                i: s
+                for i, s in self._stamps.items()
+                if i in self._orders or s > dropped
+            }
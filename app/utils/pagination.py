@@ -0,0 +1,50 @@
+import base64
+import json
+from typing import Any, List, Optional
+
+from app.config import Config
+from app.utils.common import CommonUtils
+
+
+class PaginationUtils:
+    @classmethod
+    def parse_limit(cls, value: Any) -> int:
+        """Convert a ``limit`` query parameter to a bounded page size"""
+        limit = CommonUtils.safe_int(value)
+        if limit <= 0:
+            return Config.PAGE_SIZE_DEFAULT
+        return min(limit, Config.PAGE_SIZE_MAX)
+
+    @classmethod
+    def encode_cursor(cls, *values: Any) -> str:
+        """
+        Encode the sort key of the last row of a page into an opaque cursor.
+
+        :param values: The sort key values, e.g. ``(status, id)``.
+        :return: A URL-safe cursor string.
+        """
+        raw = json.dumps(list(values), separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode_cursor(cls, cursor: Optional[str], size: int) -> Optional[List[Any]]:
+        """
+        Decode a cursor produced by :meth:`encode_cursor`.
+
+        :param cursor: The cursor string, or None for the first page.
+        :param size: The number of sort key values the cursor must hold.
+        :return: The sort key values, or None if no cursor was given.
+        :raises ValueError: If the cursor is malformed.
+        """
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(raw)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("Invalid cursor")
+        if not all(isinstance(value, int) for value in values):
+            raise ValueError("Invalid cursor")
+        return values
@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, Optional
+
+
+class PoolSaturatedError(Exception):
+    """Raised when a bounded pool has no free worker or queue slot"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a bounded queue that rejects work instead of piling it up.
+
+    At most ``max_workers`` calls run at once and ``max_queue`` more may wait,
+    any call beyond that fails immediately with :class:`PoolSaturatedError`.
+    With a ``config_prefix``, :meth:`init_app` sizes the pool from the
+    ``<prefix>_WORKERS``, ``<prefix>_QUEUE`` and ``<prefix>_TIMEOUT`` settings
+    of the app.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = 1,
+        max_queue: int = 0,
+        timeout: float = 10,
+        config_prefix: Optional[str] = None,
+        app=None,
+    ) -> None:
+        self.name = name
+        self.config_prefix = config_prefix
+        self.rejected = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._configure(max_workers, max_queue, timeout)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        prefix = self.config_prefix
+        self._configure(
+            app.config[f"{prefix}_WORKERS"],
+            app.config[f"{prefix}_QUEUE"],
+            app.config[f"{prefix}_TIMEOUT"],
+        )
+
+    def _configure(self, max_workers: int, max_queue: int, timeout: float) -> None:
+        if self._executor is not None:
+            # Calls in flight finish on the old threads
+            self._executor.shutdown(wait=False)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix=self.name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run ``fn(*args)`` on the pool and wait for its result.
+
+        :raises PoolSaturatedError: If the pool and its queue are full, or the
+            call did not finish within the timeout.
+        """
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PoolSaturatedError("Too many concurrent requests")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PoolSaturatedError("Timed out waiting for a worker")
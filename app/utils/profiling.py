@@ -0,0 +1,247 @@
+import random
+import re
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from app.utils.db_pool import PoolUtils
+
+# Upper bounds of the request latency histogram, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Per endpoint aggregates exported besides the latency histogram
+ENDPOINT_METRICS = (
+    (
+        "ca_request_sql_statements_total",
+        "statements",
+        "counter",
+        "SQL statements run by sampled requests.",
+    ),
+    (
+        "ca_request_db_seconds_total",
+        "db_time",
+        "counter",
+        "Time sampled requests spent in SQL statements.",
+    ),
+    (
+        "ca_request_slowest_statement_seconds",
+        "slowest",
+        "gauge",
+        "Slowest SQL statement run by a sampled request.",
+    ),
+    (
+        "ca_request_n_plus_one_total",
+        "n_plus_one",
+        "counter",
+        "Sampled requests repeating a statement shape too often.",
+    ),
+)
+
+WHITESPACE_RE = re.compile(r"\s+")
+PLACEHOLDERS_RE = re.compile(r"\((?:\s*(?:\?|%s|:\w+)\s*,)+\s*(?:\?|%s|:\w+)\s*\)")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a SQL statement so repeated executions compare equal"""
+    statement = WHITESPACE_RE.sub(" ", statement).strip()
+    # IN lists of different lengths are the same query
+    return PLACEHOLDERS_RE.sub("(?)", statement)
+
+
+class RequestProfile:
+    """What a single sampled request spent its time on"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.slowest: Tuple[float, Optional[str]] = (0.0, None)
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.statements += 1
+        self.db_time += duration
+        if duration > self.slowest[0]:
+            self.slowest = (duration, statement)
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Get the statement shapes executed more than ``threshold`` times"""
+        return [
+            (shape, count) for shape, count in self.shapes.items() if count > threshold
+        ]
+
+
+class EndpointStats:
+    """Aggregates of the sampled requests of one endpoint"""
+
+    def __init__(self):
+        self.requests = 0
+        self.wall_time = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.statements = 0
+        self.db_time = 0.0
+        self.slowest = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.n_plus_one = 0
+
+    def record(self, wall_time: float, profile: RequestProfile, n_plus_one: bool):
+        self.requests += 1
+        self.wall_time += wall_time
+        self.buckets[bisect_left(LATENCY_BUCKETS, wall_time)] += 1
+        self.statements += profile.statements
+        self.db_time += profile.db_time
+        if profile.slowest[0] > self.slowest:
+            self.slowest, self.slowest_statement = profile.slowest
+        self.n_plus_one += n_plus_one
+
+
+class Profiler:
+    """
+    Opt-in per request profiling and SQL instrumentation.
+
+    When ``INSTRUMENTATION_ENABLED`` is set, a ``INSTRUMENTATION_SAMPLE_RATE``
+    fraction of requests record their wall time and every SQL statement they
+    run through events of the app's engines. Unsampled requests only pay for
+    a random draw, and statements run outside a sampled request are ignored.
+
+    Sampled requests get a ``Server-Timing`` header, are flagged when the
+    same statement shape runs more than ``INSTRUMENTATION_N_PLUS_ONE`` times
+    and are aggregated per endpoint for :meth:`prometheus`.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.enabled = False
+        self._sample_rate = 1.0
+        self._n_plus_one = 10
+        self._endpoints: Dict[str, EndpointStats] = {}
+        self._instrumented: "weakref.WeakSet" = weakref.WeakSet()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config["INSTRUMENTATION_ENABLED"]
+        self._sample_rate = app.config["INSTRUMENTATION_SAMPLE_RATE"]
+        self._n_plus_one = app.config["INSTRUMENTATION_N_PLUS_ONE"]
+        self._endpoints = {}
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        for engine in PoolUtils.engines(app).values():
+            self.instrument(engine)
+
+    def instrument(self, engine) -> None:
+        """Time the statements run on ``engine`` by sampled requests, once"""
+        with self._lock:
+            if engine in self._instrumented:
+                return
+            self._instrumented.add(engine)
+
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    def _before_request(self) -> None:
+        if random.random() < self._sample_rate:
+            g.request_profile = RequestProfile()
+
+    def _after_request(self, response):
+        profile: Optional[RequestProfile] = g.pop("request_profile", None)
+        if profile is None:
+            return response
+
+        wall_time = time.perf_counter() - profile.started
+        endpoint = request.endpoint or "unmatched"
+        repeated = profile.repeated(self._n_plus_one)
+        for shape, count in repeated:
+            current_app.logger.warning(
+                "Possible N+1 on %s: statement ran %d times: %s",
+                endpoint,
+                count,
+                shape,
+            )
+
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, EndpointStats())
+            stats.record(wall_time, profile, bool(repeated))
+
+        response.headers.add(
+            "Server-Timing",
+            f"app;dur={wall_time * 1000:.2f}, "
+            f'db;dur={profile.db_time * 1000:.2f};desc="{profile.statements} queries"',
+        )
+        return response
+
+    @staticmethod
+    def _profile() -> Optional[RequestProfile]:
+        return g.get("request_profile") if has_request_context() else None
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, many):
+        if self._profile() is not None:
+            conn.info["profile_started"] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, many):
+        started = conn.info.pop("profile_started", None)
+        profile = self._profile()
+        if started is not None and profile is not None:
+            profile.record(statement, time.perf_counter() - started)
+
+    def _handle_error(self, context) -> None:
+        # A failed statement never reaches after_cursor_execute
+        if context.connection is not None:
+            context.connection.info.pop("profile_started", None)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Get the per endpoint aggregates, with the slowest statement text"""
+        with self._lock:
+            return {
+                name: {
+                    "requests": stats.requests,
+                    "wall_seconds_total": stats.wall_time,
+                    "statements": stats.statements,
+                    "db_seconds_total": stats.db_time,
+                    "slowest_statement_seconds": stats.slowest,
+                    "slowest_statement": stats.slowest_statement,
+                    "n_plus_one": stats.n_plus_one,
+                }
+                for name, stats in self._endpoints.items()
+            }
+
+    def prometheus(self) -> Iterable[str]:
+        """Render the per endpoint aggregates in the Prometheus text format"""
+        with self._lock:
+            endpoints = sorted(
+                (name, dict(vars(stats), buckets=list(stats.buckets)))
+                for name, stats in self._endpoints.items()
+            )
+
+        yield "# HELP ca_request_duration_seconds Sampled request wall time."
+        yield "# TYPE ca_request_duration_seconds histogram"
+        for name, stats in endpoints:
+            cumulative = 0
+            for bound, count in zip(
+                (*map(str, LATENCY_BUCKETS), "+Inf"), stats["buckets"]
+            ):
+                cumulative += count
+                yield (
+                    f'ca_request_duration_seconds_bucket{{endpoint="{name}",'
+                    f'le="{bound}"}} {cumulative}'
+                )
+            labels = f'{{endpoint="{name}"}}'
+            yield f"ca_request_duration_seconds_sum{labels} {stats['wall_time']}"
+            yield f"ca_request_duration_seconds_count{labels} {stats['requests']}"
+
+        for metric, key, kind, help_text in ENDPOINT_METRICS:
+            yield f"# HELP {metric} {help_text}"
+            yield f"# TYPE {metric} {kind}"
+            for name, stats in endpoints:
+                yield f'{metric}{{endpoint="{name}"}} {stats[key]}'
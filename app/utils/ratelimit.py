@@ -0,0 +1,261 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app, g, request
+
+from app.utils.json import jsonify
+
+try:
+    import redis
+except ImportError:  # redis is optional, only the memory backend works without it
+    redis = None
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+def parse_rate(value: str) -> Tuple[float, int]:
+    """
+    Parse a ``"<requests>/<second|minute|hour>"`` limit.
+
+    :param value: The limit, e.g. ``"10/minute"``.
+    :return: The refill rate in tokens per second and the bucket capacity.
+    :raises ValueError: If the limit is malformed.
+    """
+    count, _, period = value.partition("/")
+    if not count.strip().isdigit() or period.strip() not in PERIODS:
+        raise ValueError(f"Invalid rate limit {value!r}")
+    burst = int(count)
+    return burst / PERIODS[period.strip()], burst
+
+
+class MemoryBuckets:
+    """
+    Token buckets of this process only, in a bounded LRU.
+
+    A bucket forgotten by the LRU is full again, which only lets through a
+    client that was idle for a while.
+    """
+
+    def __init__(self, max_keys: int):
+        self._lock = threading.Lock()
+        self._max_keys = max_keys
+        # key -> (tokens, updated at)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        """
+        Take a token from a bucket.
+
+        :return: 0 when a token was taken, otherwise the seconds until one
+            is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisBuckets:
+    """Token buckets shared by every worker through redis"""
+
+    # Same algorithm as MemoryBuckets, run atomically by redis
+    SCRIPT = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "updated_at", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the redis package")
+        self._script = redis.Redis.from_url(url).register_script(self.SCRIPT)
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        return float(
+            self._script(keys=[f"ratelimit:{key}"], args=[rate, burst, time.time()])
+        )
+
+
+class RateLimiter:
+    """
+    Admission control, checked before a request reaches its handler.
+
+    Every worker runs at most ``MAX_CONCURRENT_REQUESTS`` requests at once,
+    requests beyond that are shed with a 503 instead of queueing up behind
+    the database. The endpoints of ``RATE_LIMITS`` also get a token bucket
+    per client IP and per ``phone`` of the JSON body, clients running out of
+    tokens get a 429. Both answer with ``Retry-After``.
+
+    Buckets live in this process by default, which costs a couple of
+    microseconds per check; with ``RATE_LIMIT_BACKEND=redis`` they are shared
+    by every worker, at the cost of a round trip. Redis errors let requests
+    through. The monitor endpoints are never limited.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.enabled = False
+        self._buckets = MemoryBuckets(100000)
+        self._rules: Dict[str, Dict[str, Tuple[float, int]]] = {}
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        self.max_concurrent = 0
+        self.in_flight = 0
+        self.in_flight_max = 0
+        self.shed = 0
+        self.backend_errors = 0
+        self.decisions = 0
+        self.decision_seconds = 0.0
+        # (endpoint, key, "allowed" or "limited") -> requests
+        self.counts: Dict[Tuple[str, str, str], int] = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config["RATE_LIMIT_ENABLED"]
+        self._rules = {
+            endpoint: {key: parse_rate(value) for key, value in limits.items()}
+            for endpoint, limits in app.config["RATE_LIMITS"].items()
+        }
+        if app.config["RATE_LIMIT_BACKEND"] == "redis":
+            self._buckets = RedisBuckets(app.config["RATE_LIMIT_REDIS_URL"])
+        else:
+            self._buckets = MemoryBuckets(app.config["RATE_LIMIT_MAX_KEYS"])
+        self.max_concurrent = app.config["MAX_CONCURRENT_REQUESTS"]
+        self._slots = (
+            threading.BoundedSemaphore(self.max_concurrent)
+            if self.max_concurrent > 0
+            else None
+        )
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_request(self):
+        if request.blueprint == "monitor":
+            return None
+
+        if self._slots is not None:
+            if not self._slots.acquire(blocking=False):
+                with self._lock:
+                    self.shed += 1
+                return self._reject(503, "Server busy, try again", 1)
+            g.ratelimit_slot = True
+            with self._lock:
+                self.in_flight += 1
+                self.in_flight_max = max(self.in_flight_max, self.in_flight)
+
+        rules = self._rules.get(request.endpoint)
+        if rules:
+            start = time.perf_counter()
+            wait = self._check(request.endpoint, rules)
+            with self._lock:
+                self.decisions += 1
+                self.decision_seconds += time.perf_counter() - start
+            if wait:
+                return self._reject(429, "Too many requests, slow down", wait)
+        return None
+
+    def _after_request(self, response):
+        # A stream (e.g. /order/stream) would hold its slot while it lasts
+        if response.is_streamed:
+            self._release()
+        return response
+
+    def _teardown_request(self, exc) -> None:
+        self._release()
+
+    def _release(self) -> None:
+        if g.pop("ratelimit_slot", False):
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def _check(self, endpoint: str, rules: Dict[str, Tuple[float, int]]) -> float:
+        """Take a token from every bucket of the request, until one is empty"""
+        for key, (rate, burst) in rules.items():
+            client = self._client(key)
+            if not client:
+                continue
+            try:
+                wait = self._buckets.take(f"{endpoint}:{key}:{client}", rate, burst)
+            except Exception:
+                current_app.logger.exception("Rate limiter backend failed")
+                with self._lock:
+                    self.backend_errors += 1
+                wait = 0.0
+            result = "limited" if wait else "allowed"
+            with self._lock:
+                count_key = (endpoint, key, result)
+                self.counts[count_key] = self.counts.get(count_key, 0) + 1
+            if wait:
+                return wait
+        return 0.0
+
+    def _client(self, key: str) -> Optional[str]:
+        if key == "ip":
+            return request.remote_addr
+        if key == "phone":
+            data = request.get_json(silent=True)
+            phone = data.get("phone") if isinstance(data, dict) else None
+            return str(phone) if phone else None
+        raise ValueError(f"Unknown rate limit key {key!r}")
+
+    def _reject(self, status: int, message: str, retry_after: float):
+        return (
+            jsonify({"success": False, "message": message}),
+            status,
+            {"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def prometheus(self) -> Iterable[str]:
+        """Render the limiter counters in the Prometheus text format"""
+        with self._lock:
+            counts = sorted(self.counts.items())
+            lines: List[str] = [
+                "# HELP ca_ratelimit_requests_total Rate limit decisions per bucket.",
+                "# TYPE ca_ratelimit_requests_total counter",
+                *(
+                    f'ca_ratelimit_requests_total{{endpoint="{endpoint}",'
+                    f'key="{key}",result="{result}"}} {count}'
+                    for (endpoint, key, result), count in counts
+                ),
+                "# TYPE ca_ratelimit_decision_seconds summary",
+                f"ca_ratelimit_decision_seconds_sum {self.decision_seconds}",
+                f"ca_ratelimit_decision_seconds_count {self.decisions}",
+                "# TYPE ca_ratelimit_backend_errors_total counter",
+                f"ca_ratelimit_backend_errors_total {self.backend_errors}",
+                "# HELP ca_requests_shed_total Requests rejected at the concurrency limit.",
+                "# TYPE ca_requests_shed_total counter",
+                f"ca_requests_shed_total {self.shed}",
+                "# TYPE ca_requests_in_flight gauge",
+                f"ca_requests_in_flight {self.in_flight}",
+                "# TYPE ca_requests_in_flight_max gauge",
+                f"ca_requests_in_flight_max {self.in_flight_max}",
+            ]
+        return lines
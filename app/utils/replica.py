@@ -0,0 +1,189 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, exc, orm
+from sqlalchemy.engine import Engine
+
+REPLICA_PREFIX = "replica_"
+
+
+class ReplicaRouter:
+    """
+    Pick a healthy read replica bind, round-robin.
+
+    A replica whose connection fails is skipped for
+    ``DB_REPLICA_RETRY_AFTER`` seconds, reads fall back to the primary when
+    no replica is healthy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._binds: List[str] = []
+        self._counter = itertools.count()
+        self._down_until: Dict[str, float] = {}
+        self._retry_after = 30
+        self._watched: set = set()
+
+    def init_app(self, app) -> None:
+        self._binds = sorted(
+            bind
+            for bind in app.config.get("SQLALCHEMY_BINDS") or {}
+            if bind.startswith(REPLICA_PREFIX)
+        )
+        self._retry_after = app.config["DB_REPLICA_RETRY_AFTER"]
+        self._down_until = {}
+
+    def choose(self) -> Optional[str]:
+        """Get the next healthy replica bind, or None to use the primary"""
+        now = time.monotonic()
+        for _ in range(len(self._binds)):
+            bind = self._binds[next(self._counter) % len(self._binds)]
+            if self._down_until.get(bind, 0) <= now:
+                return bind
+        return None
+
+    def mark_down(self, bind: str) -> None:
+        with self._lock:
+            self._down_until[bind] = time.monotonic() + self._retry_after
+
+    def watch(self, engine, bind: str) -> None:
+        """Mark ``bind`` down when its engine fails to connect or disconnects"""
+        with self._lock:
+            if id(engine) in self._watched:
+                return
+            self._watched.add(id(engine))
+
+        @event.listens_for(engine, "handle_error")
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(bind)
+
+    def status(self) -> Dict[str, bool]:
+        """Get whether each replica is currently used"""
+        now = time.monotonic()
+        return {bind: self._down_until.get(bind, 0) <= now for bind in self._binds}
+
+
+class RoutingSession(SignallingSession):
+    """
+    Send the reads of :func:`read_only` handlers to a replica.
+
+    One replica is picked per session, so a request sees a consistent
+    snapshot. The session is pinned to the primary for the rest of the
+    request as soon as it flushes or executes a DML statement, so reads
+    after a write see that write.
+    """
+
+    def __init__(self, db, **options):
+        super().__init__(db, **options)
+        self.db = db
+        self.pinned = False
+        self.replica: Optional[str] = None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kw):
+        # An explicit bind, e.g. execute(..., bind_arguments={"bind": engine})
+        engine = bind if bind is not None else self._route(mapper, clause)
+        return self.db.engine_overrides.get(engine, engine)
+
+    def _route(self, mapper, clause):
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.pinned = True
+        elif not self.pinned and has_app_context() and g.get("db_read_only"):
+            if self.replica is None:
+                self.replica = self.db.router.choose()
+            if self.replica is not None:
+                engine = self.db.get_engine(self.app, bind=self.replica)
+                self.db.router.watch(engine, self.replica)
+                return engine
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """
+    Flask-SQLAlchemy with read replicas.
+
+    Every URI of ``DB_REPLICA_URIS`` becomes a ``replica_<n>`` bind, the
+    models stay bound to the primary and only :func:`read_only` handlers
+    read from the replicas.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.router = ReplicaRouter()
+        # Engines replaced by their async driver counterpart, see app.aio
+        self.engine_overrides: Dict[Engine, Engine] = {}
+        super().__init__(*args, **kwargs)
+
+    def init_app(self, app) -> None:
+        app.config["SQLALCHEMY_BINDS"] = {
+            **(app.config.get("SQLALCHEMY_BINDS") or {}),
+            **{
+                f"{REPLICA_PREFIX}{i}": uri
+                for i, uri in enumerate(app.config["DB_REPLICA_URIS"])
+            },
+        }
+        super().init_app(app)
+        self.router.init_app(app)
+
+    def _execute_for_all_tables(self, app, bind, operation, skip_tables=False):
+        # create_all and drop_all never touch the replicas, they are copies
+        if bind == "__all__":
+            bind = [
+                key
+                for key in [None, *(self.get_app(app).config["SQLALCHEMY_BINDS"])]
+                if not (key or "").startswith(REPLICA_PREFIX)
+            ]
+        super()._execute_for_all_tables(app, bind, operation, skip_tables)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def read_only(f):
+    """
+    Route the reads of a handler to a replica.
+
+    If the replica fails mid-request, it is marked down and the handler is
+    run once more against the primary, which is safe because the handler
+    only reads.
+    """
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        session = current_app.extensions["sqlalchemy"].db.session
+        g.db_read_only = True
+        try:
+            return f(*args, **kwargs)
+        except exc.OperationalError:
+            replica = session().replica
+            if replica is None or session().pinned:
+                raise
+            session.rollback()
+            current_app.extensions["sqlalchemy"].db.router.mark_down(replica)
+            session().replica = None
+            g.db_read_only = False
+            return f(*args, **kwargs)
+        finally:
+            g.pop("db_read_only", None)
+
+    # Marks the handlers the async app may serve, see app.aio
+    decorated.read_only = True
+    return decorated
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside a :func:`read_only` handler"""
+    read_only_before = g.get("db_read_only") if has_app_context() else None
+    if read_only_before:
+        g.db_read_only = False
+    try:
+        yield
+    finally:
+        if read_only_before:
+            g.db_read_only = read_only_before
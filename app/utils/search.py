@@ -0,0 +1,172 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip diacritics, so ``"Phở Bò"`` matches ``"pho bo"``"""
+    decomposed = unicodedata.normalize("NFD", text.lower().replace("đ", "d"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(normalize(text or ""))
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over menu item names and descriptions.
+
+    Every token is indexed under all of its prefixes, so search-as-you-type
+    is a handful of set intersections. The index is kept up to date by
+    :meth:`upsert` and :meth:`remove`, and is rebuilt from the catalog when
+    the catalog version differs from the one it was built at, which picks
+    up the changes made by other workers, or after ``CATALOG_CACHE_TTL``
+    seconds.
+    """
+
+    # Relevance of a query term found in a name or a description, as a
+    # whole token or only as a prefix
+    NAME_TOKEN, NAME_PREFIX, DESCRIPTION_TOKEN, DESCRIPTION_PREFIX = 4, 3, 2, 1
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._ttl = 300
+        self._built_at: Optional[float] = None
+        self._built_version: Optional[str] = None
+        self._docs: Dict[int, Tuple[str, int, Set[str], Set[str]]] = {}
+        self._prefixes: Dict[str, Set[int]] = defaultdict(set)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self._ttl = app.config["CATALOG_CACHE_TTL"]
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Force a full rebuild on the next search"""
+        self._built_at = None
+
+    def upsert(self, item: Dict[str, Any]) -> None:
+        """Index a serialized menu item, replacing its previous version"""
+        with self._lock:
+            if self._built_at is None:
+                return  # The next search rebuilds everything
+            self._remove(item["id"])
+            self._add(item)
+
+    def remove(self, menu_item_id: int) -> None:
+        with self._lock:
+            if self._built_at is not None:
+                self._remove(menu_item_id)
+
+    def search(
+        self,
+        query: str,
+        loader: Callable[[], Iterable[Dict[str, Any]]],
+        version: Optional[str] = None,
+        category_id: Optional[int] = None,
+        limit: int = 20,
+    ) -> List[int]:
+        """
+        Find menu items matching every term of ``query``, best first.
+
+        :param query: The text typed by the user, the last term may be partial.
+        :param loader: A callable returning every serialized menu item, used
+            to rebuild the index when it is missing or expired.
+        :param version: The current catalog version, see :class:`CatalogCache`.
+        :param category_id: The category ID to restrict results to.
+        :param limit: The maximum number of results.
+        :return: The IDs of the matching menu items ordered by relevance.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        if self._expired(version):
+            # Loaded outside the lock: the loader may wait on the database,
+            # and the async app (see app.aio) runs requests as greenlets of
+            # one thread, which must not block on a lock held by another
+            items = loader()
+            with self._lock:
+                if self._expired(version):
+                    self._rebuild(items, version)
+
+        with self._lock:
+            candidates = set(self._prefixes.get(terms[0], ()))
+            for term in terms[1:]:
+                candidates &= self._prefixes.get(term, set())
+
+            phrase = " ".join(terms)
+            scored = []
+            for menu_item_id in candidates:
+                name, doc_category_id, name_tokens, description_tokens = self._docs[
+                    menu_item_id
+                ]
+                if category_id and doc_category_id != category_id:
+                    continue
+                score = sum(
+                    self._score(term, name_tokens, description_tokens) for term in terms
+                )
+                if name.startswith(phrase):
+                    score += self.NAME_TOKEN
+                scored.append((-score, len(name), menu_item_id))
+
+        scored.sort()
+        return [menu_item_id for _, _, menu_item_id in scored[:limit]]
+
+    def _expired(self, version: Optional[str]) -> bool:
+        return (
+            self._built_at is None
+            or self._built_version != version
+            or self._built_at + self._ttl < time.monotonic()
+        )
+
+    def _score(
+        self, term: str, name_tokens: Set[str], description_tokens: Set[str]
+    ) -> int:
+        if term in name_tokens:
+            return self.NAME_TOKEN
+        if any(token.startswith(term) for token in name_tokens):
+            return self.NAME_PREFIX
+        if term in description_tokens:
+            return self.DESCRIPTION_TOKEN
+        return self.DESCRIPTION_PREFIX
+
+    def _rebuild(self, items: Iterable[Dict[str, Any]], version: Optional[str]) -> None:
+        self._docs = {}
+        self._prefixes = defaultdict(set)
+        for item in items:
+            self._add(item)
+        self._built_at = time.monotonic()
+        self._built_version = version
+
+    def _add(self, item: Dict[str, Any]) -> None:
+        name_tokens = set(tokenize(item["name"]))
+        description_tokens = set(tokenize(item.get("description")))
+        self._docs[item["id"]] = (
+            " ".join(tokenize(item["name"])),
+            item["category_id"],
+            name_tokens,
+            description_tokens,
+        )
+        for token in name_tokens | description_tokens:
+            for end in range(1, len(token) + 1):
+                self._prefixes[token[:end]].add(item["id"])
+
+    def _remove(self, menu_item_id: int) -> None:
+        doc = self._docs.pop(menu_item_id, None)
+        if not doc:
+            return
+        for token in doc[2] | doc[3]:
+            for end in range(1, len(token) + 1):
+                ids = self._prefixes.get(token[:end])
+                if ids is not None:
+                    ids.discard(menu_item_id)
+                    if not ids:
+                        del self._prefixes[token[:end]]
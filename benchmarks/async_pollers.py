@@ -0,0 +1,202 @@
+"""
+Compare how many concurrent polling clients the sync and async apps serve.
+
+    python -m benchmarks.async_pollers --clients 100,1000,3000 --db-latency-ms 20
+
+The database is seeded once, then each app runs in its own process: the
+sync app in a threaded WSGI server limited to ``--threads`` concurrent
+requests, like one gunicorn worker with that many threads, and the async
+app (see ``app.aio``) under uvicorn. For each client count, that many
+tablets poll ``--path`` every ``--interval`` seconds for ``--duration``
+seconds. The script reports the polls served per second, their latency
+and the polls that failed or took longer than ``--timeout``.
+
+SQLite answers in microseconds where MySQL takes a network round trip,
+``--db-latency-ms`` adds that wait to every statement: a sleep in the sync
+app, a non-blocking wait in the async one.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.util import await_only
+
+from app import create_app
+from benchmarks.common import BenchConfig, create_bench_app, summarize, wait_for_port
+from benchmarks.seed import seed
+
+
+def add_db_latency(seconds: float, non_blocking: bool) -> None:
+    """Make every statement wait ``seconds`` before running"""
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def wait(conn, cursor, statement, parameters, context, executemany):
+        if non_blocking:
+            await_only(asyncio.sleep(seconds))  # Runs in the request's greenlet
+        else:
+            time.sleep(seconds)
+
+
+def serve(mode: str, port: int, threads: int, db_latency: float) -> None:
+    """Run one app until killed, in a process of its own"""
+    if mode == "async":
+        import uvicorn
+
+        from app.aio import create_asgi_app
+
+        add_db_latency(db_latency, non_blocking=True)
+        uvicorn.run(
+            create_asgi_app(BenchConfig),
+            port=port,
+            log_level="warning",
+            access_log=False,
+            backlog=4096,
+        )
+        return
+
+    from werkzeug.serving import make_server
+
+    add_db_latency(db_latency, non_blocking=False)
+    app = create_app(BenchConfig)
+    wsgi_app = app.wsgi_app
+    slots = threading.BoundedSemaphore(threads)
+
+    def limited(environ, start_response):
+        with slots:
+            return wsgi_app(environ, start_response)
+
+    app.wsgi_app = limited
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No access log
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+async def poll(port, path, interval, timeout, deadline, samples, failures):
+    """One tablet polling until the deadline"""
+    await asyncio.sleep(random.random() * interval)  # Spread the first polls
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n"
+    ).encode()
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection("127.0.0.1", port), timeout
+            )
+            try:
+                writer.write(request)
+                data = await asyncio.wait_for(reader.read(), timeout)
+            finally:
+                writer.close()
+            ok = data.startswith(b"HTTP/1.1 200") or data.startswith(b"HTTP/1.0 200")
+        except (OSError, asyncio.TimeoutError):
+            ok = False
+        if ok:
+            samples.append(time.perf_counter() - start)
+        else:
+            failures.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+
+
+async def run_clients(port, clients, args) -> Dict[str, Any]:
+    samples: List[float] = []
+    failures: List[float] = []
+    deadline = time.monotonic() + args.duration
+    await asyncio.gather(
+        *(
+            poll(
+                port,
+                args.path,
+                args.interval,
+                args.timeout,
+                deadline,
+                samples,
+                failures,
+            )
+            for _ in range(clients)
+        )
+    )
+    result = summarize(samples) if samples else {"count": 0}
+    return {
+        **result,
+        "polls_per_second": len(samples) / args.duration,
+        "failures": len(failures),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--clients", default="100,1000,3000")
+    parser.add_argument("--path", default="/order/?limit=20")
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--db-latency-ms", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=5070)
+    parser.add_argument("--serve", choices=("sync", "async"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.threads, args.db_latency_ms / 1000)
+        return
+
+    try:
+        import uvicorn  # noqa: F401
+        import aiosqlite  # noqa: F401
+    except ImportError:
+        sys.exit("The async app needs uvicorn and aiosqlite: pip install them")
+
+    database = os.path.join(tempfile.mkdtemp(), "pollers.db")
+    config = type(
+        "Config", (BenchConfig,), {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{database}"}
+    )
+    app = create_bench_app(config)
+    with app.app_context():
+        seed(orders=args.orders, phones=max(1, args.orders // 5))
+
+    env = {**os.environ, "BENCH_DATABASE_URL": f"sqlite:///{database}"}
+    for mode in ("sync", "async"):
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.async_pollers",
+                f"--serve={mode}",
+                f"--port={args.port}",
+                f"--threads={args.threads}",
+                f"--db-latency-ms={args.db_latency_ms}",
+            ],
+            env=env,
+        )
+        try:
+            wait_for_port(args.port)
+            print(mode)
+            for clients in (int(n) for n in args.clients.split(",")):
+                result = asyncio.run(run_clients(args.port, clients, args))
+                if not result["count"]:
+                    print(f"  clients={clients:<6} every poll failed")
+                    continue
+                print(
+                    f"  clients={clients:<6} polls/s={result['polls_per_second']:8.1f} "
+                    f"p50={result['p50_ms']:8.1f}ms p95={result['p95_ms']:8.1f}ms "
+                    f"p99={result['p99_ms']:8.1f}ms failures={result['failures']}"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Shared helpers for the benchmark scripts, run them from the repo root."""
+
+import os
+import socket
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from app import create_app, db
+from app.config import Config
+
+
+class BenchConfig(Config):
+    """A throwaway SQLite database, override with BENCH_DATABASE_URL"""
+
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        "BENCH_DATABASE_URL"
+    ) or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    SQLALCHEMY_ENGINE_OPTIONS: Dict = {}
+    TESTING = True
+    # Every request comes from one IP, see benchmarks.flood for the limiter
+    RATE_LIMIT_ENABLED = False
+
+
+def create_bench_app(config_class=BenchConfig):
+    """Create the app with an empty schema"""
+    app = create_app(config_class)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def measure(fn: Callable[[], object], iterations: int) -> List[float]:
+    """Call ``fn`` repeatedly and return each call's duration in seconds"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds"""
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+def report(name: str, samples: List[float]) -> None:
+    stats = summarize(samples)
+    print(
+        f"{name:<40} n={stats['count']:<7} mean={stats['mean_ms']:.4f}ms "
+        f"p50={stats['p50_ms']:.4f}ms p95={stats['p95_ms']:.4f}ms "
+        f"p99={stats['p99_ms']:.4f}ms"
+    )
+
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    """Wait for a server started in another process to listen"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
@@ -0,0 +1,74 @@
+"""
+Report bytes on the wire and CPU time per request with response compression.
+
+    python -m benchmarks.compression --orders 10000
+
+Each large listing is fetched uncompressed, with gzip at several levels and
+with brotli when it is installed. Menu responses carry an ETag, so their
+compressed bodies are cached; they are measured with a cold and a warm
+cache.
+"""
+
+import argparse
+import time
+
+from app import compressor, create_app
+from benchmarks.common import BenchConfig, create_bench_app
+from benchmarks.seed import seed
+
+ENDPOINTS = [
+    "/order/?limit=100",
+    "/order/?limit=500",
+    "/order/?limit=100&fields=id,status,total_price",
+    "/menu/?limit=500",
+]
+
+
+def cpu_per_request(client, path, headers, iterations):
+    """Average CPU milliseconds spent serving ``path`` (client included)"""
+    start = time.process_time()
+    for _ in range(iterations):
+        client.get(path, headers=headers)
+    return (time.process_time() - start) / iterations * 1000
+
+
+def run(app, label, encoding, iterations):
+    client = app.test_client()
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    for path in ENDPOINTS:
+        response = client.get(path, headers=headers)
+        size = len(response.data)
+        if path.startswith("/menu/"):
+            compressor._cache.clear()
+            cold = cpu_per_request(client, path, headers, 1)
+            warm = cpu_per_request(client, path, headers, iterations)
+            cpu = f"cold={cold:.2f}ms warm={warm:.2f}ms"
+        else:
+            cpu = f"cpu={cpu_per_request(client, path, headers, iterations):.2f}ms"
+        print(f"{label:<10} {path:<48} bytes={size:<9} {cpu}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        seed(orders=args.orders, phones=max(1, args.orders // 5))
+
+    run(app, "identity", None, args.iterations)
+    for level in (1, 6, 9):
+        config = type("Config", (BenchConfig,), {"COMPRESS_LEVEL": level})
+        run(create_app(config), f"gzip-{level}", "gzip", args.iterations)
+    if "br" in compressor.encodings:
+        for quality in (1, 4, 11):
+            config = type(
+                "Config", (BenchConfig,), {"COMPRESS_BROTLI_QUALITY": quality}
+            )
+            run(create_app(config), f"br-{quality}", "br", args.iterations)
+
+
+if __name__ == "__main__":
+    main()
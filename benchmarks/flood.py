@@ -0,0 +1,215 @@
+"""
+Measure legitimate traffic while a client floods the login and order routes.
+
+    python -m benchmarks.flood --flooders 16 --duration 10
+
+The app runs in a threaded WSGI server in its own process, three times:
+without flood, under flood with admission control disabled, and under
+flood with the rate limits and ``--max-concurrent`` enabled. Legitimate
+tablets place an order and read the menu every ``--interval`` seconds,
+each from its own loopback address and phone; the flooders log in new
+phones and place orders as fast as they can from one address.
+
+The script reports the latency and success rate of the legitimate
+requests and, with the limiter on, the average cost of a decision.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from app import create_app, db
+from app.models.menu import MenuItem
+from benchmarks.common import BenchConfig, create_bench_app, summarize, wait_for_port
+from benchmarks.seed import seed
+
+FLOOD_ADDRESS = "127.0.0.200"
+
+
+def serve(port: int, limiter: bool, max_concurrent: int) -> None:
+    """Run the app until killed, in a process of its own"""
+    import logging
+
+    from werkzeug.serving import make_server
+
+    config = type(
+        "Config",
+        (BenchConfig,),
+        {
+            "RATE_LIMIT_ENABLED": limiter,
+            "MAX_CONCURRENT_REQUESTS": max_concurrent if limiter else 0,
+        },
+    )
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No access log
+    make_server("0.0.0.0", port, create_app(config), threaded=True).serve_forever()
+
+
+def send(port, address, method, path, body=None):
+    conn = http.client.HTTPConnection(
+        "127.0.0.1", port, timeout=30, source_address=(address, 0)
+    )
+    try:
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    except OSError:
+        return 0
+    finally:
+        conn.close()
+
+
+def tablet(port, n, args, deadline, samples, statuses):
+    address = f"127.0.0.{n + 2}"
+    phone = f"091{n:07d}"
+    time.sleep(random.random() * args.interval)
+    while time.monotonic() < deadline:
+        for method, path, body in (
+            (
+                "POST",
+                "/order/",
+                {"phone": phone, "menu_items": [{"id": 1, "quantity": 1}]},
+            ),
+            ("GET", "/menu/?limit=50", None),
+        ):
+            start = time.perf_counter()
+            status = send(port, address, method, path, body)
+            samples.append(time.perf_counter() - start)
+            statuses.append(status)
+        time.sleep(args.interval)
+
+
+def flooder(port, n, deadline, statuses):
+    i = 0
+    while time.monotonic() < deadline:
+        i += 1
+        phone = f"08{n:03d}{i:05d}"
+        statuses.append(
+            send(port, FLOOD_ADDRESS, "POST", "/auth/login", {"phone": phone})
+        )
+        statuses.append(
+            send(
+                port,
+                FLOOD_ADDRESS,
+                "POST",
+                "/order/",
+                {"phone": "0800000000", "menu_items": [{"id": 1, "quantity": 1}]},
+            )
+        )
+
+
+def run(port, args, flood: bool) -> Dict[str, float]:
+    samples: List[float] = []
+    statuses: List[int] = []
+    flood_statuses: List[int] = []
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(
+            target=tablet, args=(port, n, args, deadline, samples, statuses)
+        )
+        for n in range(args.tablets)
+    ]
+    if flood:
+        threads += [
+            threading.Thread(target=flooder, args=(port, n, deadline, flood_statuses))
+            for n in range(args.flooders)
+        ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        **summarize(samples),
+        "ok": sum(200 <= status < 300 for status in statuses) / len(statuses),
+        "flood_requests": len(flood_statuses),
+        "flood_rejected": sum(status in (429, 503) for status in flood_statuses),
+    }
+
+
+def decision_cost(port) -> float:
+    """Average microseconds per rate limit decision, read from /metrics"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request("GET", "/metrics")
+    text = conn.getresponse().read().decode()
+    conn.close()
+    total = re.search(r"^ca_ratelimit_decision_seconds_sum (\S+)", text, re.M)
+    count = re.search(r"^ca_ratelimit_decision_seconds_count (\S+)", text, re.M)
+    if not total or not count or not float(count.group(1)):
+        return 0.0
+    return float(total.group(1)) / float(count.group(1)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--tablets", type=int, default=20)
+    parser.add_argument("--flooders", type=int, default=16)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--max-concurrent", type=int, default=16)
+    parser.add_argument("--port", type=int, default=5071)
+    parser.add_argument("--serve", choices=("on", "off"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.serve == "on", args.max_concurrent)
+        return
+
+    database = os.path.join(tempfile.mkdtemp(), "flood.db")
+    config = type(
+        "Config", (BenchConfig,), {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{database}"}
+    )
+    app = create_bench_app(config)
+    with app.app_context():
+        seed(orders=args.orders, phones=max(1, args.orders // 5))
+        # Never run out of stock during the run
+        db.session.execute(MenuItem.__table__.update().values(quantity=10**9))
+        db.session.commit()
+
+    env = {**os.environ, "BENCH_DATABASE_URL": f"sqlite:///{database}"}
+    for label, limiter, flood in (
+        ("no flood", "off", False),
+        ("flood, no limiter", "off", True),
+        ("flood, limiter", "on", True),
+    ):
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.flood",
+                f"--serve={limiter}",
+                f"--port={args.port}",
+                f"--max-concurrent={args.max_concurrent}",
+            ],
+            env=env,
+        )
+        try:
+            wait_for_port(args.port)
+            result = run(args.port, args, flood)
+            line = (
+                f"{label:<20} p50={result['p50_ms']:8.1f}ms "
+                f"p99={result['p99_ms']:8.1f}ms ok={result['ok'] * 100:5.1f}% "
+                f"flood={result['flood_requests']} "
+                f"rejected={result['flood_rejected']}"
+            )
+            if limiter == "on":
+                line += f" decision={decision_cost(args.port):.1f}us"
+            print(line)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Report order and login latencies with and without the query indexes.
+
+    python -m benchmarks.indexes --orders 1000000
+
+The database is seeded once, every endpoint is measured with the indexes
+declared on the models, then again after dropping them.
+"""
+
+import argparse
+
+from app import db
+from app.models.order import Order, OrderItem
+from benchmarks.common import create_bench_app, measure, report
+from benchmarks.seed import seed
+
+INDEXES = [
+    *Order.__table__.indexes,
+    *OrderItem.__table__.indexes,
+]
+
+ENDPOINTS = [
+    ("GET", "/order/?status=1&limit=50", None),
+    ("GET", "/order/?phone=0900000042&limit=50", None),
+    ("GET", "/order/?phone=0900000042&status=2&limit=50", None),
+    ("GET", "/order/byphone?phone=0900000042&limit=50", None),
+    ("GET", "/order/?limit=50&fields=id,status,items.quantity", None),
+    ("GET", "/order/4242", None),
+    ("POST", "/auth/login", {"phone": "0900000042"}),
+]
+
+
+def run(client, iterations):
+    for method, path, body in ENDPOINTS:
+        report(
+            f"{method} {path}"[:40],
+            measure(lambda: client.open(path, method=method, json=body), iterations),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    client = app.test_client()
+    with app.app_context():
+        seed(orders=args.orders)
+
+        print("== with indexes")
+        run(client, args.iterations)
+
+        for index in INDEXES:
+            index.drop(db.engine)
+        print("== without indexes")
+        run(client, args.iterations)
+
+        for index in INDEXES:
+            index.create(db.engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Compare order throughput of the synchronous path and the write-behind intake.
+
+    python -m benchmarks.intake --orders 2000 --threads 8 --commit-latency-ms 5
+
+``--threads`` clients place ``--orders`` orders through ``POST /order/``,
+first with every order committed by its request, then with
+``ORDER_INTAKE_ENABLED`` where requests only append to the journal and the
+drain thread places the orders in batches. The script reports the orders
+accepted per second with their latency and, for the intake, the orders
+placed per second until the journal is empty and the average batch size.
+
+SQLite commits in microseconds where MySQL waits for a replicated fsync,
+``--commit-latency-ms`` adds that wait to every database commit.
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import db, intake
+from app.models.menu import MenuItem
+from app.models.order import Order
+from benchmarks.common import BenchConfig, create_bench_app, summarize
+from benchmarks.seed import seed
+
+
+def add_commit_latency(seconds: float) -> None:
+    """Make every database commit wait ``seconds``"""
+
+    @event.listens_for(Engine, "commit")
+    def wait(conn):
+        time.sleep(seconds)
+
+
+def run(app, args) -> Dict[str, float]:
+    samples: List[float] = []
+    statuses: List[int] = []
+    per_thread = args.orders // args.threads
+
+    def client(n):
+        test_client = app.test_client()
+        for i in range(per_thread):
+            start = time.perf_counter()
+            response = test_client.post(
+                "/order/",
+                json={
+                    "phone": f"09{n:02d}{i:06d}",
+                    "menu_items": [{"id": 1 + i % 20, "quantity": 1}],
+                },
+            )
+            samples.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        **summarize(samples),
+        "per_second": len(samples) / elapsed,
+        "errors": sum(status not in (201, 202) for status in statuses),
+        "elapsed": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--commit-latency-ms", type=float, default=5.0)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    for label, enabled in (("sync", False), ("intake", True)):
+        config = type(
+            "Config",
+            (BenchConfig,),
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///"
+                + os.path.join(directory, f"{label}.db"),
+                "ORDER_INTAKE_ENABLED": enabled,
+                "ORDER_INTAKE_JOURNAL": os.path.join(directory, f"{label}.journal"),
+                "ORDER_INTAKE_BATCH_SIZE": args.batch_size,
+            },
+        )
+        app = create_bench_app(config)
+        with app.app_context():
+            seed(orders=0, phones=1)
+            # Never run out of stock during the run
+            db.session.execute(MenuItem.__table__.update().values(quantity=10**9))
+            db.session.commit()
+        if label == "sync":
+            add_commit_latency(args.commit_latency_ms / 1000)
+
+        start = time.perf_counter()
+        result = run(app, args)
+        print(
+            f"{label:<7} accepted/s={result['per_second']:8.1f} "
+            f"p50={result['p50_ms']:7.1f}ms p99={result['p99_ms']:7.1f}ms "
+            f"errors={result['errors']}"
+        )
+        if enabled:
+            with app.app_context():
+                while intake.journal.backlog():
+                    time.sleep(0.01)
+                elapsed = time.perf_counter() - start
+                placed = Order.query.filter(Order.intake_id.isnot(None)).count()
+            print(
+                f"{'':<7} placed/s={placed / elapsed:8.1f} "
+                f"batches={intake.batches} "
+                f"orders/batch={intake.drained / max(1, intake.batches):.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Measure order endpoint latency while staff logins hammer the server.
+
+    python -m benchmarks.login_storm --logins 32 --requests 300
+
+Run it with different PASSWORD_HASH_WORKERS / PASSWORD_HASH_QUEUE values to
+see how the bounded hashing pool protects order reads during a login storm.
+"""
+
+import argparse
+import http.client
+import json
+import threading
+from collections import Counter
+
+from werkzeug.serving import make_server
+
+from app import db
+from app.models.category import Category
+from app.models.menu import MenuItem
+from app.services.auth import AuthService
+from benchmarks.common import create_bench_app, measure, report
+
+PHONE, PASSWORD = "0900000000", "benchmark-password"
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request(
+        method,
+        path,
+        body=json.dumps(body) if body is not None else None,
+        headers={"Content-Type": "application/json"},
+    )
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=32, help="login threads")
+    parser.add_argument("--requests", type=int, default=300, help="order reads")
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        AuthService.add_user(phone=PHONE, is_staff=True, password=PASSWORD)
+        category = Category(name="Benchmark")
+        db.session.add(category)
+        db.session.flush()
+        db.session.add(
+            MenuItem(name="Item", price=1.0, quantity=10**9, category_id=category.id)
+        )
+        db.session.commit()
+
+    server = make_server("127.0.0.1", args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    request(args.port, "POST", "/order/", {"phone": "1", "menu_items": [{"id": 1}]})
+
+    def read_order():
+        request(args.port, "GET", "/order/1")
+
+    report("GET /order/1 idle", measure(read_order, args.requests))
+
+    stop = threading.Event()
+    outcomes = Counter()
+
+    def login_loop():
+        body = {"phone": PHONE, "password": PASSWORD, "is_staff": True}
+        while not stop.is_set():
+            outcomes[request(args.port, "POST", "/auth/login", body)] += 1
+
+    threads = [threading.Thread(target=login_loop) for _ in range(args.logins)]
+    for thread in threads:
+        thread.start()
+    try:
+        report("GET /order/1 during login storm", measure(read_order, args.requests))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        server.shutdown()
+    print(f"login responses: {dict(outcomes)}")
+
+
+if __name__ == "__main__":
+    main()
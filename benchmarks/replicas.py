@@ -0,0 +1,131 @@
+"""
+Check read replica routing with two SQLite files and time the read paths.
+
+    python -m benchmarks.replicas --orders 10000
+
+A primary database is seeded, then copied to a replica file. A second,
+unreachable replica is configured as well, so the first requests also
+exercise the failover. The script counts the statements run on each engine
+for every request and exits with status 1 when a read-only handler hit the
+primary (catalog cache misses excepted), a write hit a replica or the unreachable replica was not skipped.
+Since the copy never catches up, it also shows what replica lag looks like
+to a client reading its own write from another request.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import create_app, db
+from app.models.order import Order
+from benchmarks.common import BenchConfig, create_bench_app, measure, report
+from benchmarks.seed import seed
+
+READS = [
+    "/order/?limit=100",
+    "/order/byphone?phone=0900000001",
+    "/order/1",
+]
+# Catalog cache misses are always loaded from the primary
+CATALOG_READS = ["/menu/?limit=100", "/categories/"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    primary = os.path.join(directory, "primary.db")
+    replica = os.path.join(directory, "replica.db")
+    missing = os.path.join(directory, "missing", "replica.db")
+
+    config = type(
+        "Config", (BenchConfig,), {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{primary}"}
+    )
+    app = create_bench_app(config)
+    with app.app_context():
+        seed(orders=args.orders, phones=max(1, args.orders // 5))
+        db.engine.dispose()
+    shutil.copyfile(primary, replica)
+
+    statements = Counter()
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements[conn.engine.url.database] += 1
+
+    config = type(
+        "Config",
+        (config,),
+        {"DB_REPLICA_URIS": [f"sqlite:///{missing}", f"sqlite:///{replica}"]},
+    )
+    app = create_app(config)
+    client = app.test_client()
+    failures = []
+
+    def check(label, response, expect):
+        print(f"{label:<40} {response.status_code} {dict(statements)}")
+        if not statements[expect] or len(statements) > 1:
+            failures.append(label)
+        statements.clear()
+
+    # The first read picks the unreachable replica and is retried on the
+    # primary, the following ones skip it
+    statements.clear()
+    response = client.get(READS[0])
+    print(f"{'failover ' + READS[0]:<40} {response.status_code} {dict(statements)}")
+    if response.status_code != 200:
+        failures.append("failover")
+    statements.clear()
+    for path in READS:
+        check(path, client.get(path), replica)
+    for path in CATALOG_READS:
+        check(path, client.get(path), primary)
+
+    response = client.post(
+        "/order/",
+        json={"phone": "0911111111", "menu_items": [{"id": 1, "quantity": 1}]},
+    )
+    check("POST /order/", response, primary)
+    order_id = response.get_json()["order"]["id"]
+    check(
+        f"/order/{order_id} (lagging replica)",
+        client.get(f"/order/{order_id}"),
+        replica,
+    )
+
+    # Within a request, reads after a write stay on the primary
+    with app.test_request_context():
+        g.db_read_only = True
+        Order.query.first()
+        db.session.query(Order).filter_by(id=order_id).update(
+            {Order.status: Order.status}
+        )
+        db.session.rollback()
+        Order.query.first()
+        print(f"{'read, write, read in one request':<40} {dict(statements)}")
+        if statements[replica] != 1:
+            failures.append("read after write")
+        statements.clear()
+        db.session.remove()
+
+    print(f"replicas: {db.router.status()}")
+    for path in READS + CATALOG_READS:
+        report(f"replica {path}", measure(lambda: client.get(path), args.iterations))
+
+    if failures:
+        print(f"Misrouted: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Seed a database with realistic volumes for the benchmarks.
+
+    python -m benchmarks.seed --orders 1000000
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.category import Category
+from app.models.menu import MenuItem
+from app.models.order import Order, OrderItem, OrderStatus
+from app.services.analytics import AnalyticsService
+from app.services.auth import AuthService
+
+STAFF_PHONE, STAFF_PASSWORD = "0900000000", "benchmark-password"
+
+
+def _insert(table, rows):
+    if rows:
+        db.session.execute(table.insert(), rows)
+
+
+def seed(
+    categories: int = 20,
+    menu_items: int = 2000,
+    orders: int = 100_000,
+    phones: int = 20_000,
+    chunk: int = 10_000,
+    random_seed: int = 0,
+) -> None:
+    """
+    Fill an empty schema, must be called inside an app context.
+
+    Orders get 1 to 4 items each, a random status and a phone out of
+    ``phones`` distinct customers, a tenth of them with no phone at all.
+    """
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+
+    AuthService.add_user(phone=STAFF_PHONE, is_staff=True, password=STAFF_PASSWORD)
+
+    _insert(
+        Category.__table__,
+        [{"id": i, "name": f"Category {i}"} for i in range(1, categories + 1)],
+    )
+    prices = {i: float(rng.randint(10, 200) * 1000) for i in range(1, menu_items + 1)}
+    category_ids = {i: rng.randint(1, categories) for i in range(1, menu_items + 1)}
+    _insert(
+        MenuItem.__table__,
+        [
+            {
+                "id": i,
+                "name": f"Menu item {i}",
+                "quantity": 10**9,
+                "price": prices[i],
+                "description": f"Description of menu item {i}",
+                "category_id": category_ids[i],
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(1, menu_items + 1)
+        ],
+    )
+    db.session.commit()
+
+    statuses = [status.value for status in OrderStatus]
+    item_id = 0
+    for start in range(1, orders + 1, chunk):
+        order_rows, item_rows = [], []
+        for order_id in range(start, min(start + chunk, orders + 1)):
+            total = 0.0
+            for _ in range(rng.randint(1, 4)):
+                item_id += 1
+                menu_item_id = rng.randint(1, menu_items)
+                quantity = rng.randint(1, 3)
+                total += prices[menu_item_id] * quantity
+                item_rows.append(
+                    {
+                        "id": item_id,
+                        "order_id": order_id,
+                        "menu_item_id": menu_item_id,
+                        "quantity": quantity,
+                        "price": prices[menu_item_id] * quantity,
+                        "item_name": f"Menu item {menu_item_id}",
+                        "unit_price": prices[menu_item_id],
+                        "category_name": f"Category {category_ids[menu_item_id]}",
+                    }
+                )
+            created_at = now - timedelta(minutes=orders - order_id)
+            order_rows.append(
+                {
+                    "id": order_id,
+                    "customer_phone": (
+                        f"09{rng.randint(1, phones):08d}"
+                        if rng.random() > 0.1
+                        else None
+                    ),
+                    "status": rng.choice(statuses),
+                    "total_price": total,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+            )
+        _insert(Order.__table__, order_rows)
+        _insert(OrderItem.__table__, item_rows)
+        db.session.commit()
+
+    AnalyticsService.rebuild(batch_size=chunk)
+
+
+def main():
+    from benchmarks.common import create_bench_app
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--menu-items", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        seed(categories=args.categories, menu_items=args.menu_items, orders=args.orders)
+        print(f"Seeded {app.config['SQLALCHEMY_DATABASE_URI']}")
+
+
+if __name__ == "__main__":
+    main()
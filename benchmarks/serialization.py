@@ -0,0 +1,90 @@
+"""
+Compare the two ways of serializing a large order listing.
+
+    python -m benchmarks.serialization --orders 10000
+
+``orm+std`` loads ORM instances, builds dicts with ``to_dict`` and encodes
+them with the stdlib, which is how every listing used to work.
+``rows+orjson`` builds dicts straight from column rows with
+``OrderService.list_orders`` and encodes them with orjson. Loading and
+encoding are also timed separately to show where the time goes.
+"""
+
+import argparse
+
+from flask import json
+from sqlalchemy.orm import selectinload
+
+from app.models.order import Order
+from app.services.order import OrderService
+from app.utils.fields import FieldsUtils
+from app.utils.json import dumps
+from benchmarks.common import create_bench_app, measure, report
+from benchmarks.seed import seed
+
+PROJECTIONS = [None, "id,status,total_price,items.quantity,items.price"]
+
+
+def orm_load(limit, fields):
+    query = Order.query
+    if FieldsUtils.wants(fields, "items"):
+        query = query.options(selectinload(Order.items))
+    orders = query.order_by(Order.status, Order.id).limit(limit).all()
+    return [order.to_dict(fields) for order in orders]
+
+
+def rows_load(limit, fields):
+    orders, _ = OrderService.list_orders(limit=limit, fields=fields)
+    return orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        seed(orders=args.orders, phones=max(1, args.orders // 5))
+
+    for projection in PROJECTIONS:
+        fields = FieldsUtils.parse(projection)
+        print(f"== fields={projection or '*'}")
+        with app.test_request_context():
+            orm_data = orm_load(args.orders, fields)
+            rows_data = rows_load(args.orders, fields)
+            assert orm_data == rows_data, "Both paths must serialize the same"
+
+            report(
+                "orm+std",
+                measure(
+                    lambda: json.dumps(orm_load(args.orders, fields)),
+                    args.iterations,
+                ),
+            )
+            report(
+                "rows+orjson",
+                measure(
+                    lambda: dumps(rows_load(args.orders, fields)),
+                    args.iterations,
+                ),
+            )
+            report(
+                "  load orm+to_dict",
+                measure(lambda: orm_load(args.orders, fields), args.iterations),
+            )
+            report(
+                "  load rows",
+                measure(lambda: rows_load(args.orders, fields), args.iterations),
+            )
+            report(
+                "  encode std", measure(lambda: json.dumps(rows_data), args.iterations)
+            )
+            report(
+                "  encode orjson", measure(lambda: dumps(rows_data), args.iterations)
+            )
+
+
+if __name__ == "__main__":
+    main()
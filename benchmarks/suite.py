@@ -0,0 +1,420 @@
+"""
+Drive every auth, menu, order and category route and report regressions.
+
+    python -m benchmarks.suite --orders 1000000 --save-baseline baseline.json
+    python -m benchmarks.suite --orders 1000000 --baseline baseline.json
+
+    # Against the committed baseline
+    python -m benchmarks.suite --orders 10000 --phones 2000 \\
+        --baseline benchmarks/baseline.json --ignore-latency
+
+The database (SQLite, or BENCH_DATABASE_URL for a local MySQL) is seeded
+once, then every scenario runs through the Flask test client and through a
+threaded WSGI server under concurrent clients. Each scenario reports its
+p50/p95/p99 latency, throughput, SQL statements per request and errors.
+
+With ``--baseline`` the run is compared to a saved one and the script exits
+with status 1 when a scenario got slower than ``--tolerance`` allows, fails
+more often or runs more SQL statements. Compare runs made with the same
+volumes on the same machine. ``benchmarks/baseline.json`` was recorded with
+the volumes above on a single CPU; its statement and error counts hold on
+any machine, compare timings to a baseline saved on yours.
+``GET /order/stream`` is left out, it never completes.
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+from werkzeug.serving import make_server
+
+from app import db
+from app.models.order import Order
+from benchmarks.common import create_bench_app, summarize
+from benchmarks.seed import STAFF_PASSWORD, STAFF_PHONE, seed
+
+State = Dict[str, Any]
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    path: Callable[[State, int], str]
+    body: Optional[Callable[[State, int], Any]] = None
+    staff: bool = False
+    # Fraction of --iterations to run, slow scenarios run less often
+    weight: float = 1.0
+    # Called with the state and the JSON response of successful requests
+    collect: Optional[Callable[[State, Dict[str, Any]], None]] = None
+
+
+def _phone(state: State, i: int) -> str:
+    return f"09{state['rng'].randint(1, state['phones']):08d}"
+
+
+def _order_id(state: State, i: int) -> int:
+    return state["rng"].randint(1, state["orders"])
+
+
+def _menu_item_id(state: State, i: int) -> int:
+    return state["rng"].randint(1, state["menu_items"])
+
+
+# fmt: off
+SCENARIOS: List[Scenario] = [
+    # auth
+    Scenario("auth.login client", "POST", lambda s, i: "/auth/login",
+             lambda s, i: {"phone": _phone(s, i)}),
+    Scenario("auth.login staff", "POST", lambda s, i: "/auth/login",
+             lambda s, i: {"phone": STAFF_PHONE, "password": STAFF_PASSWORD,
+                           "is_staff": True}, weight=0.1),
+    # category
+    Scenario("category.get", "GET", lambda s, i: "/categories/"),
+    Scenario("category.create", "POST", lambda s, i: "/categories/",
+             lambda s, i: {"name": f"Suite category {s['run']}-{i}"}, staff=True,
+             collect=lambda s, r: s["category_ids"].append(r["category"]["id"])),
+    Scenario("category.update", "PUT",
+             lambda s, i: f"/categories/{s['category_ids'][i % len(s['category_ids'])]}",
+             lambda s, i: {"name": f"Suite renamed {s['run']}-{i}"}, staff=True),
+    Scenario("category.delete", "DELETE",
+             lambda s, i: f"/categories/{s['category_ids'].pop()}", staff=True),
+    # menu
+    Scenario("menu.get", "GET", lambda s, i: "/menu/?limit=100"),
+    Scenario("menu.get fields", "GET", lambda s, i: "/menu/?limit=500&fields=id,name,price"),
+    Scenario("menu.search", "GET",
+             lambda s, i: f"/menu/search?name=menu+item+{_menu_item_id(s, i)}"),
+    Scenario("menu.create", "POST", lambda s, i: "/menu/",
+             lambda s, i: {"name": f"Suite item {s['run']}-{i}", "category_id": 1,
+                           "price": 10000, "description": "Suite"}, staff=True,
+             collect=lambda s, r: s["menu_item_ids"].append(r["menu_item"]["id"])),
+    Scenario("menu.add_quantity", "PUT",
+             lambda s, i: f"/menu/{_menu_item_id(s, i)}/add-quantity",
+             lambda s, i: {"quantity": 5}, staff=True),
+    Scenario("menu.reduce_quantity", "PUT",
+             lambda s, i: f"/menu/{_menu_item_id(s, i)}/reduce-quantity",
+             lambda s, i: {"quantity": 5}, staff=True),
+    Scenario("menu.update_description", "PUT",
+             lambda s, i: f"/menu/{_menu_item_id(s, i)}/update-description",
+             lambda s, i: {"description": f"Updated {i}"}, staff=True),
+    Scenario("menu.quantities", "PUT", lambda s, i: "/menu/quantities",
+             lambda s, i: {"items": [{"id": _menu_item_id(s, i), "quantity": 1}
+                                     for _ in range(20)]}, staff=True),
+    Scenario("menu.import", "POST", lambda s, i: "/menu/import",
+             lambda s, i: "name,category_id,price,description\n" + "".join(
+                 f"Suite import {n},1,{1000 + i},Imported\n" for n in range(50)),
+             staff=True, weight=0.2),
+    Scenario("menu.export", "GET", lambda s, i: "/menu/export?format=jsonl",
+             staff=True, weight=0.1),
+    Scenario("menu.delete", "DELETE",
+             lambda s, i: f"/menu/{s['menu_item_ids'].pop()}", staff=True),
+    # order
+    Scenario("order.create", "POST", lambda s, i: "/order/",
+             lambda s, i: {"phone": _phone(s, i), "menu_items": [
+                 {"id": _menu_item_id(s, i), "quantity": 1} for _ in range(3)]}),
+    Scenario("order.get", "GET", lambda s, i: f"/order/{_order_id(s, i)}"),
+    Scenario("order.list", "GET", lambda s, i: "/order/?limit=100"),
+    Scenario("order.list status", "GET",
+             lambda s, i: f"/order/?status={1 + i % 4}&limit=100"),
+    Scenario("order.list fields", "GET",
+             lambda s, i: "/order/?limit=500&fields=id,status,total_price"),
+    Scenario("order.byphone", "GET",
+             lambda s, i: f"/order/byphone?phone={_phone(s, i)}"),
+    Scenario("order.update_status", "PUT",
+             lambda s, i: f"/order/{_order_id(s, i)}/status",
+             lambda s, i: {"status": "READY"}),
+    Scenario("order.check", "PUT",
+             lambda s, i: f"/order/{s['unclaimed_order_ids'].pop()}/check",
+             lambda s, i: {"phone": _phone(s, i)}),
+]
+# fmt: on
+
+
+class QueryCounter:
+    """Count the SQL statements run by every engine of the app"""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _after_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+class TestClientTransport:
+    """Send requests through the Flask test client, in process"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def send(self, method, path, body, headers) -> Tuple[int, bytes]:
+        kwargs = {"data": body} if isinstance(body, str) else {"json": body}
+        try:
+            response = self._client.open(path, method=method, headers=headers, **kwargs)
+        except Exception:  # TESTING propagates exceptions, count them as 500s
+            return 500, b""
+        return response.status_code, response.data
+
+
+class ServerTransport:
+    """Send requests over HTTP to a threaded WSGI server"""
+
+    def __init__(self, app, port):
+        self._port = port
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No access log
+        self._server = make_server("127.0.0.1", port, app, threaded=True)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def send(self, method, path, body, headers) -> Tuple[int, bytes]:
+        if isinstance(body, str):
+            payload = body.encode()
+        else:
+            payload = json.dumps(body).encode() if body is not None else None
+            headers = {**headers, "Content-Type": "application/json"}
+        conn = http.client.HTTPConnection("127.0.0.1", self._port, timeout=60)
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        finally:
+            conn.close()
+
+    def close(self):
+        self._server.shutdown()
+
+
+def run_scenario(
+    transport, scenario: Scenario, state: State, iterations: int, concurrency: int
+) -> Dict[str, Any]:
+    iterations = max(1, int(iterations * scenario.weight))
+    headers = {"Authorization": f"Bearer {state['token']}"} if scenario.staff else {}
+    if scenario.path(state, 0).startswith("/menu/import"):
+        headers = {**headers, "Content-Type": "text/csv"}
+
+    samples: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    counter: QueryCounter = state["query_counter"]
+    queries_before = counter.count
+
+    def worker(indexes):
+        nonlocal errors
+        for i in indexes:
+            try:
+                path = scenario.path(state, i)
+                body = scenario.body(state, i) if scenario.body else None
+            except IndexError:  # Nothing left to delete
+                break
+            start = time.perf_counter()
+            status, data = transport.send(scenario.method, path, body, headers)
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append(elapsed)
+                errors += status >= 400
+            if scenario.collect and status < 400:
+                scenario.collect(state, json.loads(data))
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=worker, args=(range(n, iterations, concurrency),))
+        for n in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - start
+
+    if not samples:
+        return {"count": 0, "errors": 0}
+    return {
+        **summarize(samples),
+        "rps": len(samples) / wall_time,
+        "queries": (counter.count - queries_before) / len(samples),
+        "errors": errors,
+    }
+
+
+def run_all(transport, state: State, iterations: int, concurrency: int):
+    results = {}
+    for scenario in SCENARIOS:
+        result = run_scenario(transport, scenario, state, iterations, concurrency)
+        results[scenario.name] = result
+        if not result["count"]:
+            print(f"  {scenario.name:<28} skipped")
+            continue
+        print(
+            f"  {scenario.name:<28} n={result['count']:<5} "
+            f"p50={result['p50_ms']:8.2f}ms p95={result['p95_ms']:8.2f}ms "
+            f"p99={result['p99_ms']:8.2f}ms rps={result['rps']:8.1f} "
+            f"queries={result['queries']:6.1f} errors={result['errors']}"
+        )
+    return results
+
+
+def compare(
+    results, baseline, tolerance: float, min_delta_ms: float, latency: bool = True
+) -> List[str]:
+    """List the scenarios that got slower, fail more or run more statements"""
+    regressions = []
+    for mode, scenarios in baseline["results"].items():
+        for name, before in scenarios.items():
+            after = results.get(mode, {}).get(name)
+            if not after or not after["count"] or not before["count"]:
+                continue
+            if (
+                latency
+                and after["p95_ms"] > before["p95_ms"] * (1 + tolerance)
+                and after["p95_ms"] - before["p95_ms"] > min_delta_ms
+            ):
+                regressions.append(
+                    f"{mode} {name}: p95 {before['p95_ms']:.2f}ms"
+                    f" -> {after['p95_ms']:.2f}ms"
+                )
+            if after["errors"] > before["errors"]:
+                regressions.append(
+                    f"{mode} {name}: errors {before['errors']} -> {after['errors']}"
+                )
+            if after["queries"] > before["queries"] + 0.5:
+                regressions.append(
+                    f"{mode} {name}: queries {before['queries']:.1f}"
+                    f" -> {after['queries']:.1f}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--menu-items", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--phones", type=int, default=20_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=5098)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--ignore-latency",
+        action="store_true",
+        help="only compare errors and statements, e.g. to a baseline recorded "
+        "on another machine",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=1.0,
+        help="ignore p95 increases smaller than this",
+    )
+    args = parser.parse_args()
+    # Before seeding, which takes a while with large volumes
+    if args.baseline and not os.path.isfile(args.baseline):
+        parser.error(
+            f"no baseline at {args.baseline}, record one first with"
+            f" --save-baseline {args.baseline}"
+        )
+
+    app = create_bench_app()
+    with app.app_context():
+        seed(
+            categories=args.categories,
+            menu_items=args.menu_items,
+            orders=args.orders,
+            phones=args.phones,
+        )
+        unclaimed = [
+            order_id
+            for order_id, in Order.query.with_entities(Order.id)
+            .filter(Order.customer_phone.is_(None))
+            .limit(args.iterations * 2)
+        ]
+        query_counter = QueryCounter(db.engine)
+
+    token = (
+        app.test_client()
+        .post(
+            "/auth/login",
+            json={"phone": STAFF_PHONE, "password": STAFF_PASSWORD, "is_staff": True},
+        )
+        .get_json()["token"]
+    )
+
+    results = {}
+    transports = [
+        ("test_client", lambda: TestClientTransport(app), 1),
+        ("server", lambda: ServerTransport(app, args.port), args.concurrency),
+    ]
+    for mode, make_transport, concurrency in transports:
+        print(f"== {mode} (concurrency={concurrency})")
+        state: State = {
+            "rng": random.Random(0),
+            "run": mode,
+            "token": token,
+            "phones": args.phones,
+            "orders": args.orders,
+            "menu_items": args.menu_items,
+            "category_ids": [],
+            "menu_item_ids": [],
+            "unclaimed_order_ids": (
+                unclaimed[: args.iterations]
+                if mode == "test_client"
+                else unclaimed[args.iterations :]
+            ),
+            "query_counter": query_counter,
+        }
+        transport = make_transport()
+        results[mode] = run_all(transport, state, args.iterations, concurrency)
+        if isinstance(transport, ServerTransport):
+            transport.close()
+
+    report = {
+        "volumes": {
+            "categories": args.categories,
+            "menu_items": args.menu_items,
+            "orders": args.orders,
+            "phones": args.phones,
+        },
+        "database": app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0],
+        "iterations": args.iterations,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["volumes"] != report["volumes"]:
+            print("Warning: the baseline was recorded with different volumes")
+        regressions = compare(
+            results,
+            baseline,
+            args.tolerance,
+            args.min_delta_ms,
+            latency=not args.ignore_latency,
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regression against the baseline")
+
+
+if __name__ == "__main__":
+    main()
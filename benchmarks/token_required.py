@@ -0,0 +1,48 @@
+"""
+Compare the overhead of ``token_required`` with and without the token cache.
+
+    python -m benchmarks.token_required --iterations 20000
+"""
+
+import argparse
+import datetime
+
+import jwt
+
+from app.config import Config
+from app.utils.auth import token_cache, token_required
+from benchmarks.common import create_bench_app, measure, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    token = jwt.encode(
+        {
+            "id": 1,
+            "phone": "0900000000",
+            "is_staff": True,
+            "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+        },
+        Config.SECRET_KEY,
+        algorithm="HS256",
+    )
+    view = token_required(lambda: None)
+
+    with app.test_request_context(headers={"Authorization": f"Bearer {token}"}):
+        maxsize = token_cache.maxsize
+        token_cache.maxsize = 0
+        token_cache.clear()
+        report("token_required (uncached)", measure(view, args.iterations))
+
+        token_cache.maxsize = maxsize
+        view()  # Warm the cache
+        report("token_required (cached)", measure(view, args.iterations))
+        print(f"cache hits={token_cache.hits} misses={token_cache.misses}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
 import time
 
 from flask import Response
-from app import create_app, db
+from app import create_app, db, intake
 from app.models.user import User
 from app.models.menu import MenuItem
 from app.models.order import Order, OrderItem
 from flask_migrate import Migrate
 
+from app.services.analytics import AnalyticsService
 from app.services.auth import AuthService
+from app.services.idempotency import IdempotencyService
+from app.services.order import OrderService
 
 app = create_app()
 migrate = Migrate(app, db)
@@ -37,5 +40,37 @@ def create_admin():
     print(f"Admin user created with phone: {phone}")
 
 
+@app.cli.command("backfill-order-snapshots")
+def backfill_order_snapshots():
+    """Fill the menu item snapshot of existing order items, run after upgrading"""
+    result = OrderService.backfill_snapshots()
+    print(
+        f"Backfilled {result['updated']} order items, "
+        f"{result['orphaned']} of them without a menu item"
+    )
+
+
+@app.cli.command("rebuild-analytics")
+def rebuild_analytics():
+    """Recompute the sales and status rollups from the order history"""
+    result = AnalyticsService.rebuild()
+    print(f"Rebuilt analytics from {result['orders']} orders")
+
+
+@app.cli.command("purge-idempotency-keys")
+def purge_idempotency_keys():
+    """Delete the expired idempotency keys, run it periodically"""
+    print(f"Deleted {IdempotencyService.purge()} expired idempotency keys")
+
+
+@app.cli.command("drain-order-intake")
+def drain_order_intake():
+    """Place every order left in the intake journal, e.g. after disabling it"""
+    if intake.journal is None:
+        print("No order intake journal")
+        return
+    print(f"Placed {intake.drain()} journaled orders")
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,64 @@
+import pytest
+
+from app import create_app, db
+from app.config import Config
+from app.models.category import Category
+from app.models.menu import MenuItem
+
+
+@pytest.fixture
+def config(tmp_path):
+    """The config of the app, override it for other settings"""
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        # Concurrent writers wait for the database lock instead of failing
+        SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"timeout": 30}}
+        TESTING = True
+        RATE_LIMIT_ENABLED = False
+        INSTRUMENTATION_ENABLED = False
+        ORDER_INTAKE_ENABLED = False
+        ORDER_INTAKE_JOURNAL = str(tmp_path / "order_intake.db")
+
+    return TestConfig
+
+
+@pytest.fixture
+def app(config):
+    """The app on an empty file-backed SQLite database"""
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_menu_item(app):
+    """Create a menu item, in a category of its own by default"""
+
+    def make(
+        name: str, quantity: int, price: float = 10.0, category=None, description=None
+    ):
+        if category is None:
+            category = Category(name=f"Category of {name}")
+            db.session.add(category)
+            db.session.flush()
+        menu_item = MenuItem(
+            name=name,
+            quantity=quantity,
+            price=price,
+            category_id=category.id,
+            description=description,
+        )
+        db.session.add(menu_item)
+        db.session.commit()
+        return menu_item.id
+
+    return make
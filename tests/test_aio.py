@@ -0,0 +1,103 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.aio import AsyncReadApp
+
+
+@pytest.fixture
+def make_aio(app):
+    """Create the async app, once the test data is written through the sync one"""
+    created = []
+
+    def make():
+        created.append(AsyncReadApp(app))
+        return created[-1]
+
+    yield make
+    # Back to the sync engines for the other tests
+    for aio in created:
+        sync_engines = {engine.sync_engine for engine in aio.engines}
+        for engine, override in list(db.engine_overrides.items()):
+            if override in sync_engines:
+                del db.engine_overrides[engine]
+
+
+def serve(aio, requests):
+    """Send ``(method, path)`` requests at once, then shut the app down"""
+
+    async def call(method, path):
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "http_version": "1.1",
+            "method": method,
+            "path": path,
+            "query_string": query.encode(),
+            "headers": [(b"host", b"localhost")],
+        }
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            sent.append(message)
+
+        await aio(scope, receive, send)
+        return sent[0]["status"], json.loads(sent[1]["body"])
+
+    async def shutdown():
+        messages = iter([{"type": "lifespan.shutdown"}])
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            pass
+
+        # Closes the pooled aiosqlite connections and their threads
+        await aio({"type": "lifespan"}, receive, send)
+
+    async def main():
+        try:
+            return await asyncio.gather(*(call(*request) for request in requests))
+        finally:
+            await shutdown()
+
+    # In a thread of its own, outside the app context of the fixture like
+    # under an ASGI server, so every request tears its session down
+    with ThreadPoolExecutor(1) as executor:
+        return executor.submit(asyncio.run, main()).result()
+
+
+def test_read_only_routes_are_served_over_the_async_driver(make_aio, make_menu_item):
+    menu_item_ids = [make_menu_item(f"Item {n}", n) for n in range(3)]
+    aio = make_aio()
+    statements = []
+    event.listen(
+        aio.engines[0].sync_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+
+    responses = serve(aio, [("GET", "/menu/")] * 20)
+    assert all(status == 200 for status, _ in responses)
+    assert all(data == responses[0][1] for _, data in responses)
+    assert [item["id"] for item in responses[0][1]["menu_items"]] == menu_item_ids
+    assert statements  # On aiosqlite, not the sync engine
+
+
+def test_other_routes_are_not_served(make_aio):
+    responses = serve(make_aio(), [("GET", "/order/kitchen"), ("POST", "/order/")])
+    assert (
+        responses
+        == [
+            (404, {"success": False, "message": "Not served in async mode"}),
+        ]
+        * 2
+    )
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from app import db
+from app.models.analytics import HourlySales, OrderStatusCount
+from app.models.order import OrderStatus
+from app.services.analytics import AnalyticsService
+from app.services.order import OrderService
+
+
+def reports():
+    today = datetime.utcnow().date()  # Like Order.created_at
+    return (
+        AnalyticsService.sales(today, today),
+        AnalyticsService.sales(today, today, hourly=True),
+        AnalyticsService.best_sellers(today, today, 10),
+        AnalyticsService.category_sales(today, today),
+        AnalyticsService.status_counts(),
+    )
+
+
+def test_orders_count_in_their_shard_and_reports_sum_the_shards(app, make_menu_item):
+    first, second = make_menu_item("First", 100), make_menu_item("Second", 100)
+    order_ids = []
+    for n in range(6):
+        payload, status_code = OrderService.create_order(
+            f"09000000{n:02d}",
+            [{"id": first, "quantity": 1}, {"id": second, "quantity": n + 1}],
+        )
+        assert status_code == 201
+        order_ids.append(payload["order"]["id"])
+    OrderService.update_status(order_ids[0], OrderStatus.DELIVERED.value)
+
+    shards = {AnalyticsService.shard(order_id) for order_id in order_ids}
+    assert {row.shard for row in HourlySales.query} == shards
+    assert {row.shard for row in OrderStatusCount.query} == shards
+
+    sales, hourly, best_sellers, categories, statuses = reports()
+    assert sales[0]["orders"] == hourly[0]["orders"] == 6
+    assert sales[0]["items"] == 6 + 21
+    assert [row["quantity"] for row in best_sellers] == [21, 6]
+    assert sum(row["quantity"] for row in categories) == 27
+    assert sum(statuses.values()) == 6
+    assert statuses["DELIVERED"] == 1
+
+    # A rebuild puts everything in one shard, the reports don't change
+    AnalyticsService.rebuild()
+    db.session.expire_all()
+    assert reports() == (sales, hourly, best_sellers, categories, statuses)
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import jwt
+import pytest
+
+from app import password_pool
+from app.config import Config
+from app.services.auth import AuthService
+from app.utils.auth import TokenCache, token_cache
+
+
+@pytest.fixture
+def config(config):
+    # One password check at a time, none waiting
+    return type(
+        "HashConfig",
+        (config,),
+        {"PASSWORD_HASH_WORKERS": 1, "PASSWORD_HASH_QUEUE": 0},
+    )
+
+
+def token(exp: float, phone: str = "0900000000") -> str:
+    payload = {"id": 1, "phone": phone, "is_staff": True, "exp": exp}
+    return jwt.encode(payload, Config.SECRET_KEY, algorithm="HS256")
+
+
+def test_a_cached_token_is_rejected_once_expired(client):
+    exp = int(time.time()) + 1
+    expiring = token(exp)
+    headers = {"Authorization": f"Bearer {expiring}"}
+    # Authenticated, then rejected for the missing name
+    assert client.post("/categories/", json={}, headers=headers).status_code == 400
+    assert token_cache.get(expiring) is not None
+
+    time.sleep(exp - time.time() + 0.01)
+    response = client.post("/categories/", json={}, headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()["message"] == "Token has expired"
+    assert token_cache.get(expiring) is None
+
+
+def test_the_least_recently_used_token_is_evicted():
+    cache = TokenCache(2)
+    exp = time.time() + 60
+    first, second, third = (token(exp, f"090000000{n}") for n in range(3))
+    cache.put(first, {"id": 1, "exp": exp})
+    cache.put(second, {"id": 2, "exp": exp})
+    assert cache.get(first)["id"] == 1  # Now the most recently used
+
+    cache.put(third, {"id": 3, "exp": exp})
+    assert len(cache._entries) == 2
+    assert cache.get(second) is None
+    assert cache.get(first)["id"] == 1
+    assert cache.get(third)["id"] == 3
+
+
+def test_clear_drops_every_token():
+    cache = TokenCache(2)
+    exp = time.time() + 60
+    cache.put(token(exp), {"id": 1, "exp": exp})
+    cache.clear()
+    assert cache.get(token(exp)) is None
+
+
+def test_tokens_without_an_expiry_are_not_cached():
+    cache = TokenCache(2)
+    cache.put("forever", {"id": 1})
+    assert cache.get("forever") is None
+
+
+def test_logins_get_a_503_while_the_password_pool_is_busy(app, client):
+    AuthService.add_user("0900000009", is_staff=True, password="secret123")
+    body = {"phone": "0900000009", "password": "secret123", "is_staff": True}
+
+    busy, done = threading.Event(), threading.Event()
+
+    def hash_for_a_while():
+        busy.set()
+        done.wait(10)
+
+    holder = threading.Thread(target=password_pool.run, args=(hash_for_a_while,))
+    holder.start()
+    try:
+        busy.wait(10)
+        response = client.post("/auth/login", json=body)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    finally:
+        done.set()
+        holder.join()
+    assert client.post("/auth/login", json=body).status_code == 200
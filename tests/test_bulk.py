@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+
+import jwt
+import pytest
+
+from app import db
+from app.config import Config
+from app.models.category import Category
+from app.models.menu import MenuItem
+
+
+@pytest.fixture
+def headers():
+    payload = {"id": 1, "phone": "0900000000", "is_staff": True}
+    token = jwt.encode(payload, Config.SECRET_KEY, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def category_id(app):
+    category = Category(name="Drinks")
+    db.session.add(category)
+    db.session.commit()
+    return category.id
+
+
+def import_csv(client, headers, body: bytes):
+    return client.post(
+        "/menu/import", data=body, content_type="text/csv", headers=headers
+    )
+
+
+def test_import_inserts_new_items_and_updates_existing_ones(
+    client, headers, category_id, make_menu_item
+):
+    category = Category.query.get(category_id)
+    tea = make_menu_item("Tea", 7, price=1.0, category=category, description="Old")
+    body = (
+        "name,category_id,price,quantity,description\n"
+        f"Tea,{category_id},2.5,100,New\n"
+        f"Coffee,{category_id},3,10,\n"
+        f"Juice,{category_id},-1,0,\n"
+        f"Soda,999,1,0,\n"
+    ).encode()
+
+    response = import_csv(client, headers, body)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["imported"] == 2
+    assert [error["line"] for error in data["errors"]] == [4, 5]
+
+    db.session.expire_all()
+    updated = MenuItem.query.get(tea)
+    # Price and description are overwritten, the stock is kept
+    assert (updated.price, updated.description, updated.quantity) == (2.5, "New", 7)
+    coffee = MenuItem.query.filter_by(name="Coffee").one()
+    assert (coffee.price, coffee.quantity) == (3.0, 10)
+    assert MenuItem.query.count() == 2
+
+
+def test_a_failing_import_writes_nothing(client, headers, category_id, monkeypatch):
+    monkeypatch.setattr(Config, "BULK_BATCH_SIZE", 2)
+    body = "name,category_id,price\n".encode() + b"".join(
+        f"Item {n},{category_id},1\n".encode() for n in range(3)
+    )
+    # Undecodable, after a batch was already written
+    body += b"\xff\xfe,1,1\n"
+
+    response = import_csv(client, headers, body)
+    assert response.status_code == 400
+    assert not response.get_json()["success"]
+    assert MenuItem.query.count() == 0
+
+
+def test_export_streams_every_item_in_both_formats(client, headers, make_menu_item):
+    ids = [make_menu_item(f"Item {n}", n, description=f"Item {n}") for n in range(3)]
+
+    response = client.get("/menu/export?format=jsonl", headers=headers)
+    assert response.is_streamed
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row["id"] for row in rows] == ids
+    assert rows[1]["category_name"] == "Category of Item 1"
+
+    response = client.get("/menu/export", headers=headers)
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [int(row["id"]) for row in rows] == ids
+    assert rows[2]["quantity"] == "2"
+
+
+def test_an_export_imports_back_unchanged(client, headers, make_menu_item):
+    make_menu_item("Tea", 5, price=2.5, description="Green")
+    exported = client.get("/menu/export", headers=headers).get_data()
+
+    response = import_csv(client, headers, exported)
+    assert response.get_json()["imported"] == 1
+    assert MenuItem.query.count() == 1
+    assert client.get("/menu/export", headers=headers).get_data() == exported
+
+
+def test_restock_adds_to_many_items_and_reports_the_others(
+    client, headers, make_menu_item
+):
+    first, second = make_menu_item("First", 1), make_menu_item("Second", 1)
+    items = [
+        {"id": first, "quantity": 5},
+        {"id": 999, "quantity": 5},
+        {"id": second, "quantity": 0},
+        {"id": first, "quantity": 2},  # Summed with the first line
+        "garbage",
+    ]
+
+    response = client.put("/menu/quantities", json={"items": items}, headers=headers)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["updated"] == 1
+    assert [(error["index"], error["message"]) for error in data["errors"]] == [
+        (1, "Menu item not found"),
+        (2, "Invalid id or quantity"),
+        (4, "Invalid id or quantity"),
+    ]
+    db.session.expire_all()
+    assert MenuItem.query.get(first).quantity == 8
+    assert MenuItem.query.get(second).quantity == 1
+
+    # The menu sees the new stock right away
+    menu = client.get("/menu/").get_json()["menu_items"]
+    assert {item["id"]: item["quantity"] for item in menu}[first] == 8
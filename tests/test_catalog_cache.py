@@ -0,0 +1,60 @@
+from app import cache
+from app.services.menu import MenuService
+from app.services.order import OrderService
+from app.utils.cache import DatabaseVersionStore
+
+
+def test_database_version_is_shared_between_workers(app):
+    # Two stores stand for two workers, or two hosts
+    first, second = DatabaseVersionStore(0), DatabaseVersionStore(0)
+    assert first.get() == second.get()
+
+    first.bump()
+    assert first.get() == second.get()
+
+
+def test_version_is_re_read_after_the_check_interval(app):
+    writer, reader = DatabaseVersionStore(0), DatabaseVersionStore(3600)
+    version = reader.get()
+
+    writer.bump()
+    assert reader.get() == version  # Until the interval expires
+    reader._cached = (version, float("-inf"))
+    assert reader.get() == writer.get() != version
+
+
+def test_menu_etag_matches_across_workers_and_changes_on_mutation(
+    client, make_menu_item
+):
+    menu_item_id = make_menu_item("Item", 5)
+    etag = client.get("/menu/").headers["ETag"]
+
+    # Every store stands for the process state of another worker
+    cache._store = DatabaseVersionStore(0)
+    response = client.get("/menu/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    MenuService.add_quantity(menu_item_id, 1)
+    cache._store = DatabaseVersionStore(0)
+    response = client.get("/menu/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["menu_items"][0]["quantity"] == 6
+
+
+def test_orders_leave_the_catalog_version_alone(client, make_menu_item):
+    menu_item_id = make_menu_item("Item", 5)
+    version = cache.version()
+    etag = client.get("/menu/").headers["ETag"]
+
+    payload, status_code = OrderService.create_order(
+        "0900000001", [{"id": menu_item_id, "quantity": 2}]
+    )
+    assert status_code == 201
+    assert cache.version() == version
+
+    # Quantities are refreshed after CATALOG_STOCK_TTL, and so is the ETag
+    cache.expire("stock")
+    response = client.get("/menu/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["menu_items"][0]["quantity"] == 3
+    assert cache.version() == version
@@ -0,0 +1,35 @@
+import jwt
+import pytest
+
+from app.config import Config
+
+
+@pytest.fixture
+def headers():
+    payload = {"id": 1, "phone": "0900000000", "is_staff": True}
+    token = jwt.encode(payload, Config.SECRET_KEY, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_categories_are_renamed_to_free_names_only(client, headers):
+    ids = {}
+    for name in ("Drinks", "Food"):
+        response = client.post("/categories/", json={"name": name}, headers=headers)
+        ids[name] = response.get_json()["category"]["id"]
+    drinks = ids["Drinks"]
+
+    response = client.put(
+        f"/categories/{drinks}", json={"name": "Food"}, headers=headers
+    )
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Category name already exists"
+
+    response = client.put(
+        f"/categories/{drinks}", json={"name": "Beverages"}, headers=headers
+    )
+    assert response.status_code == 200
+    categories = client.get("/categories/").get_json()["categories"]
+    assert {c["id"]: c["name"] for c in categories} == {
+        drinks: "Beverages",
+        ids["Food"]: "Food",
+    }
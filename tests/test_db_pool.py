@@ -0,0 +1,37 @@
+import gc
+import weakref
+
+from app import create_app
+from app.config import Config
+from app.utils.db_pool import PoolUtils
+
+
+class PoolConfig(Config):
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    RATE_LIMIT_ENABLED = False
+    INSTRUMENTATION_ENABLED = False
+    ORDER_INTAKE_ENABLED = False
+
+
+def test_fork_reset_does_not_keep_apps_alive(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        PoolConfig, "ORDER_INTAKE_JOURNAL", str(tmp_path / "intake.db"), raising=False
+    )
+    refs = [weakref.ref(create_app(PoolConfig)) for _ in range(3)]
+    gc.collect()
+    assert all(ref() is None for ref in refs)
+
+
+def test_forked_children_reset_the_pools_of_live_apps(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        PoolConfig, "ORDER_INTAKE_JOURNAL", str(tmp_path / "intake.db"), raising=False
+    )
+    apps = [create_app(PoolConfig) for _ in range(2)]
+    reset = []
+    monkeypatch.setattr(
+        PoolUtils, "reset", classmethod(lambda cls, app: reset.append(app))
+    )
+
+    PoolUtils._reset_forked()
+
+    assert all(any(app is other for other in reset) for app in apps)
@@ -0,0 +1,22 @@
+def test_only_the_etag_of_the_negotiated_encoding_matches(client, make_menu_item):
+    # Enough items for the listing to be compressed
+    for n in range(40):
+        make_menu_item(f"Item {n}", 5)
+    gzipped = client.get("/menu/", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    etag = gzipped.headers["ETag"]
+    assert etag.endswith('-gzip"')
+
+    response = client.get(
+        "/menu/", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    # A client that can't decode gzip must not be told to reuse a gzip body
+    response = client.get(
+        "/menu/", headers={"If-None-Match": etag, "Accept-Encoding": "identity"}
+    )
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] != etag
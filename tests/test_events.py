@@ -0,0 +1,27 @@
+import threading
+
+from app.utils.events import EventBus
+
+
+def test_concurrent_publishers_deliver_in_id_order():
+    bus = EventBus()
+    bus._queue_size = 100000
+    subscription = bus.subscribe(lambda data: True)
+    seen = []
+    bus.add_listener(lambda event, data: seen.append(data["n"]))
+
+    def publish(n):
+        for i in range(500):
+            bus.publish("order_created", {"n": (n, i)})
+
+    threads = [threading.Thread(target=publish, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = []
+    while (event := subscription.get(timeout=0)) is not None:
+        ids.append(event[0])
+    assert ids == sorted(ids) == list(range(1, 4001))
+    assert len(seen) == 4000
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import db, idempotency
+from app.models.idempotency import IdempotencyKey
+from app.models.order import Order
+from app.services.idempotency import IdempotencyService
+
+
+def test_an_order_committed_by_a_dead_request_is_not_placed_again(
+    app, client, make_menu_item, monkeypatch
+):
+    menu_item_id = make_menu_item("Item", 5)
+    body = {"phone": "0900000001", "menu_items": [{"id": menu_item_id}]}
+    headers = {"Idempotency-Key": "retry-me"}
+
+    def die(*args):
+        raise RuntimeError("Worker killed before storing the response")
+
+    # The order commits, then the worker dies
+    with monkeypatch.context() as patch:
+        patch.setattr(IdempotencyService, "complete", die)
+        with pytest.raises(RuntimeError):
+            client.post("/order/", json=body, headers=headers)
+    idempotency._cache.clear()  # Another worker
+
+    # Abandoned, the lock timeout has passed
+    row = IdempotencyKey.query.one()
+    row.created_at = datetime.utcnow() - timedelta(days=1)
+    db.session.commit()
+
+    response = client.post("/order/", json=body, headers=headers)
+    assert response.status_code == 201
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert response.get_json()["order"]["id"] == row.resource_id
+    assert Order.query.count() == 1
+
+    response = client.post("/order/", json=body, headers=headers)
+    assert response.get_json()["order"]["id"] == row.resource_id
+    assert Order.query.count() == 1
+
+
+def test_claim_inserts_again_when_the_row_vanishes(app):
+    IdempotencyService.claim("key", "first", ttl=60, lock_timeout=60)
+
+    def released_meanwhile(session):
+        # The holder releases the key between the failed insert and the read
+        with db.engine.begin() as conn:
+            conn.execute(IdempotencyKey.__table__.delete())
+
+    event.listen(db.session(), "after_rollback", released_meanwhile, once=True)
+    assert IdempotencyService.claim("key", "second", ttl=60, lock_timeout=60) is None
+    db.session.expire_all()
+    assert IdempotencyKey.query.get("key").request_hash == "second"
@@ -0,0 +1,101 @@
+import pytest
+
+from app import create_app, db, intake
+from app.models.order import Order
+from app.utils.intake import OrderIntake, OrderJournal
+
+
+@pytest.fixture
+def config(config, monkeypatch):
+    # The tests drain the journal themselves
+    monkeypatch.setattr(OrderIntake, "start", lambda self, app: None)
+    return type("IntakeConfig", (config,), {"ORDER_INTAKE_ENABLED": True})
+
+
+def take(client, menu_item_id, quantity=1, phone="0900000001"):
+    response = client.post(
+        "/order/",
+        json={
+            "phone": phone,
+            "menu_items": [{"id": menu_item_id, "quantity": quantity}],
+        },
+    )
+    assert response.status_code == 202
+    return response.get_json()["order"]["id"]
+
+
+def restarted():
+    """The intake of a new process, on the same journal"""
+    other = OrderIntake()
+    other.journal = OrderJournal(intake.journal.path)
+    return other
+
+
+def test_an_order_journaled_before_a_crash_is_placed_once(
+    client, make_menu_item, monkeypatch
+):
+    menu_item_id = make_menu_item("Item", 5)
+    intake_id = take(client, menu_item_id)
+
+    def crash():
+        raise KeyboardInterrupt  # Not handled, like the process dying
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db.session, "commit", crash)
+        with pytest.raises(KeyboardInterrupt):
+            intake.drain_once()
+    db.session.rollback()
+    assert Order.query.count() == 0
+
+    drained = restarted()
+    assert drained.drain_once() == 1
+    assert drained.drain_once() == 0
+    order = Order.query.filter(Order.intake_id == intake_id).one()
+    response = client.get(f"/order/{intake_id}")
+    assert response.status_code == 200
+    assert response.get_json()["order"]["id"] == order.id
+
+
+def test_an_order_committed_before_a_crash_is_not_placed_twice(
+    client, make_menu_item, monkeypatch
+):
+    menu_item_id = make_menu_item("Item", 5)
+    intake_id = take(client, menu_item_id)
+
+    def crash(results):
+        raise KeyboardInterrupt
+
+    with monkeypatch.context() as patch:
+        patch.setattr(intake.journal, "complete", crash)
+        with pytest.raises(KeyboardInterrupt):
+            intake.drain_once()
+    assert intake.journal.backlog() == 1  # Placed, but not marked so
+
+    drained = restarted()
+    assert drained.drain_once() == 1
+    assert drained.journal.backlog() == 0
+    order = Order.query.filter(Order.intake_id == intake_id).one()
+    assert drained.journal.get(intake_id)["order_id"] == order.id
+    assert Order.query.count() == 1
+
+
+def test_an_entry_out_of_stock_only_fails_itself(client, make_menu_item):
+    menu_item_id = make_menu_item("Item", 2)
+    first = take(client, menu_item_id, 1, "0900000001")
+    greedy = take(client, menu_item_id, 2, "0900000002")
+    last = take(client, menu_item_id, 1, "0900000003")
+
+    assert intake.drain_once() == 3
+    assert [intake.journal.get(i)["status_code"] for i in (first, greedy, last)] == [
+        201,
+        400,
+        201,
+    ]
+    assert {order.intake_id for order in Order.query} == {first, last}
+
+
+def test_the_drain_starts_without_waiting_for_a_request(config, monkeypatch):
+    started = []
+    monkeypatch.setattr(OrderIntake, "start", lambda self, app: started.append(app))
+    app = create_app(config)
+    assert started == [app]
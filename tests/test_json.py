@@ -0,0 +1,60 @@
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.utils.json import dumps, jsonify
+
+PAYLOAD = {
+    "success": True,
+    "order": {
+        "id": 7,
+        "customer_phone": None,
+        "total_price": 12.5,
+        "created_at": datetime(2024, 5, 1, 12, 30, 15, 123456),
+        "day": date(2024, 5, 1),
+        "amount": Decimal("10.10"),
+        "key": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "items": [{"name": "Phở bò", "quantity": 2}],
+    },
+    "a_key_after_order": [],
+}
+
+
+def render(app, backend, *args, **kwargs):
+    app.config["JSON_BACKEND"] = backend
+    response = jsonify(*args, **kwargs)
+    assert response.mimetype == "application/json"
+    # Parsed keeping the key order
+    return json.loads(response.get_data(), object_pairs_hook=list)
+
+
+@pytest.mark.parametrize("sort_keys", [True, False])
+def test_orjson_renders_like_the_stdlib(app, sort_keys):
+    app.config["JSON_SORT_KEYS"] = sort_keys
+    with app.test_request_context():
+        assert render(app, "orjson", PAYLOAD) == render(app, "std", PAYLOAD)
+        assert render(app, "orjson", a=1, b=[1, 2]) == render(app, "std", a=1, b=[1, 2])
+        assert render(app, "orjson", 1, 2) == render(app, "std", 1, 2)
+
+
+def test_dates_and_decimals_keep_their_stdlib_format(app):
+    with app.test_request_context():
+        order = dict(render(app, "orjson", PAYLOAD))["order"]
+    order = dict(order)
+    assert order["created_at"] == "Wed, 01 May 2024 12:30:15 GMT"
+    assert order["day"] == "Wed, 01 May 2024 00:00:00 GMT"
+    assert order["amount"] == "10.10"
+    assert order["key"] == "12345678-1234-5678-1234-567812345678"
+
+
+@pytest.mark.parametrize("sort_keys", [True, False])
+def test_dumps_is_the_same_with_both_backends(app, sort_keys):
+    app.config["JSON_SORT_KEYS"] = sort_keys
+    with app.test_request_context():
+        app.config["JSON_BACKEND"] = "orjson"
+        fast = dumps(PAYLOAD)
+        app.config["JSON_BACKEND"] = "std"
+        assert fast == dumps(PAYLOAD)
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.utils.kitchen import KitchenQueue
+
+
+def order(order_id, status):
+    return {"id": order_id, "status": status}
+
+
+class Database:
+    """The orders table, as the loader of every worker sees it"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def save(self, order_id, status, ago=0):
+        updated_at = datetime.utcnow() - timedelta(seconds=ago)
+        self.rows[order_id] = (updated_at, order(order_id, status))
+
+    def load(self, since):
+        return [
+            (updated_at, data)
+            for updated_at, data in self.rows.values()
+            if (data["status"] != "DELIVERED" if since is None else updated_at >= since)
+        ]
+
+
+def test_events_during_a_load_win_over_the_loaded_state():
+    queue = KitchenQueue()
+
+    def loader(since):
+        # Published while the loader reads, which it must do without the lock
+        queue.on_event("order_updated", order(1, "READY"))
+        queue.on_event("order_created", order(3, "ESTABLISHED"))
+        an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+        return [
+            (an_hour_ago, order(1, "ESTABLISHED")),
+            (an_hour_ago, order(2, "ESTABLISHED")),
+        ]
+
+    changes = queue.changes(None, loader)
+    assert changes["orders"]["READY"] == [order(1, "READY")]
+    assert changes["orders"]["ESTABLISHED"] == [
+        order(2, "ESTABLISHED"),
+        order(3, "ESTABLISHED"),
+    ]
+
+
+def test_a_failed_load_is_retried():
+    queue = KitchenQueue()
+
+    def failing(since):
+        raise RuntimeError("database down")
+
+    with pytest.raises(RuntimeError):
+        queue.changes(None, failing)
+    changes = queue.changes(
+        None, lambda since: [(datetime.utcnow(), order(1, "PROCESSING"))]
+    )
+    assert changes["orders"]["PROCESSING"] == [order(1, "PROCESSING")]
+
+
+def test_versions_are_shared_between_workers():
+    database = Database()
+    database.save(1, "ESTABLISHED", ago=60)
+    database.save(2, "ESTABLISHED", ago=60)
+    first, second = KitchenQueue(), KitchenQueue()
+    second.changes(None, database.load)  # Loaded before the changes
+
+    changes = first.changes(None, database.load)
+    assert changes["reset"]
+    assert len(changes["orders"]["ESTABLISHED"]) == 2
+
+    # Changed through the first worker
+    database.save(1, "READY")
+    first.on_event("order_status_updated", order(1, "READY"))
+    database.save(2, "DELIVERED")
+    first.on_event("order_status_updated", order(2, "DELIVERED"))
+    changes = first.changes(changes["version"], database.load)
+    assert not changes["reset"]
+    assert changes["orders"]["READY"] == [order(1, "READY")]
+    assert changes["removed"] == [2]
+
+    # The second worker has not refreshed yet, the newer version makes it
+    changes = second.changes(changes["version"], database.load)
+    assert not changes["reset"]
+    assert changes["orders"]["READY"] == [order(1, "READY")]
+    assert changes["removed"] == [2]
+
+    # Nothing new, only the changes within the slack are sent again
+    database.save(3, "ESTABLISHED")
+    changes = second.changes(changes["version"], database.load)
+    assert changes["orders"]["ESTABLISHED"] == []
+    second._refreshed_at -= second._ttl + 1
+    changes = second.changes(changes["version"], database.load)
+    assert changes["orders"]["ESTABLISHED"] == [order(3, "ESTABLISHED")]
+
+
+def test_an_unknown_version_resets_the_client():
+    database = Database()
+    database.save(1, "ESTABLISHED", ago=60)
+    queue = KitchenQueue()
+    for since in (None, "garbage", "1", str(2**62)):
+        changes = queue.changes(since, database.load)
+        assert changes["reset"]
+        assert changes["orders"]["ESTABLISHED"] == [order(1, "ESTABLISHED")]
+
+
+def test_the_endpoint_sends_the_changes_since_a_version(client, make_menu_item):
+    menu_item_id = make_menu_item("Item", 5)
+    order_ids = [
+        client.post(
+            "/order/", json={"phone": phone, "menu_items": [{"id": menu_item_id}]}
+        ).get_json()["order"]["id"]
+        for phone in ("0900000001", "0900000002")
+    ]
+    changes = client.get("/order/kitchen").get_json()
+    assert changes["reset"]
+
+    client.put(f"/order/{order_ids[0]}/status", json={"status": "DELIVERED"})
+    changes = client.get(f"/order/kitchen?since={changes['version']}").get_json()
+    assert not changes["reset"]
+    assert changes["removed"] == [order_ids[0]]
@@ -0,0 +1,82 @@
+from sqlalchemy import update
+
+from app import cache, db
+from app.config import Config
+from app.models.menu import MenuItem
+from app.utils.cache import DatabaseVersionStore
+
+
+def test_menu_without_limit_or_cursor_lists_every_item(client, make_menu_item):
+    count = Config.PAGE_SIZE_DEFAULT + 20
+    for n in range(count):
+        make_menu_item(f"Item {n}", 1)
+
+    data = client.get("/menu/").get_json()
+    assert len(data["menu_items"]) == count
+    assert data["next_cursor"] is None
+
+    first = client.get("/menu/?limit=50").get_json()
+    assert len(first["menu_items"]) == 50
+    rest = client.get(f"/menu/?cursor={first['next_cursor']}").get_json()
+    # A cursor alone pages with the default page size
+    assert len(rest["menu_items"]) == min(count - 50, Config.PAGE_SIZE_DEFAULT)
+    assert rest["menu_items"][0]["id"] == first["menu_items"][-1]["id"] + 1
+
+
+def search(client, name):
+    response = client.get("/menu/search", query_string={"name": name})
+    assert response.status_code == 200
+    return [item["name"] for item in response.get_json()["menu_items"]]
+
+
+def test_search_ignores_case_and_diacritics(client, make_menu_item):
+    make_menu_item("Phở Bò", 5)
+    make_menu_item("Bánh mì đặc biệt", 5)
+
+    assert search(client, "pho bo") == ["Phở Bò"]
+    assert search(client, "PHỞ") == ["Phở Bò"]
+    assert search(client, "banh mi dac") == ["Bánh mì đặc biệt"]
+
+
+def test_search_matches_the_last_term_as_a_prefix(client, make_menu_item):
+    make_menu_item("Cà phê sữa đá", 5)
+    make_menu_item("Cà phê đen", 5)
+
+    assert search(client, "ca ph") == ["Cà phê đen", "Cà phê sữa đá"]
+    assert search(client, "ca phe s") == ["Cà phê sữa đá"]
+    assert search(client, "sua ca") == ["Cà phê sữa đá"]
+    assert search(client, "tra") == []
+
+
+def test_search_ranks_names_before_descriptions_and_tokens_before_prefixes(
+    client, make_menu_item
+):
+    make_menu_item("Trà đào", 5, description="Trà with peach")
+    make_menu_item("Sinh tố", 5, description="Trà đào blend")
+    make_menu_item("Trà đào cam sả", 5)
+    make_menu_item("Trà đàoxanh", 5)
+
+    # Whole name tokens, shortest name first, then a name prefix, then
+    # the description
+    assert search(client, "tra dao") == [
+        "Trà đào",
+        "Trà đào cam sả",
+        "Trà đàoxanh",
+        "Sinh tố",
+    ]
+
+
+def test_search_sees_catalog_changes_of_other_workers(client, make_menu_item):
+    menu_item_id = make_menu_item("Bún chả", 5)
+    assert search(client, "bun") == ["Bún chả"]
+
+    # Renamed by another worker, which bumps the shared catalog version
+    db.session.execute(
+        update(MenuItem).where(MenuItem.id == menu_item_id).values(name="Bún bò")
+    )
+    db.session.commit()
+    DatabaseVersionStore(0).bump()
+    cache._store = DatabaseVersionStore(0)
+
+    assert search(client, "bun cha") == []
+    assert search(client, "bun bo") == ["Bún bò"]
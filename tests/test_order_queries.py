@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models.category import Category
+from app.services.order import OrderService
+
+ORDERS = 150
+ITEMS_PER_ORDER = 4
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def orders(app, make_menu_item):
+    categories = [Category(name=f"Category {n}") for n in range(3)]
+    db.session.add_all(categories)
+    db.session.commit()
+    menu_item_ids = [
+        make_menu_item(f"Item {n}", 10**6, category=categories[n % 3])
+        for n in range(10)
+    ]
+    for n in range(ORDERS):
+        result, status_code = OrderService.create_order(
+            phone=f"09{n % 5:08d}",
+            menu_items=[
+                {"id": menu_item_ids[(n + line) % 10], "quantity": 1 + line}
+                for line in range(ITEMS_PER_ORDER)
+            ],
+        )
+        assert status_code == 201
+    db.session.remove()
+
+
+@pytest.mark.parametrize(
+    "path, expected_orders",
+    [
+        (f"/order/?limit={ORDERS}", ORDERS),
+        (f"/order/byphone?phone=0900000001&limit={ORDERS}", ORDERS // 5),
+    ],
+)
+def test_order_listings_use_two_queries(client, orders, path, expected_orders):
+    with count_queries() as statements:
+        response = client.get(path)
+
+    data = response.get_json()
+    assert response.status_code == 200
+    assert len(data["orders"]) == expected_orders
+    assert all(
+        len(order["items"]) == ITEMS_PER_ORDER
+        and all(item["menu_item"]["category_name"] for item in order["items"])
+        for order in data["orders"]
+    )
+    # One for the orders, one for the items of the whole page
+    assert len(statements) == 2
+
+
+def test_order_listing_without_items_uses_one_query(client, orders):
+    with count_queries() as statements:
+        response = client.get(f"/order/?limit={ORDERS}&fields=id,status")
+
+    assert len(response.get_json()["orders"]) == ORDERS
+    assert len(statements) == 1
+
+
+def test_order_lookup_uses_one_query(client, orders):
+    with count_queries() as statements:
+        response = client.get("/order/7")
+
+    order = response.get_json()["order"]
+    assert response.status_code == 200
+    assert len(order["items"]) == ITEMS_PER_ORDER
+    assert all(item["menu_item"]["category_name"] for item in order["items"])
+    assert len(statements) == 1
+
+
+@pytest.mark.parametrize(
+    "path, expected_orders",
+    [("/order/", ORDERS), ("/order/byphone?phone=0900000001", ORDERS // 5)],
+)
+def test_order_listings_are_whole_without_limit_or_cursor(
+    client, orders, path, expected_orders
+):
+    data = client.get(path).get_json()
+    assert len(data["orders"]) == expected_orders
+    assert data["next_cursor"] is None
+
+
+def test_order_listing_pages_follow_the_cursor(client, orders):
+    data = client.get("/order/?fields=id").get_json()
+    first = client.get("/order/?limit=100&fields=id").get_json()
+    second = client.get(f"/order/?cursor={first['next_cursor']}&fields=id").get_json()
+    assert len(first["orders"]) == 100
+    assert second["next_cursor"] is None
+    assert first["orders"] + second["orders"] == data["orders"]
@@ -0,0 +1,63 @@
+import jwt
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db, profiler
+from app.config import Config
+
+
+@pytest.fixture
+def config(config):
+    return type(
+        "ProfiledConfig",
+        (config,),
+        {"INSTRUMENTATION_ENABLED": True, "INSTRUMENTATION_SAMPLE_RATE": 1.0},
+    )
+
+
+def token(is_staff: bool) -> str:
+    payload = {"id": 1, "phone": "0900000000", "is_staff": is_staff}
+    return jwt.encode(payload, Config.SECRET_KEY, algorithm="HS256")
+
+
+def test_sampled_requests_time_their_statements(client, make_menu_item):
+    make_menu_item("Item", 5)
+    response = client.get("/menu/")
+    assert 'queries"' in response.headers["Server-Timing"]
+    assert ';desc="0 queries"' not in response.headers["Server-Timing"]
+
+
+def test_only_the_engines_of_the_app_are_instrumented(app, config):
+    # E.g. a script creating an app of its own, uninstrumented
+    other = create_app(
+        type(
+            "Other",
+            (config,),
+            {"SQLALCHEMY_DATABASE_URI": "sqlite://", "INSTRUMENTATION_ENABLED": False},
+        )
+    )
+    with other.app_context():
+        assert not event.contains(
+            db.engine, "before_cursor_execute", profiler._before_execute
+        )
+    assert event.contains(db.engine, "before_cursor_execute", profiler._before_execute)
+
+
+def test_failed_statements_do_not_leave_a_start_time(app):
+    with app.test_request_context():
+        app.preprocess_request()
+        with db.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+            assert "profile_started" not in conn.info
+
+
+def test_request_metrics_are_for_staff_only(client):
+    assert client.get("/metrics/requests").status_code == 401
+    headers = {"Authorization": f"Bearer {token(False)}"}
+    assert client.get("/metrics/requests", headers=headers).status_code == 403
+    headers = {"Authorization": f"Bearer {token(True)}"}
+    response = client.get("/metrics/requests", headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()["success"]
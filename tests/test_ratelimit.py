@@ -0,0 +1,61 @@
+import pytest
+
+from app import limiter
+
+
+@pytest.fixture
+def config(config):
+    return type(
+        "LimitedConfig",
+        (config,),
+        {
+            "RATE_LIMIT_ENABLED": True,
+            "RATE_LIMITS": {"auth.login": {"ip": "100/minute", "phone": "2/minute"}},
+            "MAX_CONCURRENT_REQUESTS": 1,
+            # Closing a stream waits for its next heartbeat
+            "ORDER_STREAM_HEARTBEAT": 0.05,
+        },
+    )
+
+
+def login(client, phone):
+    # An unknown staff account, answered without hashing a password
+    body = {"phone": phone, "password": "secret", "is_staff": True}
+    return client.post("/auth/login", json=body)
+
+
+def test_logins_beyond_the_phone_bucket_get_a_429(client):
+    assert [login(client, "0900000001").status_code for _ in range(2)] == [404, 404]
+    response = login(client, "0900000001")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) == 30  # A token every 30s
+
+    # Other phones have buckets of their own
+    assert login(client, "0900000002").status_code == 404
+
+
+def test_requests_beyond_the_concurrency_limit_get_a_503(client):
+    limiter._slots.acquire()  # A request in flight
+    try:
+        response = client.get("/categories/")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        # The monitor endpoints stay up
+        assert client.get("/metrics").status_code == 200
+    finally:
+        limiter._slots.release()
+    assert client.get("/categories/").status_code == 200
+    assert limiter.shed == 1
+    assert limiter.in_flight == 0
+
+
+def test_streams_release_their_slot(client):
+    stream = client.get("/order/stream", buffered=False)
+    assert stream.status_code == 200
+    assert stream.is_streamed
+    try:
+        # The stream is still open, the other requests get in
+        assert client.get("/categories/").status_code == 200
+    finally:
+        stream.close()
+    assert limiter.in_flight == 0
@@ -0,0 +1,125 @@
+import threading
+
+from app import db
+from app.models.menu import MenuItem
+from app.models.order import Order
+from app.services.menu import MenuService
+from app.services.order import OrderService
+
+THREADS = 16
+ATTEMPTS = 10
+
+
+def run_concurrently(app, work):
+    """Call ``work(n)`` from THREADS threads started at once, each in an app context"""
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def worker(n):
+        with app.app_context():
+            barrier.wait()
+            try:
+                work(n)
+            except Exception as e:  # Reported by the test thread
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+def quantity(menu_item_id):
+    db.session.expire_all()
+    return MenuItem.query.get(menu_item_id).quantity
+
+
+def test_concurrent_orders_never_oversell(app, make_menu_item):
+    stock = 20
+    # Reserved in ID order, so the plenty one is taken before the low one fails
+    plenty_id = make_menu_item("Plenty", 10**6)
+    low_id = make_menu_item("Low", stock)
+    results = []
+
+    def work(n):
+        for attempt in range(ATTEMPTS):
+            result, status_code = OrderService.create_order(
+                phone=f"09{n:08d}",
+                menu_items=[{"id": plenty_id, "quantity": 1}, {"id": low_id}],
+            )
+            results.append(status_code)
+
+    run_concurrently(app, work)
+
+    placed = results.count(201)
+    assert set(results) <= {201, 400}
+    assert placed == stock
+    assert quantity(low_id) == 0
+    assert Order.query.count() == placed
+    # Failed orders left the item reserved before the low one untouched
+    assert quantity(plenty_id) == 10**6 - placed
+
+
+def test_orders_and_manual_reductions_share_the_stock(app, make_menu_item):
+    stock = 30
+    # Reserved in ID order, so the plenty one is taken before the low one fails
+    plenty_id = make_menu_item("Plenty", 10**6)
+    low_id = make_menu_item("Low", stock)
+    orders, reductions = [], []
+
+    def work(n):
+        for attempt in range(ATTEMPTS):
+            if (n + attempt) % 2:
+                result = MenuService.reduce_quantity(low_id, 1)
+                reductions.append(result["success"])
+            else:
+                result, status_code = OrderService.create_order(
+                    phone=f"09{n:08d}",
+                    menu_items=[{"id": plenty_id, "quantity": 1}, {"id": low_id}],
+                )
+                orders.append(status_code == 201)
+
+    run_concurrently(app, work)
+
+    assert quantity(low_id) >= 0
+    assert sum(orders) + sum(reductions) == stock
+    assert quantity(low_id) == 0
+    assert quantity(plenty_id) == 10**6 - sum(orders)
+
+
+def test_failed_multi_item_order_reserves_nothing(app, make_menu_item):
+    first_id = make_menu_item("First", 5)
+    second_id = make_menu_item("Second", 1)
+
+    result, status_code = OrderService.create_order(
+        phone="0900000000",
+        menu_items=[{"id": first_id, "quantity": 2}, {"id": second_id, "quantity": 2}],
+    )
+
+    assert status_code == 400
+    assert quantity(first_id) == 5
+    assert quantity(second_id) == 1
+    assert Order.query.count() == 0
+
+
+def test_invalid_quantities_are_rejected_without_touching_stock(client, make_menu_item):
+    menu_item_id = make_menu_item("Item", 5)
+    for bad in (-3, 0, 1.5, "2", None):
+        response = client.post(
+            "/order/",
+            json={
+                "phone": "0900000001",
+                "menu_items": [{"id": menu_item_id, "quantity": bad}],
+            },
+        )
+        assert response.status_code == 400, bad
+        payload, status_code = OrderService.create_order(
+            "0900000001", [{"id": menu_item_id, "quantity": bad}]
+        )
+        assert status_code == 400, bad
+    assert quantity(menu_item_id) == 5
+    assert Order.query.count() == 0